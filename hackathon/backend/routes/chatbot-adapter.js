@@ -100,7 +100,7 @@ router.post('/conversations/:conversationId/messages', auth, async (req, res) =>
     console.log('🔍 Query:', message.trim());
     
     const chatbotResponse = await axios.post(
-      `${CHATBOT_BASE_URL}/chatbot/stream/${conversationId}`,
+      `${CHATBOT_BASE_URL}/chatbot/stream/${conversationId}?stream_version=1`,
       `query=${encodeURIComponent(message.trim())}`,
       {
         headers: headers,
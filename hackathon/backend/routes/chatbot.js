@@ -184,7 +184,7 @@ router.post('/stream/:conversationId', auth, async (req, res) => {
     const chatbotUrl = process.env.CHATBOT_URL || 'http://localhost:8000';
     
     const response = await axios.post(
-      `${chatbotUrl}/chatbot/stream/${conversationId}`,
+      `${chatbotUrl}/chatbot/stream/${conversationId}?stream_version=1`,
       formData,
       {
         headers: {
@@ -253,7 +253,7 @@ router.post('/chat/:conversationId', auth, async (req, res) => {
     const chatbotUrl = process.env.CHATBOT_URL || 'http://localhost:8000';
     
     const response = await axios.post(
-      `${chatbotUrl}/chatbot/stream/${conversationId}`,
+      `${chatbotUrl}/chatbot/stream/${conversationId}?stream_version=1`,
       formData,
       {
         headers: {
@@ -0,0 +1,64 @@
+"""
+Per-turn setup overhead of the graph nodes, before and after prebuilding.
+
+"before" reproduces what the nodes used to do on every turn: format the
+schedule/analytic prompts, build their ReAct agents and rebuild the router and
+summarize chains. "after" is what remains per turn now: building the
+agent context and the prompt messages from state. No LLM call is made.
+
+Usage (from chatbot_final/):
+    python -m benchmarks.bench_agent_overhead --turns 200
+"""
+
+import argparse
+import time
+from datetime import datetime
+from benchmarks.fakes import LatencyChatModel, install_fake_llm
+
+
+def main(turns: int) -> None:
+    install_fake_llm(LatencyChatModel(latency=0))
+
+    from langchain_core.messages import HumanMessage
+    from langchain_core.prompts import ChatPromptTemplate
+    from langgraph.prebuilt import create_react_agent
+    from src.config.llm import llm
+    from src.agents import graph
+    from src.agents.prompts import ROUTER_PROMPT, SUMMARIZE_PROMPT, SCHEDULE_AGENT_PROMPT, ANALYTIC_AGENT_PROMPT
+    from src.agents.tools import create_todo, get_todos, update_todo, delete_todo, todo_analytics
+
+    state = {"messages": [HumanMessage(content="Xem task của tôi")], "user_id": "1"}
+
+    def before() -> None:
+        current_datetime = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        ChatPromptTemplate.from_template(SUMMARIZE_PROMPT) | llm
+        ChatPromptTemplate.from_template(ROUTER_PROMPT) | llm
+        create_react_agent(
+            llm,
+            [create_todo, get_todos, update_todo, delete_todo],
+            prompt=SCHEDULE_AGENT_PROMPT.format(current_datetime=current_datetime, user_id=state["user_id"]),
+        )
+        create_react_agent(llm, [todo_analytics], prompt=ANALYTIC_AGENT_PROMPT.format(user_id=state["user_id"]))
+
+    schedule_prompt = graph.contextual_prompt(SCHEDULE_AGENT_PROMPT)
+    analytic_prompt = graph.contextual_prompt(ANALYTIC_AGENT_PROMPT)
+
+    def after() -> None:
+        agent_state = {"messages": state["messages"], **graph.agent_context(state)}
+        schedule_prompt(agent_state)
+        analytic_prompt(agent_state)
+
+    for name, fn in (("before", before), ("after", after)):
+        fn()
+        start = time.perf_counter()
+        for _ in range(turns):
+            fn()
+        per_turn = (time.perf_counter() - start) / turns
+        print(f"{name:>6}: {per_turn * 1000:8.3f} ms/turn")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--turns", type=int, default=200)
+    args = parser.parse_args()
+    main(args.turns)
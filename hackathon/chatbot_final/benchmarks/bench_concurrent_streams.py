@@ -0,0 +1,65 @@
+"""
+Concurrency benchmark for the multi-agent graph.
+
+Runs N chat turns in parallel through `create_graph()` on a single event loop,
+with the LLM replaced by a fixed-latency fake. With async nodes the N turns
+overlap and finish in about the time of one turn; with blocking LLM calls
+(`--blocking`, the old `.invoke()` behaviour) they serialize to N turns.
+
+Usage (from chatbot_final/, with the usual .env for the tools):
+    python -m benchmarks.bench_concurrent_streams --streams 20 --latency 0.5
+    python -m benchmarks.bench_concurrent_streams --streams 20 --latency 0.5 --blocking
+"""
+
+import argparse
+import asyncio
+import time
+from benchmarks.fakes import LatencyChatModel, install_fake_llm
+
+
+async def run_turn(graph, index: int) -> float:
+    start = time.perf_counter()
+    config = {"configurable": {"thread_id": f"bench-{index}"}}
+    async for _ in graph.astream_events(
+        input={
+            "messages": [("human", "Xin chào")],
+            "route_decision": "",
+            "response": "",
+            "summary": "",
+            "user_id": "1",
+        },
+        config=config,
+        version="v2",
+    ):
+        pass
+    return time.perf_counter() - start
+
+
+async def main(streams: int, latency: float, blocking: bool) -> None:
+    install_fake_llm(LatencyChatModel(latency=latency, blocking=blocking))
+
+    from langgraph.checkpoint.memory import InMemorySaver
+    from src.agents.graph import create_graph
+
+    graph = create_graph().compile(checkpointer=InMemorySaver())
+
+    single = await run_turn(graph, -1)
+
+    start = time.perf_counter()
+    durations = await asyncio.gather(*(run_turn(graph, i) for i in range(streams)))
+    wall = time.perf_counter() - start
+
+    print(f"mode:              {'blocking' if blocking else 'async'}")
+    print(f"llm latency:       {latency * 1000:.0f} ms")
+    print(f"single turn:       {single * 1000:.0f} ms")
+    print(f"{streams} parallel turns: {wall * 1000:.0f} ms wall "
+          f"({wall / single:.2f}x single turn, slowest turn {max(durations) * 1000:.0f} ms)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--streams", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=0.5, help="fake LLM latency in seconds")
+    parser.add_argument("--blocking", action="store_true", help="simulate synchronous LLM calls")
+    args = parser.parse_args()
+    asyncio.run(main(args.streams, args.latency, args.blocking))
@@ -0,0 +1,87 @@
+"""
+Embedding throughput benchmark for the CPU inference backends.
+
+For each backend, measures batch throughput (texts/sec through
+embed_documents) and single-query latency (p50/p99 of embed_query,
+uncached).
+
+Usage (from chatbot_final/):
+    python -m benchmarks.bench_embedding_backends --device cpu --backends torch,torch-int8,onnx
+    python -m benchmarks.bench_embedding_backends --threads 4 --batch-size 64 --texts 512
+"""
+
+import argparse
+import statistics
+import time
+from typing import List
+from src.config.embeddings import create_embeddings, BACKENDS, EMBEDDING_MODEL_NAME
+
+SAMPLE_TEXTS = [
+    "Học phí ngành Trí tuệ nhân tạo tại Đại học FPT năm 2025 là bao nhiêu?",
+    "Điều kiện để được nhận học bổng toàn phần gồm những gì?",
+    "Sinh viên phải hoàn thành bao nhiêu tín chỉ để tốt nghiệp ngành Kỹ thuật phần mềm?",
+    "Quy định về việc nghỉ học quá 20% số buổi của một môn học.",
+    "Ký túc xá Hòa Lạc có bao nhiêu loại phòng và giá thuê mỗi tháng ra sao?",
+    "Chương trình OJT kéo dài bao lâu và sinh viên thực tập ở đâu?",
+    "Lịch thi cuối kỳ học kỳ Summer được công bố khi nào?",
+    "Các phương thức xét tuyển đại học chính quy năm nay.",
+]
+
+
+def percentile(values: List[float], pct: float) -> float:
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def bench_backend(backend: str, device: str, threads: int, batch_size: int, n_texts: int, n_queries: int) -> dict:
+    start = time.perf_counter()
+    embeddings = create_embeddings(EMBEDDING_MODEL_NAME, device=device, backend=backend, num_threads=threads, batch_size=batch_size)
+    load_seconds = time.perf_counter() - start
+
+    texts = [f"{SAMPLE_TEXTS[i % len(SAMPLE_TEXTS)]} ({i})" for i in range(n_texts)]
+    embeddings.embed_documents(texts[:batch_size])  # warm up
+
+    start = time.perf_counter()
+    embeddings.embed_documents(texts)
+    batch_seconds = time.perf_counter() - start
+
+    latencies = []
+    for i in range(n_queries):
+        query = f"{SAMPLE_TEXTS[i % len(SAMPLE_TEXTS)]} #{i}"
+        start = time.perf_counter()
+        embeddings.embed_query(query)
+        latencies.append((time.perf_counter() - start) * 1000)
+
+    return {
+        "backend": backend,
+        "load_s": load_seconds,
+        "texts_per_s": n_texts / batch_seconds,
+        "p50_ms": statistics.median(latencies),
+        "p99_ms": percentile(latencies, 99),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--device", default="cpu")
+    parser.add_argument("--backends", default=",".join(BACKENDS))
+    parser.add_argument("--threads", type=int, default=0, help="intra-op threads (0 = library default)")
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--texts", type=int, default=256, help="texts for the throughput run")
+    parser.add_argument("--queries", type=int, default=200, help="single queries for the latency run")
+    args = parser.parse_args()
+
+    print(f"{'backend':<12}{'load s':>8}{'texts/s':>10}{'p50 ms':>10}{'p99 ms':>10}")
+    for backend in args.backends.split(","):
+        try:
+            result = bench_backend(backend, args.device, args.threads, args.batch_size, args.texts, args.queries)
+        except Exception as e:
+            print(f"{backend:<12} failed: {e}")
+            continue
+        print(f"{result['backend']:<12}{result['load_s']:>8.1f}{result['texts_per_s']:>10.1f}"
+              f"{result['p50_ms']:>10.1f}{result['p99_ms']:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+"""
+Round trips and latency of the todo analytics queries: one COUNT per metric
+(src/analytics/todo_analytics.py at --baseline-rev, read with `git show`) vs
+one aggregate query per analysis (the working tree).
+
+Builds a synthetic todos table (1M rows by default) in its own schema,
+bench_analytics, so the real todos table is never touched, then runs every
+analysis for one user and checks both versions produce the same report.
+The table is reused by later runs with the same --rows and --users.
+
+Usage (from chatbot_final/, DB_URI pointing at a scratch database):
+    python -m benchmarks.bench_todo_analytics --rows 1000000 --users 1000 --days 90
+    python -m benchmarks.bench_todo_analytics --baseline-rev <commit>
+"""
+
+import argparse
+import statistics
+import subprocess
+import time
+import types
+from typing import Callable, Optional
+from sqlalchemy import event, text
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session
+from src.config.database import engine, Base, TodoItem
+from src.analytics import todo_analytics as current
+from src.utils.date_helpers import get_date_range
+
+SCHEMA = "bench_analytics"
+ANALYTICS_SOURCE = "src/analytics/todo_analytics.py"
+# Last commit before the analytics moved to one aggregate query per analysis
+DEFAULT_BASELINE_REV = "bcf334a"
+
+# Users get `rows / users` tasks created over the last 180 days, with
+# statuses, priorities and deadlines drawn at random (seeded)
+POPULATE_SQL = """
+    INSERT INTO todos ("userId", title, status, priority, deadline, category, "createdAt", "updatedAt")
+    SELECT
+        1 + (g % :users),
+        'task ' || g,
+        (ARRAY['pending', 'done', 'done', 'cancelled'])[1 + floor(random() * 4)::int],
+        (ARRAY['low', 'medium', 'high'])[1 + floor(random() * 3)::int],
+        CASE WHEN random() < 0.7 THEN created + random() * interval '14 days' END,
+        (ARRAY['personal', 'work', 'study'])[1 + floor(random() * 3)::int],
+        created,
+        created + random() * interval '72 hours'
+    FROM (
+        SELECT g, now()::timestamp - random() * interval '180 days' AS created
+        FROM generate_series(1, :rows) AS g
+    ) AS s
+"""
+
+# Data function (same name in both versions) and report formatter of each analysis
+ANALYSES = {
+    "productivity": ("_get_productivity_data", current._format_productivity_result),
+    "patterns": ("_get_patterns_data", current._format_patterns_result),
+    "completion_rate": ("_get_completion_rate_data", current._format_completion_rate_result),
+    "workload": ("_get_workload_data", current._format_workload_result),
+    "summary": ("get_analytics_summary", None),
+}
+
+
+def load_baseline(rev: str) -> types.ModuleType:
+    """Import todo_analytics as of git revision `rev`."""
+    source = subprocess.run(
+        ["git", "show", f"{rev}:./{ANALYTICS_SOURCE}"], capture_output=True, text=True, check=True
+    ).stdout
+    module = types.ModuleType("baseline_todo_analytics")
+    exec(compile(source, f"{rev}:{ANALYTICS_SOURCE}", "exec"), module.__dict__)
+    return module
+
+
+def prepare(conn: Connection, rows: int, users: int) -> None:
+    conn.execute(text("SET statement_timeout = 0"))
+    conn.execute(text(f"CREATE SCHEMA IF NOT EXISTS {SCHEMA}"))
+    conn.execute(text(f"SET search_path TO {SCHEMA}"))
+    conn.commit()
+    Base.metadata.create_all(conn, tables=[TodoItem.__table__])
+    conn.commit()
+
+    count = conn.execute(text("SELECT count(*) FROM todos")).scalar()
+    users_present = conn.execute(text('SELECT count(DISTINCT "userId") FROM todos')).scalar()
+    if count == rows and users_present == min(users, rows):
+        print(f"reusing {SCHEMA}.todos ({count} rows)")
+        return
+
+    print(f"populating {SCHEMA}.todos with {rows} rows for {users} users...")
+    start = time.perf_counter()
+    conn.execute(text("TRUNCATE todos"))
+    conn.execute(text("SELECT setseed(0.42)"))
+    conn.execute(text(POPULATE_SQL), {"rows": rows, "users": users})
+    conn.commit()
+    autocommit = conn.execution_options(isolation_level="AUTOCOMMIT")
+    autocommit.execute(text("VACUUM ANALYZE todos"))
+    print(f"populated in {time.perf_counter() - start:.1f}s")
+
+
+def measure(conn: Connection, fn: Callable, user_id: int, days: int, repeat: int):
+    """(result of the last run, round trips per run, median seconds per run)."""
+    round_trips = 0
+
+    def count(*args):
+        nonlocal round_trips
+        round_trips += 1
+
+    start_date, end_date = get_date_range(days)
+    timings = []
+    event.listen(conn, "before_cursor_execute", count)
+    try:
+        for _ in range(repeat):
+            with Session(bind=conn) as db:
+                start = time.perf_counter()
+                result = fn(db, start_date, end_date, user_id)
+                timings.append(time.perf_counter() - start)
+    finally:
+        event.remove(conn, "before_cursor_execute", count)
+    return result, round_trips // repeat, statistics.median(timings)
+
+
+def render(result: dict, formatter: Optional[Callable], days: int) -> list:
+    """Report lines, sorted: the legacy queries return priority groups in no particular order."""
+    if formatter is None:
+        return sorted(repr(item) for item in result.items())
+    start_date, end_date = get_date_range(days)
+    return sorted(formatter(result, start_date, end_date).splitlines())
+
+
+def main(rows: int, users: int, days: int, user_id: int, repeat: int, baseline_rev: str) -> None:
+    baseline = load_baseline(baseline_rev)
+    with engine.connect() as conn:
+        prepare(conn, rows, users)
+        print(f"user {user_id}, {days}-day window, median of {repeat} runs, baseline {baseline_rev}")
+        print(f"{'analysis':<16}{'trips before':>13}{'trips after':>12}{'ms before':>11}{'ms after':>10}{'speedup':>9}  same report")
+        for name, (function, formatter) in ANALYSES.items():
+            before, before_trips, before_s = measure(conn, getattr(baseline, function), user_id, days, repeat)
+            after, after_trips, after_s = measure(conn, getattr(current, function), user_id, days, repeat)
+            same = render(before, formatter, days) == render(after, formatter, days)
+            print(
+                f"{name:<16}{before_trips:>13}{after_trips:>12}{before_s * 1000:>11.2f}{after_s * 1000:>10.2f}"
+                f"{before_s / after_s:>8.1f}x  {'yes' if same else 'NO'}"
+            )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--days", type=int, default=90, help="analysis window")
+    parser.add_argument("--user-id", type=int, default=1)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--baseline-rev", default=DEFAULT_BASELINE_REV, help="git revision of the per-metric queries")
+    args = parser.parse_args()
+    main(args.rows, args.users, args.days, args.user_id, args.repeat, args.baseline_rev)
@@ -0,0 +1,67 @@
+"""
+Recall@k of dense, BM25 and hybrid (reciprocal rank fusion) retrieval.
+
+Reads a held-out query set as JSON lines:
+    {"query": "Học phí ngành AI năm 2025?", "relevant_ids": ["<chunk id>", ...]}
+and reports, for each mode, the mean fraction of relevant chunk ids found in
+the top k results. Runs against the configured vector store
+(VECTOR_STORE_BACKEND) and the BM25 index at BM25_INDEX_PATH, which is only
+loaded with HYBRID_SEARCH=true. Hybrid mode fuses like VectorStoreCRUD.search:
+nothing when no dense result passes the score threshold.
+
+Usage (from chatbot_final/):
+    HYBRID_SEARCH=true python -m benchmarks.eval_retrieval_recall data/eval/queries.jsonl --k 1,3,5,10
+"""
+
+import argparse
+import asyncio
+import json
+from typing import Dict, List
+from src.config.vector_store import vector_store_crud, HYBRID_CANDIDATES
+from src.retrieval.bm25 import reciprocal_rank_fusion
+
+
+def load_queries(path: str) -> List[dict]:
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+async def evaluate(queries: List[dict], ks: List[int]) -> Dict[str, Dict[int, float]]:
+    depth = max(max(ks), HYBRID_CANDIDATES)
+    totals = {mode: {k: 0.0 for k in ks} for mode in ("dense", "bm25", "hybrid")}
+    for item in queries:
+        relevant = set(item["relevant_ids"])
+        if not relevant:
+            continue
+        dense = await vector_store_crud.dense_search(item["query"], depth)
+        lexical = await vector_store_crud.lexical_search(item["query"], depth)
+        rankings = {
+            "dense": dense,
+            "bm25": lexical,
+            "hybrid": reciprocal_rank_fusion([dense[:HYBRID_CANDIDATES], lexical[:HYBRID_CANDIDATES]], depth) if dense else [],
+        }
+        for mode, documents in rankings.items():
+            for k in ks:
+                found = {doc.id for doc in documents[:k]} & relevant
+                totals[mode][k] += len(found) / len(relevant)
+    n = sum(1 for item in queries if item["relevant_ids"]) or 1
+    return {mode: {k: total / n for k, total in per_k.items()} for mode, per_k in totals.items()}
+
+
+async def main(path: str, ks: List[int]) -> None:
+    await vector_store_crud.load_lexical_index()
+    queries = load_queries(path)
+    results = await evaluate(queries, ks)
+
+    print(f"{len(queries)} queries")
+    print(f"{'mode':<8}" + "".join(f"{f'R@{k}':>8}" for k in ks))
+    for mode, per_k in results.items():
+        print(f"{mode:<8}" + "".join(f"{per_k[k]:>8.3f}" for k in ks))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("queries", help="JSON lines with query and relevant_ids")
+    parser.add_argument("--k", default="1,3,5,10", help="comma-separated cutoffs")
+    args = parser.parse_args()
+    asyncio.run(main(args.queries, [int(k) for k in args.k.split(",")]))
@@ -0,0 +1,56 @@
+"""
+Fixed-latency stand-ins used by the benchmarks.
+
+The benchmarks measure our own overhead (event loop blocking, graph
+construction, ...), so the real LLM is replaced by a model that answers
+with a canned reply after a fixed delay.
+"""
+
+import asyncio
+import os
+import time
+from typing import Any, List, Optional
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+
+
+class LatencyChatModel(BaseChatModel):
+    """Chat model that sleeps `latency` seconds and returns `reply`.
+
+    With `blocking=True` the async path sleeps with `time.sleep`, which is what
+    a synchronous `.invoke()` inside the event loop used to do.
+    """
+    latency: float = 0.5
+    reply: str = "generic_agent"
+    blocking: bool = False
+
+    @property
+    def _llm_type(self) -> str:
+        return "latency-fake"
+
+    def _result(self) -> ChatResult:
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=self.reply))])
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager: Any = None, **kwargs: Any) -> ChatResult:
+        time.sleep(self.latency)
+        return self._result()
+
+    async def _agenerate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager: Any = None, **kwargs: Any) -> ChatResult:
+        if self.blocking:
+            time.sleep(self.latency)
+        else:
+            await asyncio.sleep(self.latency)
+        return self._result()
+
+    def bind_tools(self, tools: Any, **kwargs: Any) -> "LatencyChatModel":
+        return self
+
+
+def install_fake_llm(model: BaseChatModel) -> None:
+    """Replace every node's LLM before `src.agents.graph` is imported."""
+    os.environ.setdefault("GOOGLE_API_KEY", "benchmark")
+    import src.config.llm as llm_config
+
+    llm_config.llm = model
+    llm_config.get_llm = lambda node: model
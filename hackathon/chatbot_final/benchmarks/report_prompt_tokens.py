@@ -0,0 +1,97 @@
+"""
+Static vs dynamic token counts of each prompt.
+
+The static part of a prompt is the text before its first placeholder: it is
+identical on every call, so the provider can serve it from its prompt cache.
+The dynamic part is the rest, rendered with representative sample values.
+Implicit caching only applies once the static prefix reaches the model's
+minimum (--min-cacheable).
+
+Tokens are estimated from characters like the context budget
+(src/agents/context.py); --exact counts them with the node's model instead
+(needs GOOGLE_API_KEY).
+
+Usage (from chatbot_final/):
+    python -m benchmarks.report_prompt_tokens [--exact] [--min-cacheable 1024]
+"""
+
+import argparse
+from string import Formatter
+from typing import Callable, Dict, List, Tuple
+from src.agents import prompts
+from src.agents.context import estimate_tokens
+
+SAMPLE_VALUES = {
+    "chat_history": "Assistant: Bạn có 3 task chưa hoàn thành, task gần nhất hết hạn ngày mai.",
+    "user_input": "Học phí ngành Trí tuệ nhân tạo năm 2025 là bao nhiêu?",
+    "current_datetime": "2025-08-14 09:30:00",
+    "user_id": "1024",
+}
+SAMPLE_VALUES["chat_history"] = "\n".join([SAMPLE_VALUES["chat_history"]] * 8)
+
+# (node, full template as sent to the model)
+PROMPTS: List[Tuple[str, str]] = [
+    ("router", prompts.ROUTER_PROMPT),
+    ("summarize", prompts.SUMMARIZE_PROMPT),
+    ("rag_agent", prompts.RAG_AGENT_PROMPT),
+    ("schedule_agent", prompts.SCHEDULE_AGENT_PROMPT + prompts.REQUEST_CONTEXT_PROMPT),
+    ("generic_agent", prompts.GENERIC_AGENT_PROMPT),
+    ("analytic_agent", prompts.ANALYTIC_AGENT_PROMPT + prompts.REQUEST_CONTEXT_PROMPT),
+]
+
+
+def split_template(template: str) -> Tuple[str, str]:
+    """(static prefix, dynamic remainder rendered with the sample values)."""
+    prefix = ""
+    for literal, field, _, _ in Formatter().parse(template):
+        prefix += literal
+        if field is not None:
+            return prefix, template[len(prefix):].format(**SAMPLE_VALUES)
+    return prefix, ""
+
+
+def report(counter: Callable[[str, str], int], min_cacheable: int) -> List[Dict]:
+    rows = []
+    for node, template in PROMPTS:
+        static, dynamic = split_template(template)
+        static_tokens = counter(node, static)
+        dynamic_tokens = counter(node, dynamic) if dynamic else 0
+        total = static_tokens + dynamic_tokens
+        rows.append({
+            "node": node,
+            "static": static_tokens,
+            "dynamic": dynamic_tokens,
+            "cacheable": static_tokens / total if total else 0.0,
+            "meets_minimum": static_tokens >= min_cacheable,
+        })
+    return rows
+
+
+def main(exact: bool, min_cacheable: int) -> None:
+    if exact:
+        from src.config.llm import get_llm
+
+        def counter(node: str, text: str) -> int:
+            return get_llm(node).get_num_tokens(text)
+    else:
+        def counter(node: str, text: str) -> int:
+            return estimate_tokens(text)
+
+    rows = report(counter, min_cacheable)
+    print(f"{'prompt':<16}{'static':>8}{'dynamic':>9}{'cacheable':>11}  >= {min_cacheable}")
+    for row in rows:
+        print(
+            f"{row['node']:<16}{row['static']:>8}{row['dynamic']:>9}{row['cacheable']:>10.1%}"
+            f"  {'yes' if row['meets_minimum'] else 'no'}"
+        )
+    static = sum(row["static"] for row in rows)
+    total = static + sum(row["dynamic"] for row in rows)
+    print(f"{'total':<16}{static:>8}{total - static:>9}{static / total:>10.1%}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--exact", action="store_true", help="count tokens with the node's model (API call)")
+    parser.add_argument("--min-cacheable", type=int, default=1024, help="minimum prefix tokens for implicit caching")
+    args = parser.parse_args()
+    main(args.exact, args.min_cacheable)
@@ -0,0 +1,160 @@
+"""
+Token-budgeted context window for the agents.
+
+Each agent node used to pass the whole `state["messages"]` to its ReAct agent,
+so a single pasted document inflated every later prompt. `build_context`
+gives each node a token budget instead:
+  - older messages longer than COLLAPSE_MESSAGE_TOKENS are cut to their head
+  - the oldest turns are dropped until the rest fits the node's budget
+  - the conversation summary is injected as a SystemMessage
+
+Token counts are estimated from characters (no tokenizer round trip) and kept
+as a running total in the graph state (`context_tokens`), which also drives
+background summarization.
+"""
+
+import os
+import threading
+from typing import Dict, List, Sequence
+from langchain_core.messages import AIMessage, BaseMessage, SystemMessage, trim_messages
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Vietnamese text averages about 3.5 characters per Gemini token
+CHARS_PER_TOKEN = float(os.getenv("CONTEXT_CHARS_PER_TOKEN", "3.5"))
+MESSAGE_OVERHEAD_TOKENS = 4
+# Messages before the latest exchange longer than this are collapsed to their head
+COLLAPSE_MESSAGE_TOKENS = int(os.getenv("CONTEXT_COLLAPSE_MESSAGE_TOKENS", "600"))
+KEEP_VERBATIM_MESSAGES = 2
+
+DEFAULT_CONTEXT_BUDGET = int(os.getenv("CONTEXT_BUDGET_DEFAULT", "3000"))
+NODE_CONTEXT_BUDGETS = {
+    node: int(os.getenv(f"CONTEXT_BUDGET_{node.upper()}", str(DEFAULT_CONTEXT_BUDGET)))
+    for node in ("rag_agent", "schedule_agent", "analytic_agent", "generic_agent")
+}
+
+SUMMARY_PREFIX = "Tóm tắt cuộc hội thoại trước đó:\n"
+
+
+def estimate_tokens(text: str) -> int:
+    return int(len(text) / CHARS_PER_TOKEN) + 1
+
+
+def message_tokens(message: BaseMessage) -> int:
+    """Estimated tokens of one message, tool call arguments included."""
+    content = message.content
+    if isinstance(content, list):
+        content = " ".join(part if isinstance(part, str) else str(part.get("text", "")) for part in content)
+    tokens = estimate_tokens(content) + MESSAGE_OVERHEAD_TOKENS
+    if isinstance(message, AIMessage):
+        tokens += sum(estimate_tokens(str(call.get("args", ""))) for call in message.tool_calls)
+    return tokens
+
+
+def count_tokens(messages: Sequence[BaseMessage]) -> int:
+    return sum(message_tokens(msg) for msg in messages)
+
+
+def tokens_with_input(state: dict) -> int:
+    """Running `context_tokens` once the turn's user message is in the state.
+
+    New threads, and threads checkpointed before the total existed, are counted in full once.
+    """
+    total = state.get("context_tokens")
+    if total is None:
+        return count_tokens(state["messages"])
+    return total + message_tokens(state["messages"][-1])
+
+
+def tokens_with_reply(state: dict, reply: BaseMessage) -> int:
+    """Running `context_tokens` after a node appends its reply."""
+    total = state.get("context_tokens")
+    if total is None:
+        total = count_tokens(state["messages"])
+    return total + message_tokens(reply)
+
+
+def _collapse(message: BaseMessage) -> BaseMessage:
+    if not isinstance(message.content, str) or message_tokens(message) <= COLLAPSE_MESSAGE_TOKENS:
+        return message
+    head = message.content[: int(COLLAPSE_MESSAGE_TOKENS * CHARS_PER_TOKEN)]
+    return message.model_copy(update={"content": head + " …(đã rút gọn)"})
+
+
+def build_context(state: dict, node: str) -> List[BaseMessage]:
+    """Messages to send to `node`'s agent: summary, then as many recent turns as fit its budget."""
+    budget = NODE_CONTEXT_BUDGETS.get(node, DEFAULT_CONTEXT_BUDGET)
+    messages = list(state["messages"])
+    head, recent = messages[:-KEEP_VERBATIM_MESSAGES], messages[-KEEP_VERBATIM_MESSAGES:]
+    messages = [_collapse(msg) for msg in head] + recent
+
+    summary = state.get("summary")
+    system = [SystemMessage(content=SUMMARY_PREFIX + summary)] if summary else []
+    budget -= count_tokens(system)
+
+    trimmed = trim_messages(
+        messages,
+        max_tokens=max(budget, 0),
+        token_counter=count_tokens,
+        strategy="last",
+        start_on="human",
+        allow_partial=False,
+    )
+    if not trimmed:
+        # The latest message alone exceeds the budget: send it anyway
+        trimmed = messages[-1:]
+    context = system + trimmed
+    prompt_token_stats.record_context(node, count_tokens(context), len(state["messages"]) - len(trimmed))
+    return context
+
+
+class PromptTokenStats:
+    """Per-node prompt size: estimated context tokens sent and input tokens billed by the model."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._nodes: Dict[str, Dict[str, float]] = {}
+
+    def _node(self, node: str) -> Dict[str, float]:
+        return self._nodes.setdefault(node, {
+            "calls": 0,
+            "context_tokens": 0,
+            "max_context_tokens": 0,
+            "dropped_messages": 0,
+            "llm_calls": 0,
+            "input_tokens": 0,
+        })
+
+    def record_context(self, node: str, tokens: int, dropped: int) -> None:
+        with self._lock:
+            stats = self._node(node)
+            stats["calls"] += 1
+            stats["context_tokens"] += tokens
+            stats["max_context_tokens"] = max(stats["max_context_tokens"], tokens)
+            stats["dropped_messages"] += dropped
+
+    def record_usage(self, node: str, messages: Sequence[BaseMessage]) -> None:
+        """Add the input tokens reported by the model for the agent's LLM calls."""
+        usages = [msg.usage_metadata for msg in messages if isinstance(msg, AIMessage) and msg.usage_metadata]
+        with self._lock:
+            stats = self._node(node)
+            stats["llm_calls"] += len(usages)
+            stats["input_tokens"] += sum(usage["input_tokens"] for usage in usages)
+
+    def snapshot(self) -> Dict[str, dict]:
+        with self._lock:
+            result = {}
+            for node, stats in self._nodes.items():
+                calls = stats["calls"] or 1
+                llm_calls = stats["llm_calls"] or 1
+                result[node] = {
+                    **stats,
+                    "budget": NODE_CONTEXT_BUDGETS.get(node, DEFAULT_CONTEXT_BUDGET),
+                    "avg_context_tokens": stats["context_tokens"] / calls,
+                    "avg_input_tokens_per_llm_call": stats["input_tokens"] / llm_calls,
+                }
+            return result
+
+
+prompt_token_stats = PromptTokenStats()
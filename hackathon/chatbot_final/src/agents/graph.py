@@ -1,13 +1,23 @@
 from langgraph.graph import StateGraph, END
 from langgraph.prebuilt import create_react_agent
+from langgraph.prebuilt.chat_agent_executor import AgentState as ReactAgentState
 from langgraph.graph.message import add_messages
-from langchain_core.messages import BaseMessage, HumanMessage, AIMessage, RemoveMessage
-from typing import TypedDict, List, Annotated
+from langchain_core.messages import BaseMessage, AIMessage, SystemMessage, ToolMessage
+from langchain_core.callbacks.manager import adispatch_custom_event
+from langchain_core.runnables import RunnableConfig
+from typing import TypedDict, List, Annotated, Callable
 from langchain_core.prompts import ChatPromptTemplate
-from src.config.llm import llm
-from src.agents.prompts import ROUTER_PROMPT, RAG_AGENT_PROMPT, SCHEDULE_AGENT_PROMPT, GENERIC_AGENT_PROMPT, ANALYTIC_AGENT_PROMPT, SUMMARIZE_PROMPT
-from src.agents.tools import rag_retrieve, create_todo, get_todos, update_todo, delete_todo, tavily_search, todo_analytics
+from src.config.llm import get_llm
+from src.agents.prompts import ROUTER_PROMPT, RAG_AGENT_PROMPT, SCHEDULE_AGENT_PROMPT, GENERIC_AGENT_PROMPT, ANALYTIC_AGENT_PROMPT, REQUEST_CONTEXT_PROMPT
+from src.agents.tools import rag_retrieve, create_todo, get_todos, update_todo, delete_todo, batch_todos, tavily_search, todo_analytics
+from src.agents.intent_router import timed_classify, router_stats
+from src.agents.semantic_cache import rag_answer_cache, is_standalone, SEMANTIC_CACHE_ENABLED
+from src.agents.context import build_context, tokens_with_input, tokens_with_reply, prompt_token_stats
 from datetime import datetime
+import logging
+import time
+
+logger = logging.getLogger(__name__)
 
 class AgentState(TypedDict):
     messages: Annotated[List[BaseMessage], add_messages]
@@ -15,59 +25,46 @@ class AgentState(TypedDict):
     response: str
     summary: str
     user_id: str
+    route_path: str
+    context_tokens: int
 
-def should_summarize(state: AgentState) -> str:
-    """Kiểm tra xem có cần tóm tắt ngữ cảnh không dựa trên số lượng tin nhắn AI."""
-    ai_message_count = sum(1 for msg in state["messages"] if isinstance(msg, AIMessage))
-    
-    if ai_message_count >= 10:
-        return "summarize"
-    else:
-        return "router"
+class ContextualAgentState(ReactAgentState):
+    """State of the ReAct agents that receive per-request context."""
+    user_id: str
+    current_datetime: str
 
-def summarize_node(state: AgentState) -> AgentState:
-    """Node tóm tắt ngữ cảnh cuộc hội thoại khi quá dài."""
-    messages = state["messages"]
-    summary = state.get("summary", "")
+# Chains are built once; per-request values are passed at invocation time
+router_chain = ChatPromptTemplate.from_template(ROUTER_PROMPT) | get_llm("router")
 
-    # Tạo chat history từ tất cả messages
-    chat_history = f"Summarized conversation:\n{summary}\n"
-    for msg in messages:
-        role = "User" if isinstance(msg, HumanMessage) else "Assistant"
-        chat_history += f"{role}: {msg.content}\n"
-    
-    summarize_prompt = ChatPromptTemplate.from_template(SUMMARIZE_PROMPT)
-    summarize_chain = summarize_prompt | llm
-    
-    response = summarize_chain.invoke({
-        "chat_history": chat_history
-    })
+async def router_node(state: AgentState) -> AgentState:
+    """Router agent to decide which agent should handle the request.
 
-    # Delete all but the 2 most recent messages
-    remove_messages = [RemoveMessage(id=m.id) for m in state["messages"][:-2]]
-    
-    return {
-        **state,
-        "summary": response.content,
-        "messages": remove_messages + [AIMessage(content=response.content)]
-    }
-
-
-def router_node(state: AgentState) -> AgentState:
-    """Router agent to decide which agent should handle the request."""
+    Tries the local keyword/embedding classifier first and only asks the LLM
+    when it is not confident.
+    """
+    start = time.perf_counter()
     # Lấy user input từ message cuối cùng
     user_input = state["messages"][-1].content
     messages = state["messages"]
+
+    context_tokens = tokens_with_input(state)
+
+    decision = await timed_classify(user_input)
+    if decision.route is not None:
+        logger.info("router path=%s route=%s confidence=%.3f", decision.path, decision.route, decision.confidence)
+        return {
+            **state,
+            "route_decision": decision.route,
+            "route_path": decision.path,
+            "context_tokens": context_tokens
+        }
     
     # Lấy message AI cuối cùng để tạo chat history
     last_ai_message = ""
     if len(messages) >= 2:
         last_ai_message += f"Assistant: {messages[-2].content}"
 
-    router_prompt = ChatPromptTemplate.from_template(ROUTER_PROMPT)
-    router_chain = router_prompt | llm
-
-    response = router_chain.invoke({
+    response = await router_chain.ainvoke({
         "user_input": user_input,
         "chat_history": last_ai_message
     })
@@ -85,98 +82,170 @@ def router_node(state: AgentState) -> AgentState:
     else:
         # Default to generic if unclear
         route_decision = "generic_agent"
+
+    router_stats.record("llm", time.perf_counter() - start)
+    logger.info("router path=llm route=%s", route_decision)
     
     return {
         **state,
-        "route_decision": route_decision
+        "route_decision": route_decision,
+        "route_path": "llm",
+        "context_tokens": context_tokens
+    }
+
+def contextual_prompt(static_prompt: str) -> Callable[[ContextualAgentState], List[BaseMessage]]:
+    """Build a prompt callable that appends the per-request context block to `static_prompt`.
+
+    The static instructions stay a byte-identical prefix across turns, so the
+    provider can serve them from its prompt cache.
+    """
+    def prompt(state: ContextualAgentState) -> List[BaseMessage]:
+        request_context = REQUEST_CONTEXT_PROMPT.format(
+            user_id=state.get("user_id", ""),
+            current_datetime=state.get("current_datetime", ""),
+        )
+        return [SystemMessage(content=static_prompt + request_context)] + state["messages"]
+    return prompt
+
+def agent_context(state: AgentState) -> dict:
+    """Per-request values injected into the prebuilt agents."""
+    return {
+        "user_id": state["user_id"],
+        "current_datetime": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
     }
 
 def create_rag_agent():
     """Create RAG agent using create_react_agent."""
     tools = [rag_retrieve]
-    return create_react_agent(llm, tools, prompt=RAG_AGENT_PROMPT)
+    return create_react_agent(get_llm("rag_agent"), tools, prompt=RAG_AGENT_PROMPT)
 
-def create_schedule_agent(user_id=""):
+def create_schedule_agent():
     """Create Schedule agent using create_react_agent."""
-    tools = [create_todo, get_todos, update_todo, delete_todo]
-    current_datetime = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    formatted_prompt = SCHEDULE_AGENT_PROMPT.format(
-        current_datetime=current_datetime,
-        user_id=user_id
+    tools = [create_todo, get_todos, update_todo, delete_todo, batch_todos]
+    return create_react_agent(
+        get_llm("schedule_agent"),
+        tools,
+        prompt=contextual_prompt(SCHEDULE_AGENT_PROMPT),
+        state_schema=ContextualAgentState,
     )
-    return create_react_agent(llm, tools, prompt=formatted_prompt)
 
 def create_generic_agent():
     """Create Generic agent using create_react_agent."""
     tools = [tavily_search]
-    current_datetime = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    formatted_prompt = GENERIC_AGENT_PROMPT.format(current_datetime=current_datetime)
-    return create_react_agent(llm, tools, prompt=formatted_prompt)
+    return create_react_agent(get_llm("generic_agent"), tools, prompt=GENERIC_AGENT_PROMPT)
 
-def create_analytic_agent(user_id=""):
+def create_analytic_agent():
     """Create Analytic agent using create_react_agent."""
     tools = [todo_analytics]
-    formatted_prompt = ANALYTIC_AGENT_PROMPT.format(user_id=user_id)
-    return create_react_agent(llm, tools, prompt=formatted_prompt)
+    return create_react_agent(
+        get_llm("analytic_agent"),
+        tools,
+        prompt=contextual_prompt(ANALYTIC_AGENT_PROMPT),
+        state_schema=ContextualAgentState,
+    )
 
-# Create agent instances
+# Create agent instances once; user_id and the current time come from the state
 rag_agent = create_rag_agent()
+schedule_agent = create_schedule_agent()
 generic_agent = create_generic_agent()
+analytic_agent = create_analytic_agent()
+
+def _used_knowledge_base(messages: List[BaseMessage]) -> bool:
+    """Whether the agent answered from a successful rag_retrieve call."""
+    return any(
+        isinstance(msg, ToolMessage) and msg.name == "rag_retrieve" and not str(msg.content).startswith("Error")
+        for msg in messages
+    )
+
+async def rag_agent_node(state: AgentState, config: RunnableConfig) -> AgentState:
+    """RAG agent node for school information queries.
+
+    Repeated questions are answered from the semantic cache; the cached answer
+    is emitted as a `cached_answer` custom event so it streams immediately.
+    Only the opening question of a thread uses the cache: later turns may refer
+    to earlier ones, which the shared cache knows nothing about. A failing
+    cache is logged and treated as a miss.
+    """
+    question = state["messages"][-1].content
+    question_vector = None
+    if SEMANTIC_CACHE_ENABLED and is_standalone(state["messages"], state.get("summary", "")):
+        try:
+            cached_answer, question_vector, knowledge_version = await rag_answer_cache.lookup(question)
+        except Exception:
+            logger.exception("semantic cache lookup failed, answering without the cache")
+            cached_answer, question_vector = None, None
+        if cached_answer is not None:
+            await adispatch_custom_event("cached_answer", {"content": cached_answer}, config=config)
+            reply = AIMessage(content=cached_answer)
+            return {
+                **state,
+                "response": cached_answer,
+                "messages": [reply],
+                "context_tokens": tokens_with_reply(state, reply)
+            }
 
-def rag_agent_node(state: AgentState) -> AgentState:
-    """RAG agent node for school information queries."""
-    result = rag_agent.invoke({"messages": state["messages"]})
+    result = await rag_agent.ainvoke({"messages": build_context(state, "rag_agent")})
+    prompt_token_stats.record_usage("rag_agent", result["messages"])
     
     final_message = result["messages"][-1].content if result["messages"] else "No response generated."
+
+    if question_vector is not None and _used_knowledge_base(result["messages"]):
+        try:
+            rag_answer_cache.store(question, question_vector, final_message, knowledge_version)
+        except Exception:
+            logger.exception("semantic cache store failed")
     
+    reply = AIMessage(content=final_message)
     return {
         **state,
         "response": final_message,
-        "messages": [AIMessage(content=final_message)]
+        "messages": [reply],
+        "context_tokens": tokens_with_reply(state, reply)
     }
 
-def schedule_agent_node(state: AgentState) -> AgentState:
+async def schedule_agent_node(state: AgentState) -> AgentState:
     """Schedule agent node for CRUD operations."""
-    user_id = state["user_id"]
-    
-    schedule_agent = create_schedule_agent(user_id=user_id)
-    
-    result = schedule_agent.invoke({"messages": state["messages"]})
+    result = await schedule_agent.ainvoke({"messages": build_context(state, "schedule_agent"), **agent_context(state)})
+    prompt_token_stats.record_usage("schedule_agent", result["messages"])
     
     final_message = result["messages"][-1].content if result["messages"] else "No response generated."
     
+    reply = AIMessage(content=final_message)
     return {
         **state,
         "response": final_message,
-        "messages": [AIMessage(content=final_message)]
+        "messages": [reply],
+        "context_tokens": tokens_with_reply(state, reply)
     }
 
-def generic_agent_node(state: AgentState) -> AgentState:
+async def generic_agent_node(state: AgentState) -> AgentState:
     """Generic agent node for general queries."""
-    result = generic_agent.invoke({"messages": state["messages"]})
+    result = await generic_agent.ainvoke({"messages": build_context(state, "generic_agent")})
+    prompt_token_stats.record_usage("generic_agent", result["messages"])
     
     final_message = result["messages"][-1].content if result["messages"] else "No response generated."
     
+    reply = AIMessage(content=final_message)
     return {
         **state,
         "response": final_message,
-        "messages": [AIMessage(content=final_message)]
+        "messages": [reply],
+        "context_tokens": tokens_with_reply(state, reply)
     }
 
-def analytic_agent_node(state: AgentState) -> AgentState:
+async def analytic_agent_node(state: AgentState) -> AgentState:
     """Analytic agent node for learning analytics and advice."""
-    user_id = state["user_id"]
-    
-    analytic_agent = create_analytic_agent(user_id=user_id)
-    
-    result = analytic_agent.invoke({"messages": state["messages"]})
+    result = await analytic_agent.ainvoke({"messages": build_context(state, "analytic_agent"), **agent_context(state)})
+    prompt_token_stats.record_usage("analytic_agent", result["messages"])
     
     final_message = result["messages"][-1].content if result["messages"] else "No response generated."
     
+    reply = AIMessage(content=final_message)
     return {
         **state,
         "response": final_message,
-        "messages": [AIMessage(content=final_message)]
+        "messages": [reply],
+        "context_tokens": tokens_with_reply(state, reply)
     }
 
 def route_to_agent(state: AgentState) -> str:
@@ -190,8 +259,7 @@ def create_graph() -> StateGraph:
     graph = StateGraph(AgentState)
     
     # Add nodes
-    graph.add_node("summarize_check", lambda state: state)  # Node kiểm tra
-    graph.add_node("summarize", summarize_node)
+    # Summarization runs in the background after the turn (src/agents/summarizer.py)
     graph.add_node("router", router_node)
     graph.add_node("rag_agent", rag_agent_node)
     graph.add_node("schedule_agent", schedule_agent_node)
@@ -199,16 +267,7 @@ def create_graph() -> StateGraph:
     graph.add_node("analytic_agent", analytic_agent_node)
 
     # Add edges
-    graph.set_entry_point("summarize_check")
-    graph.add_conditional_edges(
-        "summarize_check",
-        should_summarize,
-        {
-            "summarize": "summarize",
-            "router": "router"
-        }
-    )
-    graph.add_edge("summarize", "router")
+    graph.set_entry_point("router")
     graph.add_conditional_edges(
         "router",
         route_to_agent,
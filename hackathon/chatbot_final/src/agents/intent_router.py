@@ -0,0 +1,241 @@
+"""
+Local routing stage in front of the LLM router.
+
+Combines the keyword rules from ROUTER_PROMPT with a nearest-example
+classifier over labelled utterances embedded with the knowledge base
+embedding model. When neither is confident enough the caller falls back
+to the LLM router.
+"""
+
+import asyncio
+import os
+import re
+import threading
+import time
+import unicodedata
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+import numpy as np
+from dotenv import load_dotenv
+from src.config.vector_store import vector_store_crud
+
+load_dotenv()
+
+ROUTER_LOCAL_ENABLED = os.getenv("ROUTER_LOCAL_ENABLED", "true").lower() == "true"
+# Minimum gap between the best and second best route score
+ROUTER_CONFIDENCE_THRESHOLD = float(os.getenv("ROUTER_CONFIDENCE_THRESHOLD", "0.08"))
+# Minimum cosine similarity to the closest example when no keyword matched
+ROUTER_MIN_SIMILARITY = float(os.getenv("ROUTER_MIN_SIMILARITY", "0.6"))
+# Score added to a route when one of its keywords is present
+KEYWORD_WEIGHT = 0.15
+# Short follow-ups ("có", "xóa cái thứ 2") depend on the chat history, leave them to the LLM
+MIN_WORDS_WITHOUT_KEYWORD = 3
+
+ROUTES = ("rag_agent", "schedule_agent", "analytic_agent", "generic_agent")
+
+KEYWORD_RULES: Dict[str, List[str]] = {
+    "rag_agent": [
+        "học phí", "học bổng", "tuyển sinh", "xét tuyển", "điểm chuẩn", "hồ sơ nhập học",
+        "nội quy", "quy chế", "quy định của trường", "chương trình đào tạo", "khung chương trình",
+        "tín chỉ", "môn học", "ký túc xá", "cơ sở vật chất", "đại học fpt", "trường fpt",
+    ],
+    "schedule_agent": [
+        "tạo task", "thêm task", "xem task", "sửa task", "xóa task", "xoá task", "cập nhật task",
+        "danh sách task", "task của tôi", "todo", "to-do", "to do list", "việc cần làm",
+        "đánh dấu hoàn thành", "nhắc tôi", "đặt deadline", "lịch trình",
+    ],
+    "analytic_agent": [
+        "phân tích hiệu suất", "phân tích học tập", "báo cáo tiến độ",
+        "pattern học tập", "thói quen làm việc", "giờ vàng",
+        "tư vấn học tập", "khuyến nghị", "cải thiện hiệu suất",
+        "khung giờ làm việc", "lịch trình tối ưu", "quản lý thời gian",
+        "completion rate", "workload", "productivity analysis",
+    ],
+    "generic_agent": [
+        "tìm kiếm trên mạng", "tin tức", "thời tiết", "lộ trình học", "roadmap",
+        "xin chào", "chào bạn", "cảm ơn",
+    ],
+}
+
+LABELLED_EXAMPLES: Dict[str, List[str]] = {
+    "rag_agent": [
+        "Học phí ngành Trí tuệ nhân tạo một kỳ là bao nhiêu?",
+        "Điều kiện để nhận học bổng của trường là gì?",
+        "Trường có những phương thức xét tuyển nào?",
+        "Sinh viên đi học muộn bị xử lý thế nào theo nội quy?",
+        "Ngành Kỹ thuật phần mềm học những môn gì?",
+        "Một học kỳ có bao nhiêu tín chỉ?",
+        "Ký túc xá của trường giá bao nhiêu một tháng?",
+        "Hồ sơ nhập học cần những giấy tờ gì?",
+    ],
+    "schedule_agent": [
+        "Tạo cho tôi task ôn thi môn Toán vào thứ 6",
+        "Cho tôi xem danh sách công việc hôm nay",
+        "Xóa task học Python đi",
+        "Đổi deadline bài tập lớn sang ngày 20",
+        "Đánh dấu task nộp báo cáo là đã xong",
+        "Thêm lịch họp nhóm lúc 3 giờ chiều mai",
+        "Tôi có những việc gì sắp đến hạn?",
+        "Sửa độ ưu tiên của task số 5 thành cao",
+    ],
+    "analytic_agent": [
+        "Phân tích hiệu suất học tập của tôi tháng này",
+        "Tôi thường làm việc hiệu quả nhất vào giờ nào?",
+        "Tôi có đang bị quá tải công việc không?",
+        "Tỷ lệ hoàn thành task của tôi tuần này thế nào?",
+        "Tư vấn cho tôi cách quản lý thời gian tốt hơn",
+        "Gợi ý khung giờ học tập tối ưu dựa trên thói quen của tôi",
+        "Báo cáo tiến độ công việc 30 ngày qua",
+        "Làm sao để cải thiện hiệu suất làm việc của tôi?",
+    ],
+    "generic_agent": [
+        "Xin chào, bạn là ai?",
+        "Hôm nay có tin tức gì mới về AI?",
+        "Tạo cho tôi lộ trình học Machine Learning trong 3 tháng",
+        "Giải thích giúp tôi thuật toán quicksort",
+        "Thời tiết Hà Nội hôm nay thế nào?",
+        "Kể cho tôi một câu chuyện cười",
+        "Cách học tiếng Anh hiệu quả là gì?",
+        "Viết giúp tôi một email xin nghỉ học",
+    ],
+}
+
+
+def normalize_text(text: str) -> str:
+    """Lowercase, NFC-normalize and collapse whitespace."""
+    text = unicodedata.normalize("NFC", text).lower()
+    return re.sub(r"\s+", " ", text).strip()
+
+
+_KEYWORD_PATTERNS = {
+    route: [(re.compile(rf"(?<!\w){re.escape(keyword)}(?!\w)"), len(keyword.split())) for keyword in keywords]
+    for route, keywords in KEYWORD_RULES.items()
+}
+
+
+def keyword_scores(text: str) -> Dict[str, int]:
+    """Number of matched keyword words per route (longer phrases weigh more)."""
+    normalized = normalize_text(text)
+    scores = {}
+    for route, patterns in _KEYWORD_PATTERNS.items():
+        score = sum(weight for pattern, weight in patterns if pattern.search(normalized))
+        if score:
+            scores[route] = score
+    return scores
+
+
+@dataclass
+class RouteDecision:
+    route: Optional[str]    # None means "ask the LLM router"
+    confidence: float
+    path: str               # "keyword", "embedding" or "llm"
+
+
+class RouterStats:
+    """Counts and latency per routing path."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts = {"keyword": 0, "embedding": 0, "llm": 0}
+        self._seconds = {"keyword": 0.0, "embedding": 0.0, "llm": 0.0}
+
+    def record(self, path: str, seconds: float) -> None:
+        with self._lock:
+            self._counts[path] += 1
+            self._seconds[path] += seconds
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            counts = dict(self._counts)
+            seconds = dict(self._seconds)
+        total = sum(counts.values())
+        local = counts["keyword"] + counts["embedding"]
+        avg_llm = seconds["llm"] / counts["llm"] if counts["llm"] else 0.0
+        return {
+            "total": total,
+            "counts": counts,
+            "avg_latency_ms": {
+                path: (seconds[path] / counts[path] * 1000 if counts[path] else 0.0) for path in counts
+            },
+            "local_ratio": local / total if total else 0.0,
+            "llm_calls_saved": local,
+            "estimated_seconds_saved": local * avg_llm - seconds["keyword"] - seconds["embedding"],
+        }
+
+
+router_stats = RouterStats()
+
+
+class IntentRouter:
+    """Keyword rules plus nearest-example embedding classifier."""
+
+    def __init__(self, embeddings, examples: Dict[str, List[str]] = LABELLED_EXAMPLES):
+        self.embeddings = embeddings
+        self.examples = examples
+        self._labels: Optional[List[str]] = None
+        self._matrix: Optional[np.ndarray] = None
+        self._lock = asyncio.Lock()
+
+    async def _load_examples(self) -> None:
+        async with self._lock:
+            if self._matrix is not None:
+                return
+            labels, texts = [], []
+            for route, utterances in self.examples.items():
+                labels.extend([route] * len(utterances))
+                texts.extend(utterances)
+            vectors = await self.embeddings.aembed_documents(texts)
+            self._labels = labels
+            self._matrix = np.asarray(vectors, dtype=np.float32)
+
+    async def embedding_scores(self, text: str) -> Dict[str, float]:
+        """Highest cosine similarity to the labelled examples of each route."""
+        if self._matrix is None:
+            await self._load_examples()
+        query = np.asarray(await self.embeddings.aembed_query(text), dtype=np.float32)
+        similarities = self._matrix @ query
+        scores: Dict[str, float] = {}
+        for label, similarity in zip(self._labels, similarities.tolist()):
+            if similarity > scores.get(label, -1.0):
+                scores[label] = similarity
+        return scores
+
+    async def classify(self, text: str) -> RouteDecision:
+        keywords = keyword_scores(text)
+        if not keywords and len(text.split()) < MIN_WORDS_WITHOUT_KEYWORD:
+            return RouteDecision(route=None, confidence=0.0, path="llm")
+
+        try:
+            similarities = await self.embedding_scores(text)
+        except Exception:
+            similarities = {}
+
+        combined = {
+            route: similarities.get(route, 0.0) + KEYWORD_WEIGHT * keywords.get(route, 0)
+            for route in ROUTES
+        }
+        ranked = sorted(combined, key=combined.get, reverse=True)
+        best, second = ranked[0], ranked[1]
+        confidence = combined[best] - combined[second]
+
+        if confidence < ROUTER_CONFIDENCE_THRESHOLD:
+            return RouteDecision(route=None, confidence=confidence, path="llm")
+        if best in keywords:
+            return RouteDecision(route=best, confidence=confidence, path="keyword")
+        if similarities.get(best, 0.0) >= ROUTER_MIN_SIMILARITY:
+            return RouteDecision(route=best, confidence=confidence, path="embedding")
+        return RouteDecision(route=None, confidence=confidence, path="llm")
+
+
+intent_router = IntentRouter(vector_store_crud.embeddings)
+
+
+async def timed_classify(text: str) -> RouteDecision:
+    """Classify locally when enabled, recording the latency of local decisions."""
+    if not ROUTER_LOCAL_ENABLED:
+        return RouteDecision(route=None, confidence=0.0, path="llm")
+    start = time.perf_counter()
+    decision = await intent_router.classify(text)
+    if decision.route is not None:
+        router_stats.record(decision.path, time.perf_counter() - start)
+    return decision
@@ -0,0 +1,153 @@
+"""
+Semantic answer cache in front of the RAG agent.
+
+Answers are keyed by the embedding of the normalized question. A new question
+is served from the cache when its cosine similarity to a cached question is
+above the threshold. Entries expire after a TTL, the least recently used entry
+is evicted when the cache is full, and everything is dropped as soon as the
+knowledge base version changes. The version is the shared row bumped by every
+process that changes the knowledge base (src/retrieval/knowledge_version.py),
+checked on each lookup through a short in-process TTL, so a re-ingest by the
+CLI invalidates every worker within KNOWLEDGE_VERSION_TTL_SECONDS.
+
+The cache is shared by all users and threads and is keyed on the question
+alone, so only standalone questions may use it: a follow-up ("còn ngành AI
+thì sao?") means something else in every conversation. See `is_standalone`.
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Awaitable, Callable, List, Optional, Tuple
+import numpy as np
+from dotenv import load_dotenv
+from src.agents.intent_router import normalize_text
+from src.config.vector_store import vector_store_crud
+from src.retrieval.knowledge_version import get_knowledge_version
+
+load_dotenv()
+
+SEMANTIC_CACHE_ENABLED = os.getenv("SEMANTIC_CACHE_ENABLED", "true").lower() == "true"
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.95"))
+SEMANTIC_CACHE_TTL_SECONDS = float(os.getenv("SEMANTIC_CACHE_TTL_SECONDS", "3600"))
+SEMANTIC_CACHE_MAX_ENTRIES = int(os.getenv("SEMANTIC_CACHE_MAX_ENTRIES", "1000"))
+
+
+@dataclass
+class _CacheEntry:
+    vector: np.ndarray
+    answer: str
+    created_at: float
+
+
+class SemanticAnswerCache:
+    """Size-bounded LRU of question embedding -> answer with TTL."""
+
+    def __init__(
+        self,
+        embeddings,
+        knowledge_version: Callable[[], Awaitable[int]],
+        threshold: float = SEMANTIC_CACHE_THRESHOLD,
+        ttl_seconds: float = SEMANTIC_CACHE_TTL_SECONDS,
+        max_entries: int = SEMANTIC_CACHE_MAX_ENTRIES,
+    ):
+        self.embeddings = embeddings
+        self.knowledge_version = knowledge_version
+        self.threshold = threshold
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, _CacheEntry]" = OrderedDict()
+        self._version: Optional[int] = None
+        self._lock = threading.Lock()
+        # Stacked vectors of all entries, rebuilt lazily after a change
+        self._keys: List[str] = []
+        self._matrix: Optional[np.ndarray] = None
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def _check_version(self, version: int) -> None:
+        if version != self._version:
+            if self._version is not None:
+                self.invalidations += 1
+            self._entries.clear()
+            self._matrix = None
+            self._version = version
+
+    def _is_expired(self, entry: _CacheEntry, now: float) -> bool:
+        return now - entry.created_at > self.ttl_seconds
+
+    def _nearest(self, vector: np.ndarray) -> Tuple[Optional[str], float]:
+        if not self._entries:
+            return None, 0.0
+        if self._matrix is None:
+            self._keys = list(self._entries)
+            self._matrix = np.stack([self._entries[key].vector for key in self._keys])
+        similarities = self._matrix @ vector
+        index = int(np.argmax(similarities))
+        return self._keys[index], float(similarities[index])
+
+    async def lookup(self, question: str) -> Tuple[Optional[str], np.ndarray, int]:
+        """Return (cached answer or None, question vector, knowledge base version).
+
+        Pass the version back to `store`, so an answer computed while the
+        knowledge base changed is not cached under the new version.
+        """
+        key = normalize_text(question)
+        version = await self.knowledge_version()
+        vector = np.asarray(await self.embeddings.aembed_query(key), dtype=np.float32)
+        now = time.monotonic()
+        with self._lock:
+            self._check_version(version)
+            nearest, similarity = (key, 1.0) if key in self._entries else self._nearest(vector)
+            if nearest is not None and similarity >= self.threshold:
+                entry = self._entries[nearest]
+                if not self._is_expired(entry, now):
+                    self._entries.move_to_end(nearest)
+                    self.hits += 1
+                    return entry.answer, vector, version
+                del self._entries[nearest]
+                self._matrix = None
+            self.misses += 1
+        return None, vector, version
+
+    def store(self, question: str, vector: np.ndarray, answer: str, version: int) -> None:
+        key = normalize_text(question)
+        with self._lock:
+            if version != self._version:
+                return
+            self._entries[key] = _CacheEntry(vector=vector, answer=answer, created_at=time.monotonic())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            self._matrix = None
+
+    def stats(self) -> dict:
+        with self._lock:
+            size = len(self._entries)
+        total = self.hits + self.misses
+        return {
+            "enabled": SEMANTIC_CACHE_ENABLED,
+            "size": size,
+            "max_entries": self.max_entries,
+            "threshold": self.threshold,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / total if total else 0.0,
+            "invalidations": self.invalidations,
+            "knowledge_version": self._version,
+        }
+
+
+def is_standalone(messages: list, summary: str = "") -> bool:
+    """Whether the last message is the first of its thread, so its meaning does not depend on earlier turns."""
+    return len(messages) == 1 and not summary
+
+
+rag_answer_cache = SemanticAnswerCache(
+    vector_store_crud.embeddings,
+    knowledge_version=get_knowledge_version,
+)
@@ -0,0 +1,183 @@
+"""
+Background conversation summarization.
+
+Summarizing used to be a graph node in front of the router, so the turn that
+crossed the threshold waited for an extra LLM call over the whole history.
+The summarizer now runs after the reply has streamed: it reads the thread from
+the checkpointer, summarizes it and writes the summary and pruned messages
+back with `aupdate_state`, so the next turn starts from the short history.
+The agents receive the summary as a system message (src/agents/context.py).
+
+No connection is held while the LLM summarizes, and the write is conditional
+on the history the summary was computed from:
+  - the summary is applied on top of the thread's latest checkpoint, pinned by
+    its checkpoint_id, keeping the messages of turns that landed during the
+    LLM call; if the summarized messages are no longer there (another worker
+    summarized the thread meanwhile) the write is aborted
+  - after writing, if another checkpoint was committed next to ours (a turn
+    that finished between reading the head and writing), the summary is
+    re-applied on top of it, up to SUMMARIZE_WRITE_ATTEMPTS times; when the
+    attempts run out the other checkpoint is made the head again, so no turn
+    is ever lost and the thread is summarized after its next turn
+An in-process set keeps one summarization per thread running in each worker.
+"""
+
+import asyncio
+import logging
+import os
+import time
+from typing import Dict, List, Optional, Set
+from langchain_core.messages import BaseMessage, HumanMessage, RemoveMessage
+from langchain_core.prompts import ChatPromptTemplate
+from langgraph.graph.message import REMOVE_ALL_MESSAGES
+from src.agents.prompts import SUMMARIZE_PROMPT
+from src.agents.context import count_tokens, DEFAULT_CONTEXT_BUDGET
+from src.config.llm import get_llm
+from dotenv import load_dotenv
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Summarize once the thread's messages exceed this many tokens (by default, when agents
+# start dropping turns from their context), keeping the latest exchange verbatim
+SUMMARIZE_AFTER_TOKENS = int(os.getenv("SUMMARIZE_AFTER_TOKENS", str(DEFAULT_CONTEXT_BUDGET)))
+SUMMARIZE_KEEP_MESSAGES = 2
+# Writes of one summary raced by concurrent turns before giving up
+SUMMARIZE_WRITE_ATTEMPTS = 3
+
+summarize_chain = ChatPromptTemplate.from_template(SUMMARIZE_PROMPT) | get_llm("summarize")
+
+
+def needs_summary(values: dict) -> bool:
+    """Kiểm tra xem có cần tóm tắt ngữ cảnh không dựa trên số token của lịch sử."""
+    messages = values.get("messages", [])
+    if len(messages) <= SUMMARIZE_KEEP_MESSAGES:
+        return False
+    tokens = values.get("context_tokens")
+    if tokens is None:
+        tokens = count_tokens(messages)
+    return tokens >= SUMMARIZE_AFTER_TOKENS
+
+
+async def summarize_messages(messages: List[BaseMessage], summary: str = "") -> str:
+    """Tóm tắt lịch sử hội thoại, nối tiếp bản tóm tắt trước đó."""
+    chat_history = f"Summarized conversation:\n{summary}\n" if summary else ""
+    for msg in messages:
+        role = "User" if isinstance(msg, HumanMessage) else "Assistant"
+        chat_history += f"{role}: {msg.content}\n"
+
+    response = await summarize_chain.ainvoke({"chat_history": chat_history})
+    return response.content
+
+
+def checkpoint_id(config: dict) -> str:
+    return config["configurable"]["checkpoint_id"]
+
+
+class BackgroundSummarizer:
+    """Schedules summarization tasks after a turn and tracks them until shutdown."""
+
+    def __init__(self):
+        self._in_flight: Set[str] = set()
+        self._tasks: Set[asyncio.Task] = set()
+        self._counters: Dict[str, int] = {
+            "scheduled": 0,
+            "completed": 0,
+            "skipped_in_flight": 0,
+            "rebased": 0,
+            "aborted_conflict": 0,
+            "failed": 0,
+        }
+        self._total_seconds = 0.0
+
+    def schedule(self, graph, config: dict) -> None:
+        """Summarize the thread of `config` in the background if it is long enough."""
+        thread_id = config["configurable"]["thread_id"]
+        if thread_id in self._in_flight:
+            self._counters["skipped_in_flight"] += 1
+            return
+        self._in_flight.add(thread_id)
+        self._counters["scheduled"] += 1
+        task = asyncio.create_task(self._run(graph, config, thread_id))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _latest_other_checkpoint(self, graph, thread_id: str, ours: Set[str]) -> Optional[dict]:
+        """Config of the newest root checkpoint of the thread not written by this summarization."""
+        root = {"configurable": {"thread_id": thread_id, "checkpoint_ns": ""}}
+        async for checkpoint in graph.checkpointer.alist(root, limit=len(ours) + 1):
+            if checkpoint_id(checkpoint.config) not in ours:
+                return checkpoint.config
+        return None
+
+    async def _write_summary(self, graph, config: dict, snapshot, summarized: List[BaseMessage], summary: str) -> bool:
+        """Apply `summary` on top of the latest checkpoint; False when the write was aborted."""
+        thread_id = config["configurable"]["thread_id"]
+        summarized_ids = {msg.id for msg in summarized}
+        base = await graph.aget_state(config)
+        ours: Set[str] = set()
+        for _ in range(SUMMARIZE_WRITE_ATTEMPTS):
+            messages = base.values.get("messages", [])
+            if base.values.get("summary", "") != snapshot.values.get("summary", "") or not summarized_ids <= {msg.id for msg in messages}:
+                # Another worker rewrote the history since the snapshot
+                return False
+            if checkpoint_id(base.config) != checkpoint_id(snapshot.config):
+                self._counters["rebased"] += 1
+            # Turns that landed since the snapshot are kept after the summary
+            kept = [msg for msg in messages if msg.id not in summarized_ids]
+            written = await graph.aupdate_state(base.config, {
+                "summary": summary,
+                "messages": [RemoveMessage(id=REMOVE_ALL_MESSAGES), *kept],
+                "context_tokens": count_tokens(kept),
+            })
+            ours.add(checkpoint_id(written))
+            latest_other = await self._latest_other_checkpoint(graph, thread_id, ours)
+            if latest_other is None or checkpoint_id(latest_other) == checkpoint_id(base.config):
+                return True
+            base = await graph.aget_state(latest_other)
+            if base.values.get("summary", "") == summary:
+                # A turn already continued from our checkpoint
+                return True
+            # A turn committed between reading `base` and our write: apply on top of it instead
+        # Still racing: make the other checkpoint the head again rather than hide its turn
+        await graph.aupdate_state(base.config, None)
+        return False
+
+    async def _run(self, graph, config: dict, thread_id: str) -> None:
+        start = time.perf_counter()
+        try:
+            snapshot = await graph.aget_state(config)
+            if not needs_summary(snapshot.values):
+                return
+            summarized = snapshot.values["messages"][:-SUMMARIZE_KEEP_MESSAGES]
+            summary = await summarize_messages(summarized, snapshot.values.get("summary", ""))
+            if not await self._write_summary(graph, config, snapshot, summarized, summary):
+                self._counters["aborted_conflict"] += 1
+                logger.info("summary of thread=%s dropped: the history changed concurrently", thread_id)
+                return
+            self._counters["completed"] += 1
+            self._total_seconds += time.perf_counter() - start
+            logger.info("summarized thread=%s messages=%d in %.2fs", thread_id, len(summarized), time.perf_counter() - start)
+        except Exception:
+            self._counters["failed"] += 1
+            logger.exception("background summarization failed for thread=%s", thread_id)
+        finally:
+            self._in_flight.discard(thread_id)
+
+    async def drain(self, timeout: float = 30) -> None:
+        """Wait for running summarizations (on shutdown), cancelling them after `timeout`."""
+        if not self._tasks:
+            return
+        done, pending = await asyncio.wait(set(self._tasks), timeout=timeout)
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+
+    def stats(self) -> dict:
+        completed = self._counters["completed"]
+        return {
+            **self._counters,
+            "running": len(self._in_flight),
+            "avg_seconds": self._total_seconds / completed if completed else 0.0,
+        }
@@ -1,9 +1,12 @@
 from langchain_core.tools import tool
 from pydantic import Field, BaseModel
-from datetime import datetime
-from typing import Optional
-from sqlalchemy.orm import Session
-from src.config.database import TodoItem, SessionLocal
+from datetime import datetime, timedelta
+from typing import Dict, List, Literal, Optional
+import asyncio
+import hashlib
+import json
+from sqlalchemy import select, insert, update, delete, or_, func
+from src.config.database import TodoItem, AsyncSessionLocal
 from src.config.vector_store import vector_store_crud
 from langchain_tavily import TavilySearch
 from src.analytics.todo_analytics import (
@@ -35,9 +38,56 @@ class TodoUpdateInput(BaseModel):
     category: Optional[str] = Field(default=None, description="Category of the todo item")
     userId: int = Field(description="User ID")
 
+# Fields get_todos can return; id is always included
+TODO_FIELDS = ("id", "title", "description", "status", "priority", "deadline", "category")
+DEFAULT_TODO_FIELDS = ["id", "title", "status", "priority", "deadline"]
+DEFAULT_TODO_PAGE_SIZE = 20
+MAX_TODO_PAGE_SIZE = 50
+
+class TodoQueryInput(BaseModel):
+    """Input for listing todo items."""
+    userId: int = Field(description="User ID")
+    status: Optional[str] = Field(default=None, description="Only todos with this status: pending, done, cancelled, overdue")
+    priority: Optional[str] = Field(default=None, description="Only todos with this priority: low, medium, high")
+    category: Optional[str] = Field(default=None, description="Only todos in this category: personal, work, study")
+    title_contains: Optional[str] = Field(default=None, description="Only todos whose title contains this text (case-insensitive)")
+    deadline_from: Optional[str] = Field(default=None, description="Only todos due at or after this time (YYYY-MM-DD or YYYY-MM-DD HH:MM)")
+    deadline_to: Optional[str] = Field(default=None, description="Only todos due at or before this time (YYYY-MM-DD or YYYY-MM-DD HH:MM; a date includes the whole day)")
+    include_past: bool = Field(default=False, description="Also list todos whose deadline has passed (by default only undated todos and todos due from today)")
+    fields: Optional[List[str]] = Field(
+        default=None,
+        description=f"Fields to return, from {', '.join(TODO_FIELDS)}. Default: {', '.join(DEFAULT_TODO_FIELDS)}"
+    )
+    after_id: Optional[int] = Field(default=None, description="Return todos with ID greater than this (next_after_id of the previous page)")
+    limit: int = Field(default=DEFAULT_TODO_PAGE_SIZE, description=f"Page size, at most {MAX_TODO_PAGE_SIZE}")
+
+# Upper bound on operations per batch_todos call
+MAX_BATCH_OPERATIONS = 50
+
+class TodoOperation(BaseModel):
+    """One operation of a batch: create a todo, or update/delete the todos in todo_ids."""
+    op: Literal["create", "update", "delete"] = Field(description="Operation: create, update or delete")
+    todo_ids: Optional[List[int]] = Field(default=None, description="IDs of the todos to update or delete (update/delete)")
+    title: Optional[str] = Field(default=None, description="Title (required for create)")
+    description: Optional[str] = Field(default=None, description="Description")
+    status: Optional[str] = Field(default=None, description="Status: pending, done, cancelled (update)")
+    priority: Optional[str] = Field(default=None, description="Priority level: low, medium, high")
+    deadline: Optional[str] = Field(default=None, description="Deadline in YYYY-MM-DD HH:MM format")
+    category: Optional[str] = Field(default=None, description="Category of the todo : personal, work, study")
+
+class TodoBatchInput(BaseModel):
+    """Input for batch todo operations."""
+    operations: List[TodoOperation] = Field(
+        description=f"Operations to run together, at most {MAX_BATCH_OPERATIONS}. "
+                    "One update/delete operation can target many todos through todo_ids"
+    )
+    userId: int = Field(description="User ID")
+
 class RAGInput(BaseModel):
     """Input for RAG search tool."""
-    query: str = Field(description="The search query for school information")
+    queries: List[str] = Field(
+        description="Search queries for school information. Split a compound question into one query per sub-question"
+    )
 
 class TavilySearchInput(BaseModel):
     """Input for Tavily search tool."""
@@ -50,26 +100,72 @@ class TodoAnalyticsInput(BaseModel):
     days_back: Optional[int] = Field(default=30, description="Number of days to analyze")
     userId: int = Field(description="User ID")
 
-@tool
-def rag_retrieve(input: RAGInput) -> str:
-    """Retrieve relevant information from the school knowledge base."""
+def _parse_deadline(value: str) -> datetime:
+    """Parse a deadline in YYYY-MM-DD HH:MM or YYYY-MM-DD format."""
     try:
-        import asyncio
-        docs = asyncio.run(vector_store_crud.search(input.query))
-        if docs:
-            context = "\n\n".join([f"Source: {doc.metadata.get('source', 'Unknown')}\nContent: {doc.page_content}" for doc in docs])
-            return context
-        else:
-            return "No relevant information found in the knowledge base."
-    except Exception as e:
-        return f"Error retrieving information: {str(e)}"
+        return datetime.strptime(value, "%Y-%m-%d %H:%M")
+    except ValueError:
+        return datetime.strptime(value, "%Y-%m-%d")
+
+def _deadline_end(value: str) -> datetime:
+    """Exclusive end of a deadline bound: a date covers its whole day, a time its whole minute."""
+    try:
+        return datetime.strptime(value, "%Y-%m-%d %H:%M") + timedelta(minutes=1)
+    except ValueError:
+        return datetime.strptime(value, "%Y-%m-%d") + timedelta(days=1)
+
+def _contains_pattern(text: str) -> str:
+    """LIKE pattern matching `text` literally; use with escape="\\"."""
+    escaped = text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return f"%{escaped}%"
+
+# Upper bound on sub-queries searched per rag_retrieve call
+MAX_RAG_QUERIES = 5
+
+def _chunk_key(doc) -> str:
+    return doc.id or hashlib.sha1(doc.page_content.encode("utf-8")).hexdigest()
+
+@tool
+async def rag_retrieve(input: RAGInput) -> str:
+    """Retrieve relevant information from the school knowledge base.
+
+    All sub-queries are searched concurrently; chunks found by several of them
+    appear once, grouped by source document.
+    """
+    queries = list(dict.fromkeys(q.strip() for q in input.queries if q.strip()))[:MAX_RAG_QUERIES]
+    if not queries:
+        return "No relevant information found in the knowledge base."
+
+    results = await asyncio.gather(*(vector_store_crud.search(q) for q in queries), return_exceptions=True)
+    errors = [r for r in results if isinstance(r, Exception)]
+    if len(errors) == len(results):
+        return f"Error retrieving information: {str(errors[0])}"
+
+    seen = set()
+    by_source: Dict[str, List[str]] = {}
+    for docs in results:
+        if isinstance(docs, Exception):
+            continue
+        for doc in docs:
+            key = _chunk_key(doc)
+            if key in seen:
+                continue
+            seen.add(key)
+            by_source.setdefault(doc.metadata.get('source', 'Unknown'), []).append(doc.page_content)
+
+    if not by_source:
+        return "No relevant information found in the knowledge base."
+    return "\n\n".join(
+        f"Source: {source}\n" + "\n\n".join(f"Content: {content}" for content in contents)
+        for source, contents in by_source.items()
+    )
 
 @tool
-def tavily_search(input: TavilySearchInput) -> str:
+async def tavily_search(input: TavilySearchInput) -> str:
     """Search the web using Tavily for current information."""
     try:
         tavily_tool = TavilySearch(max_results=input.max_results, time_range="day")
-        tool_msg = tavily_tool.invoke({"query": input.query})
+        tool_msg = await tavily_tool.ainvoke({"query": input.query})
         
         if tool_msg:
             formatted_results = []
@@ -83,7 +179,7 @@ def tavily_search(input: TavilySearchInput) -> str:
         return f"Error performing web search: {str(e)}"
 
 @tool
-def create_todo(input: TodoInput) -> str:
+async def create_todo(input: TodoInput) -> str:
     """Create a new todo item.
 
     Args:
@@ -92,93 +188,113 @@ def create_todo(input: TodoInput) -> str:
     Returns:
         A confirmation message with the created todo's ID
     """
+    deadline_date = None
+    if input.deadline:
+        try:
+            deadline_date = _parse_deadline(input.deadline)
+        except ValueError:
+            return "Invalid date format. Please use YYYY-MM-DD or YYYY-MM-DD HH:MM"
+
     try:
-        db = SessionLocal()
-        
-        deadline_date = None
-        if input.deadline:
-            try:
-                deadline_date = datetime.strptime(input.deadline, "%Y-%m-%d %H:%M")
-            except ValueError:
-                try:
-                    deadline_date = datetime.strptime(input.deadline, "%Y-%m-%d")
-                except ValueError:
-                    return "Invalid date format. Please use YYYY-MM-DD or YYYY-MM-DD HH:MM"
-        
-        todo = TodoItem(
-            title=input.title,
-            description=input.description,
-            priority=input.priority,
-            deadline=deadline_date,
-            category=input.category,
-            status="pending",
-            userId=input.userId
-        )
-        
-        db.add(todo)
-        db.commit()
-        db.refresh(todo)
-        
-        return f"Todo created successfully with ID: {todo.id}"
+        async with AsyncSessionLocal() as db:
+            todo = TodoItem(
+                title=input.title,
+                description=input.description,
+                priority=input.priority,
+                deadline=deadline_date,
+                category=input.category,
+                status="pending",
+                userId=input.userId
+            )
+            
+            db.add(todo)
+            await db.commit()
+            
+            return f"Todo created successfully with ID: {todo.id}"
     
     except Exception as e:
         return f"Error creating todo: {str(e)}"
-    finally:
-        db.close()
+
+def _to_json(value: dict) -> str:
+    """Compact JSON for tool results; Vietnamese text is kept unescaped."""
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":"))
+
+def _todo_filters(input: TodoQueryInput) -> list:
+    """WHERE clauses of a todo listing, without the pagination cursor."""
+    filters = [TodoItem.userId == input.userId]
+    if input.status:
+        filters.append(TodoItem.status == input.status)
+    if input.priority:
+        filters.append(TodoItem.priority == input.priority)
+    if input.category:
+        filters.append(TodoItem.category == input.category)
+    if input.title_contains:
+        filters.append(TodoItem.title.ilike(_contains_pattern(input.title_contains), escape="\\"))
+    if input.deadline_from:
+        filters.append(TodoItem.deadline >= _parse_deadline(input.deadline_from))
+    if input.deadline_to:
+        filters.append(TodoItem.deadline < _deadline_end(input.deadline_to))
+    if not (input.include_past or input.deadline_from):
+        # Chỉ lấy các todo có deadline từ ngày hiện tại trở đi hoặc không có deadline
+        current_date = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+        filters.append(or_(TodoItem.deadline.is_(None), TodoItem.deadline >= current_date))
+    return filters
 
 @tool
-def get_todos(userId: int) -> str:
-    """Get all todo items for a specific user from current date to future.
-    
+async def get_todos(input: TodoQueryInput) -> str:
+    """List the user's todo items, filtered server-side and paginated by ID.
+
+    By default returns undated todos and todos due from today, 20 per page,
+    with the fields id, title, status, priority and deadline.
+
     Args:
-        userId: User ID for filtering todos (required)
-        
+        input: TodoQueryInput object with the filters, fields and page
+
     Returns:
-        A JSON string representation of the user's todos
+        Compact JSON: {"total": <matching todos>, "todos": [...], "next_after_id": <ID or null>}.
+        Pass next_after_id as after_id to fetch the next page.
     """
+    fields = input.fields or DEFAULT_TODO_FIELDS
+    unknown = [name for name in fields if name not in TODO_FIELDS]
+    if unknown:
+        return _to_json({"error": f"Unknown fields: {', '.join(unknown)}. Available: {', '.join(TODO_FIELDS)}"})
+    fields = ["id"] + [name for name in dict.fromkeys(fields) if name != "id"]
+    limit = max(1, min(input.limit, MAX_TODO_PAGE_SIZE))
+
     try:
-        db = SessionLocal()
-        
-        # Lấy ngày hiện tại và đặt giờ về 00:00:00
-        current_date = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
-        
-        # Lọc todo theo userId và chỉ lấy các todo có deadline từ ngày hiện tại trở đi hoặc không có deadline
-        query = db.query(TodoItem).filter(TodoItem.userId == userId,
-            ((TodoItem.deadline.is_(None)) | (TodoItem.deadline >= current_date))
-        )
-        todos = query.all()
-        
-        if not todos:
-            return str({"message": "No todos found", "todos": []})
-        
-        todos_list = []
-        for todo in todos:
-            todo_dict = {
-                "id": todo.id,
-                "title": todo.title,
-                "description": todo.description,
-                "priority": todo.priority,
-                "status": todo.status,
-                "deadline": todo.deadline.strftime('%Y-%m-%d %H:%M') if todo.deadline else None,
-                "category": todo.category,
-                "userId": todo.userId
-            }
-            todos_list.append(todo_dict)
-        
-        result = {
-            "message": f"Found {len(todos_list)} todos",
-            "todos": todos_list
-        }
-        
-        return str(result)
-    
+        filters = _todo_filters(input)
+    except ValueError:
+        return _to_json({"error": "Invalid date format. Please use YYYY-MM-DD or YYYY-MM-DD HH:MM"})
+
+    try:
+        async with AsyncSessionLocal() as db:
+            total = await db.scalar(select(func.count()).select_from(TodoItem).where(*filters))
+            query = select(*(getattr(TodoItem, name) for name in fields)).where(*filters)
+            if input.after_id is not None:
+                query = query.where(TodoItem.id > input.after_id)
+            # One extra row tells whether there is a next page
+            rows = (await db.execute(query.order_by(TodoItem.id).limit(limit + 1))).all()
+
+        todos = []
+        for row in rows[:limit]:
+            todo = {}
+            for name, value in zip(fields, row):
+                if value is None:
+                    continue
+                todo[name] = value.strftime('%Y-%m-%d %H:%M') if isinstance(value, datetime) else value
+            todos.append(todo)
+
+        return _to_json({
+            "total": total,
+            "todos": todos,
+            "next_after_id": todos[-1]["id"] if len(rows) > limit else None
+        })
+
     except Exception as e:
-        return str({"error": f"Error retrieving todos: {str(e)}", "todos": []})
-    finally:
-        db.close()
+        return _to_json({"error": f"Error retrieving todos: {str(e)}"})
 
 @tool
-def update_todo(input: TodoUpdateInput) -> str:
+async def update_todo(input: TodoUpdateInput) -> str:
     """Update an existing todo item with authorization check.
     
     Args:
@@ -187,46 +303,44 @@ def update_todo(input: TodoUpdateInput) -> str:
     Returns:
         A confirmation message or error message
     """
+    deadline_date = None
+    if input.deadline is not None:
+        try:
+            deadline_date = _parse_deadline(input.deadline)
+        except ValueError:
+            return "Invalid date format. Please use YYYY-MM-DD or YYYY-MM-DD HH:MM"
+
     try:
-        db = SessionLocal()
-        
-        query = db.query(TodoItem).filter(TodoItem.id == input.todo_id, TodoItem.userId == input.userId)
-        todo = query.first()
-        
-        if not todo:
-            return f"Todo with ID {input.todo_id} not found or you don't have permission to update it."
-        
-        if input.title is not None:
-            todo.title = input.title
-        if input.description is not None:
-            todo.description = input.description
-        if input.status is not None:
-            todo.status = input.status
-        if input.priority is not None:
-            todo.priority = input.priority
-        if input.category is not None:
-            todo.category = input.category
-        if input.deadline is not None:
-            try:
-                todo.deadline = datetime.strptime(input.deadline, "%Y-%m-%d %H:%M")
-            except ValueError:
-                try:
-                    todo.deadline = datetime.strptime(input.deadline, "%Y-%m-%d")
-                except ValueError:
-                    return "Invalid date format. Please use YYYY-MM-DD or YYYY-MM-DD HH:MM"
-        
-        todo.updatedAt = datetime.utcnow()
-        db.commit()
-        
-        return f"Todo {input.todo_id} updated successfully."
+        async with AsyncSessionLocal() as db:
+            query = select(TodoItem).where(TodoItem.id == input.todo_id, TodoItem.userId == input.userId)
+            todo = await db.scalar(query)
+            
+            if not todo:
+                return f"Todo with ID {input.todo_id} not found or you don't have permission to update it."
+            
+            if input.title is not None:
+                todo.title = input.title
+            if input.description is not None:
+                todo.description = input.description
+            if input.status is not None:
+                todo.status = input.status
+            if input.priority is not None:
+                todo.priority = input.priority
+            if input.category is not None:
+                todo.category = input.category
+            if deadline_date is not None:
+                todo.deadline = deadline_date
+            
+            todo.updatedAt = datetime.utcnow()
+            await db.commit()
+            
+            return f"Todo {input.todo_id} updated successfully."
     
     except Exception as e:
         return f"Error updating todo: {str(e)}"
-    finally:
-        db.close()
 
 @tool
-def delete_todo(todo_id: int, userId: int) -> str:
+async def delete_todo(todo_id: int, userId: int) -> str:
     """Delete a todo item by its ID with user authorization.
     
     Args:
@@ -237,51 +351,134 @@ def delete_todo(todo_id: int, userId: int) -> str:
         A confirmation message or error message
     """
     try:
-        db = SessionLocal()
-        
-        query = db.query(TodoItem).filter(TodoItem.id == todo_id, TodoItem.userId == userId)
-        todo = query.first()
-        
-        if not todo:
-            return f"Todo with ID {todo_id} not found or you don't have permission to delete it."
-        
-        db.delete(todo)
-        db.commit()
-        
-        return f"Todo {todo_id} deleted successfully."
+        async with AsyncSessionLocal() as db:
+            query = select(TodoItem).where(TodoItem.id == todo_id, TodoItem.userId == userId)
+            todo = await db.scalar(query)
+            
+            if not todo:
+                return f"Todo with ID {todo_id} not found or you don't have permission to delete it."
+            
+            await db.delete(todo)
+            await db.commit()
+            
+            return f"Todo {todo_id} deleted successfully."
     
     except Exception as e:
         return f"Error deleting todo: {str(e)}"
-    finally:
-        db.close()
+
+def _batch_values(operation: TodoOperation) -> dict:
+    """Column values set by a create or update operation; raises ValueError on invalid input."""
+    values = {
+        name: getattr(operation, name)
+        for name in ("title", "description", "status", "priority", "category")
+        if getattr(operation, name) is not None
+    }
+    if operation.deadline is not None:
+        try:
+            values["deadline"] = _parse_deadline(operation.deadline)
+        except ValueError:
+            raise ValueError("Invalid date format. Please use YYYY-MM-DD or YYYY-MM-DD HH:MM")
+    if operation.op == "create":
+        if not operation.title:
+            raise ValueError("title is required to create a todo")
+        values = {"priority": "medium", "category": "personal", **values, "status": "pending"}
+    else:
+        if not operation.todo_ids:
+            raise ValueError(f"todo_ids is required to {operation.op} todos")
+        if operation.op == "update" and not values:
+            raise ValueError("nothing to update")
+    return values
+
+@tool
+async def batch_todos(input: TodoBatchInput) -> str:
+    """Create, update and delete several todo items in one call and one transaction.
+
+    Use this instead of calling create_todo/update_todo/delete_todo once per item.
+    All creates are inserted together, each update/delete runs as one statement over
+    its todo_ids (only the user's own todos are changed). Nothing is applied if an
+    operation is invalid or the transaction fails.
+
+    Args:
+        input: TodoBatchInput object with the operations and the user ID
+
+    Returns:
+        Compact JSON with one result per operation, in input order
+    """
+    operations = input.operations
+    if not operations:
+        return _to_json({"error": "No operations given"})
+    if len(operations) > MAX_BATCH_OPERATIONS:
+        return _to_json({"error": f"Too many operations: at most {MAX_BATCH_OPERATIONS} per call"})
+
+    values = []
+    errors = []
+    for index, operation in enumerate(operations):
+        try:
+            values.append(_batch_values(operation))
+        except ValueError as e:
+            errors.append({"index": index, "op": operation.op, "error": str(e)})
+    if errors:
+        return _to_json({"error": "No operation was applied", "invalid": errors})
+
+    results: List[dict] = [{"op": operation.op} for operation in operations]
+    try:
+        async with AsyncSessionLocal() as db, db.begin():
+            creates = [index for index, operation in enumerate(operations) if operation.op == "create"]
+            if creates:
+                rows = [{**values[index], "userId": input.userId} for index in creates]
+                ids = (await db.scalars(
+                    insert(TodoItem).returning(TodoItem.id, sort_by_parameter_order=True), rows
+                )).all()
+                for index, todo_id in zip(creates, ids):
+                    results[index]["id"] = todo_id
+
+            for index, operation in enumerate(operations):
+                if operation.op == "create":
+                    continue
+                target = (TodoItem.id.in_(operation.todo_ids), TodoItem.userId == input.userId)
+                if operation.op == "update":
+                    statement = update(TodoItem).where(*target).values(**values[index], updatedAt=datetime.utcnow())
+                    key = "updated"
+                else:
+                    statement = delete(TodoItem).where(*target)
+                    key = "deleted"
+                changed = set((await db.scalars(statement.returning(TodoItem.id))).all())
+                results[index][key] = sorted(changed)
+                not_found = [todo_id for todo_id in operation.todo_ids if todo_id not in changed]
+                if not_found:
+                    results[index]["not_found"] = not_found
+
+    except Exception as e:
+        return _to_json({"error": f"Error applying batch, no operation was applied: {str(e)}"})
+
+    return _to_json({
+        "created": sum(1 for result in results if "id" in result),
+        "updated": sum(len(result.get("updated", [])) for result in results),
+        "deleted": sum(len(result.get("deleted", [])) for result in results),
+        "results": results
+    })
 
 @tool
-def todo_analytics(input: TodoAnalyticsInput) -> str:
+async def todo_analytics(input: TodoAnalyticsInput) -> str:
     """Analyze todo patterns and provide insights for better productivity."""
+    analyzers = {
+        "productivity": analyze_productivity,
+        "patterns": analyze_patterns,
+        "completion_rate": analyze_completion_rate,
+        "workload": analyze_workload,
+    }
+    analyzer = analyzers.get(input.analysis_type)
+    if analyzer is None:
+        return "Invalid analysis type. Available types: productivity, patterns, completion_rate, workload"
+
     try:
-        db = SessionLocal()
-        
         # Calculate date range using utils helper
         start_date, end_date = get_date_range(input.days_back)
         
-        # Prepare base query with user filtering
-        base_query = db.query(TodoItem).filter(TodoItem.createdAt >= start_date)
-        if input.userId:
-            base_query = base_query.filter(TodoItem.userId == input.userId)
-        
-        # Use analytics helpers from utils with user filtering
-        if input.analysis_type == "productivity":
-            return analyze_productivity(db, start_date, end_date, input.userId)
-        elif input.analysis_type == "patterns":
-            return analyze_patterns(db, start_date, end_date, input.userId)
-        elif input.analysis_type == "completion_rate":
-            return analyze_completion_rate(db, start_date, end_date, input.userId)
-        elif input.analysis_type == "workload":
-            return analyze_workload(db, start_date, end_date, input.userId)
-        else:
-            return "Invalid analysis type. Available types: productivity, patterns, completion_rate, workload"
+        # The analytics helpers use the ORM Session API; run_sync executes them
+        # on the async connection without blocking the event loop.
+        async with AsyncSessionLocal() as db:
+            return await db.run_sync(analyzer, start_date, end_date, input.userId)
     
     except Exception as e:
         return f"Error performing analytics: {str(e)}"
-    finally:
-        db.close()
@@ -1,11 +1,15 @@
 """
 Todo analytics functions for todo data analysis.
+
+Each analysis reads its data with a single aggregate query over the user's
+tasks in the window (COUNT(*) FILTER (WHERE ...) per metric, grouped by the
+breakdown it needs), served by the covering idx_user_created index.
 """
 
 from datetime import datetime, timedelta
-from typing import Optional, Dict, Any, List, Tuple
+from typing import Optional, Dict, Any, Iterable, List, Tuple
 from sqlalchemy.orm import Session
-from sqlalchemy import func, and_, case
+from sqlalchemy import func, and_
 from src.config.database import TodoItem
 from src.utils.database_helpers import get_completion_percentage, safe_average
 from src.utils.date_helpers import get_weekday_name, get_hour_range_string
@@ -16,6 +20,39 @@ from src.analytics.templates import (
     WORKLOAD_TEMPLATE
 )
 
+WEEK_SECONDS = 7 * 24 * 3600
+# Display order of the per-priority breakdowns
+PRIORITY_ORDER = {"high": 0, "medium": 1, "low": 2}
+
+
+def _by_priority(items: List[Tuple]) -> List[Tuple]:
+    """Sort (priority, ...) rows high to low, unknown priorities last."""
+    return sorted(items, key=lambda item: (PRIORITY_ORDER.get(item[0], len(PRIORITY_ORDER)), str(item[0])))
+
+
+def _week_starts(start_date: datetime, end_date: datetime) -> List[datetime]:
+    """Starts of the 7-day windows from start_date (the last one ends at end_date)."""
+    week_starts = []
+    current_date = start_date
+    while current_date < end_date:
+        week_starts.append(current_date)
+        current_date = min(current_date + timedelta(days=7), end_date)
+    return week_starts
+
+
+def _fill_weeks(week_count: int, counts: Iterable[Tuple[int, int, int]]) -> List[List[int]]:
+    """[total, completed] per week from (week index, total, completed) rows.
+
+    Several rows may share a week (one per priority); weeks without rows
+    are filled with zeros and indexes past the last week are dropped.
+    """
+    week_totals = [[0, 0] for _ in range(week_count)]
+    for index, total, completed in counts:
+        if 0 <= index < week_count:
+            week_totals[index][0] += total
+            week_totals[index][1] += completed
+    return week_totals
+
 
 def analyze_productivity(db: Session, start_date: datetime, end_date: datetime, userId: int) -> str:
     """Analyze productivity metrics and patterns."""
@@ -29,61 +66,35 @@ def analyze_productivity(db: Session, start_date: datetime, end_date: datetime,
 
 def _get_productivity_data(db: Session, start_date: datetime, end_date: datetime, userId: int) -> Dict[str, Any]:
     """Extract productivity data from database."""
-    # Total tasks created vs completed
-    query = db.query(TodoItem).filter(TodoItem.createdAt >= start_date)
-    query = query.filter(TodoItem.userId == userId)
-    
-    total_tasks = query.count()
-    completed_tasks = query.filter(TodoItem.status == 'done').count()
-    
-    # Tasks by priority
-    priority_query = db.query(
+    # One pass over the user's tasks in the window, aggregated per priority
+    is_done = TodoItem.status == 'done'
+    completed_with_dates = and_(is_done, TodoItem.updatedAt.isnot(None))
+    priority_stats = db.query(
         TodoItem.priority,
         func.count(TodoItem.id).label('total'),
-        func.sum(case((TodoItem.status == 'done', 1), else_=0)).label('completed')
-    ).filter(TodoItem.createdAt >= start_date)
-    priority_query = priority_query.filter(TodoItem.userId == userId)
-    
-    priority_stats = priority_query.group_by(TodoItem.priority).all()
-    
-    # Overdue tasks
-    overdue_query = db.query(TodoItem).filter(
-        and_(
-            TodoItem.deadline < datetime.now(),
-            TodoItem.status != 'done',
-            TodoItem.createdAt >= start_date
-        )
-    )
-    overdue_query = overdue_query.filter(TodoItem.userId == userId)
-    
-    overdue_tasks = overdue_query.count()
-    
-    # Average completion time for completed tasks
-    completed_query = db.query(TodoItem).filter(
-        and_(
-            TodoItem.status == 'done',
-            TodoItem.createdAt >= start_date,
-            TodoItem.updatedAt.isnot(None)
-        )
-    )
-    completed_query = completed_query.filter(TodoItem.userId == userId)
-    
-    completed_with_dates = completed_query.all()
-    
-    completion_times = []
-    for task in completed_with_dates:
-        if task.updatedAt and task.createdAt:
-            completion_time = (task.updatedAt - task.createdAt).total_seconds() / 3600  # hours
-            completion_times.append(completion_time)
+        func.count(TodoItem.id).filter(is_done).label('completed'),
+        func.count(TodoItem.id).filter(
+            and_(TodoItem.deadline < datetime.now(), TodoItem.status != 'done')
+        ).label('overdue'),
+        func.count(TodoItem.id).filter(completed_with_dates).label('timed'),
+        # Completion time in hours
+        func.sum(
+            func.extract('epoch', TodoItem.updatedAt - TodoItem.createdAt) / 3600
+        ).filter(completed_with_dates).label('hours')
+    ).filter(
+        TodoItem.userId == userId,
+        TodoItem.createdAt >= start_date
+    ).group_by(TodoItem.priority).all()
     
-    avg_completion_time = safe_average(completion_times)
+    timed = sum(row.timed for row in priority_stats)
+    hours = sum(float(row.hours or 0) for row in priority_stats)
     
     return {
-        "total_tasks": total_tasks,
-        "completed_tasks": completed_tasks,
-        "overdue_tasks": overdue_tasks,
-        "priority_stats": priority_stats,
-        "avg_completion_time": avg_completion_time
+        "total_tasks": sum(row.total for row in priority_stats),
+        "completed_tasks": sum(row.completed for row in priority_stats),
+        "overdue_tasks": sum(row.overdue for row in priority_stats),
+        "priority_stats": _by_priority([(row.priority, row.total, row.completed) for row in priority_stats]),
+        "avg_completion_time": hours / timed if timed else 0.0
     }
 
 
@@ -139,26 +150,23 @@ def analyze_patterns(db: Session, start_date: datetime, end_date: datetime, user
 
 def _get_patterns_data(db: Session, start_date: datetime, end_date: datetime, userId: int) -> Dict[str, Any]:
     """Extract pattern data from database."""
-    # Creation patterns by day of week
-    weekday_query = db.query(
-        func.extract('dow', TodoItem.createdAt).label('weekday'),
-        func.count(TodoItem.id).label('count')
-    ).filter(TodoItem.createdAt >= start_date)
-    weekday_query = weekday_query.filter(TodoItem.userId == userId)
-    
-    tasks_by_weekday = weekday_query.group_by('weekday').all()
-    
-    # Creation patterns by hour
-    hour_query = db.query(
-        func.extract('hour', TodoItem.createdAt).label('hour'),
+    # Creation counts per (day of week, hour), summed per axis below
+    weekday = func.extract('dow', TodoItem.createdAt)
+    hour = func.extract('hour', TodoItem.createdAt)
+    rows = db.query(
+        weekday.label('weekday'),
+        hour.label('hour'),
         func.count(TodoItem.id).label('count')
-    ).filter(TodoItem.createdAt >= start_date)
-    hour_query = hour_query.filter(TodoItem.userId == userId)
-    
-    tasks_by_hour = hour_query.group_by('hour').all()
+    ).filter(
+        TodoItem.userId == userId,
+        TodoItem.createdAt >= start_date
+    ).group_by(weekday, hour).all()
     
-    weekday_data = {int(day): count for day, count in tasks_by_weekday}
-    hour_data = {int(hour): count for hour, count in tasks_by_hour}
+    weekday_data: Dict[int, int] = {}
+    hour_data: Dict[int, int] = {}
+    for day, hour_of_day, count in rows:
+        weekday_data[int(day)] = weekday_data.get(int(day), 0) + count
+        hour_data[int(hour_of_day)] = hour_data.get(int(hour_of_day), 0) + count
     
     return {
         "weekday_data": weekday_data,
@@ -230,43 +238,42 @@ def analyze_completion_rate(db: Session, start_date: datetime, end_date: datetim
 
 def _get_completion_rate_data(db: Session, start_date: datetime, end_date: datetime, userId: int) -> Dict[str, Any]:
     """Extract completion rate data from database."""
-    # Weekly completion trends
-    weekly_stats = []
-    current_date = start_date
-    
-    while current_date < end_date:
-        week_end = min(current_date + timedelta(days=7), end_date)
-        
-        week_query = db.query(TodoItem).filter(
-            and_(
-                TodoItem.createdAt >= current_date,
-                TodoItem.createdAt < week_end
-            )
-        )
-        
-        week_query = week_query.filter(TodoItem.userId == userId)
-        
-        total = week_query.count()
-        completed = week_query.filter(TodoItem.status == 'done').count()
-        
-        weekly_stats.append({
-            'week_start': current_date.strftime('%m/%d'),
+    week_starts = _week_starts(start_date, end_date)
+    
+    # One pass grouped by (week index, priority); the per-week counts only take
+    # tasks created before end_date, the per-priority counts take all of them
+    week = func.floor(func.extract('epoch', TodoItem.createdAt - start_date) / WEEK_SECONDS)
+    in_range = TodoItem.createdAt < end_date
+    is_done = TodoItem.status == 'done'
+    rows = db.query(
+        week.label('week'),
+        TodoItem.priority,
+        func.count(TodoItem.id).label('total'),
+        func.count(TodoItem.id).filter(is_done).label('completed'),
+        func.count(TodoItem.id).filter(in_range).label('week_total'),
+        func.count(TodoItem.id).filter(and_(in_range, is_done)).label('week_completed')
+    ).filter(
+        TodoItem.userId == userId,
+        TodoItem.createdAt >= start_date
+    ).group_by(week, TodoItem.priority).all()
+    
+    week_totals = _fill_weeks(len(week_starts), ((int(row.week), row.week_total, row.week_completed) for row in rows))
+    priority_totals: Dict[Any, List[int]] = {}
+    for row in rows:
+        totals = priority_totals.setdefault(row.priority, [0, 0])
+        totals[0] += row.total
+        totals[1] += row.completed
+    
+    weekly_stats = [
+        {
+            'week_start': week_start.strftime('%m/%d'),
             'total': total,
             'completed': completed,
             'rate': get_completion_percentage(completed, total)
-        })
-        
-        current_date = week_end
-    
-    # Completion rate by priority
-    priority_query = db.query(
-        TodoItem.priority,
-        func.count(TodoItem.id).label('total'),
-        func.sum(case((TodoItem.status == 'done', 1), else_=0)).label('completed')
-    ).filter(TodoItem.createdAt >= start_date)
-    priority_query = priority_query.filter(TodoItem.userId == userId)
-    
-    priority_completion = priority_query.group_by(TodoItem.priority).all()
+        }
+        for week_start, (total, completed) in zip(week_starts, week_totals)
+    ]
+    priority_completion = _by_priority([(priority, total, completed) for priority, (total, completed) in priority_totals.items()])
     
     return {
         "weekly_stats": weekly_stats,
@@ -327,54 +334,36 @@ def analyze_workload(db: Session, start_date: datetime, end_date: datetime, user
 
 def _get_workload_data(db: Session, start_date: datetime, end_date: datetime, userId: int) -> Dict[str, Any]:
     """Extract workload data from database."""
-    # Daily task creation
-    daily_query = db.query(
-        func.date(TodoItem.createdAt).label('date'),
-        func.count(TodoItem.id).label('count')
-    ).filter(TodoItem.createdAt >= start_date)
-    daily_query = daily_query.filter(TodoItem.userId == userId)
-    
-    daily_creation = daily_query.group_by('date').order_by('date').all()
-    
-    # Pending tasks accumulation
-    pending_query = db.query(
+    # One pass grouped by (creation date, priority), rolled up per axis below
+    day = func.date(TodoItem.createdAt)
+    rows = db.query(
+        day.label('date'),
         TodoItem.priority,
-        func.count(TodoItem.id).label('count')
+        func.count(TodoItem.id).label('count'),
+        func.count(TodoItem.id).filter(TodoItem.status == 'pending').label('pending'),
+        func.count(TodoItem.id).filter(TodoItem.deadline.isnot(None)).label('with_deadline')
     ).filter(
-        and_(
-            TodoItem.status == 'pending',
-            TodoItem.createdAt >= start_date
-        )
-    )
-    pending_query = pending_query.filter(TodoItem.userId == userId)
-    
-    pending_by_priority = pending_query.group_by(TodoItem.priority).all()
-    
-    # Tasks with due dates
-    due_date_query = db.query(TodoItem).filter(
-        and_(
-            TodoItem.deadline.isnot(None),
-            TodoItem.createdAt >= start_date
-        )
-    )
-    due_date_query = due_date_query.filter(TodoItem.userId == userId)
-    
-    tasks_with_due_dates = due_date_query.count()
-    
-    # Total tasks
-    total_query = db.query(TodoItem).filter(TodoItem.createdAt >= start_date)
-    total_query = total_query.filter(TodoItem.userId == userId)
-    
-    total_tasks = total_query.count()
+        TodoItem.userId == userId,
+        TodoItem.createdAt >= start_date
+    ).group_by(day, TodoItem.priority).order_by(day).all()
+    
+    # Daily task creation (days with at least one task)
+    daily_counts: Dict[Any, int] = {}
+    pending_counts: Dict[Any, int] = {}
+    for row in rows:
+        daily_counts[row.date] = daily_counts.get(row.date, 0) + row.count
+        if row.pending:
+            pending_counts[row.priority] = pending_counts.get(row.priority, 0) + row.pending
+    daily_creation = list(daily_counts.items())
     
     # Creation counts
     creation_counts = [count for _, count in daily_creation]
     
     return {
         "daily_creation": daily_creation,
-        "pending_by_priority": pending_by_priority,
-        "tasks_with_due_dates": tasks_with_due_dates,
-        "total_tasks": total_tasks,
+        "pending_by_priority": _by_priority(list(pending_counts.items())),
+        "tasks_with_due_dates": sum(row.with_deadline for row in rows),
+        "total_tasks": sum(creation_counts),
         "creation_counts": creation_counts
     }
 
@@ -448,57 +437,28 @@ def get_analytics_summary(db: Session, start_date: datetime, end_date: datetime,
         Dictionary with key metrics
     """
     
-    # Total tasks
-    total_query = db.query(TodoItem).filter(TodoItem.createdAt >= start_date)
-    total_query = total_query.filter(TodoItem.userId == userId)
-    total_tasks = total_query.count()
-    
-    # Completed tasks
-    completed_query = db.query(TodoItem).filter(
-        and_(TodoItem.createdAt >= start_date, TodoItem.status == 'done')
-    )
-    completed_query = completed_query.filter(TodoItem.userId == userId)
-    completed_tasks = completed_query.count()
-    
-    # Pending tasks
-    pending_query = db.query(TodoItem).filter(
-        and_(TodoItem.createdAt >= start_date, TodoItem.status == 'pending')
-    )
-    pending_query = pending_query.filter(TodoItem.userId == userId)
-    pending_tasks = pending_query.count()
-    
-    completion_rate = get_completion_percentage(completed_tasks, total_tasks)
-    
-    # High priority pending tasks
-    high_priority_query = db.query(TodoItem).filter(
-        and_(
-            TodoItem.createdAt >= start_date,
-            TodoItem.status == 'pending',
-            TodoItem.priority == "high"
-        )
-    )
-    high_priority_query = high_priority_query.filter(TodoItem.userId == userId)
-    high_priority_pending = high_priority_query.count()
-    
-    # Overdue tasks
-    overdue_query = db.query(TodoItem).filter(
-        and_(
-            TodoItem.deadline < datetime.now(),
-            TodoItem.status == 'pending',
-            TodoItem.createdAt >= start_date
-        )
-    )
-    overdue_query = overdue_query.filter(TodoItem.userId == userId)
-    overdue_tasks = overdue_query.count()
+    # All counts in one pass over the user's tasks in the window
+    is_pending = TodoItem.status == 'pending'
+    counts = db.query(
+        func.count(TodoItem.id).label('total'),
+        func.count(TodoItem.id).filter(TodoItem.status == 'done').label('completed'),
+        func.count(TodoItem.id).filter(is_pending).label('pending'),
+        func.count(TodoItem.id).filter(and_(is_pending, TodoItem.priority == "high")).label('high_priority_pending'),
+        func.count(TodoItem.id).filter(and_(is_pending, TodoItem.deadline < datetime.now())).label('overdue')
+    ).filter(
+        TodoItem.userId == userId,
+        TodoItem.createdAt >= start_date
+    ).one()
     
     result = {
-        "total_tasks": total_tasks,
-        "completed_tasks": completed_tasks,
-        "pending_tasks": pending_tasks,
-        "completion_rate": completion_rate,
-        "high_priority_pending": high_priority_pending,
-        "overdue_tasks": overdue_tasks,
+        "total_tasks": counts.total,
+        "completed_tasks": counts.completed,
+        "pending_tasks": counts.pending,
+        "completion_rate": get_completion_percentage(counts.completed, counts.total),
+        "high_priority_pending": counts.high_priority_pending,
+        "overdue_tasks": counts.overdue,
         "analysis_period_days": (end_date - start_date).days
     }
     
     return result
+
@@ -1,14 +1,52 @@
+import asyncio
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, APIRouter
 from fastapi.middleware.cors import CORSMiddleware
+from langgraph.checkpoint.postgres.aio import AsyncPostgresSaver
+from src.agents.graph import create_graph
+from src.config.checkpointer import create_checkpointer_pool
+from src.agents.summarizer import BackgroundSummarizer
+from src.maintenance.checkpoint_retention import CheckpointRetention, CHECKPOINT_RETENTION_INTERVAL_MINUTES
+from src.config.vector_store import vector_store_crud
 from src.apis.routers.multi_agent_router import router as multi_agent_router
+from src.apis.routers.metrics_router import router as metrics_router
 
 api_router = APIRouter()
 api_router.include_router(multi_agent_router)
+api_router.include_router(metrics_router)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Own the checkpointer pool and the compiled graph for the whole process."""
+    pool = create_checkpointer_pool()
+    await pool.open(wait=True)
+    summarizer = BackgroundSummarizer()
+    retention = CheckpointRetention(pool)
+    retention_task = None
+    try:
+        await vector_store_crud.load_lexical_index()
+        checkpointer = AsyncPostgresSaver(pool)
+        app.state.checkpointer_pool = pool
+        app.state.multi_agent_graph = create_graph().compile(checkpointer=checkpointer)
+        app.state.summarizer = summarizer
+        app.state.checkpoint_retention = retention
+        if CHECKPOINT_RETENTION_INTERVAL_MINUTES > 0:
+            retention_task = asyncio.create_task(retention.run_forever(CHECKPOINT_RETENTION_INTERVAL_MINUTES))
+        yield
+    finally:
+        if retention_task is not None:
+            retention_task.cancel()
+            await asyncio.gather(retention_task, return_exceptions=True)
+        await summarizer.drain()
+        await pool.close()
+        vector_store_crud.flush()
+        await vector_store_crud.aclose()
 
 def create_app():
     app = FastAPI(
         docs_url="/docs",
         title="AI Service",
+        lifespan=lifespan,
     )
 
     @app.get("/")
@@ -25,4 +63,4 @@ def create_app():
         allow_headers=["*"],
     )
 
-    return app
\ No newline at end of file
+    return app
@@ -37,4 +37,10 @@ async def get_current_user(
         return User(user_id=user_id, email=email, role=role)
     
     except jwt.PyJWTError:
-        raise HTTPException(status_code=401, detail="Authentication failed - invalid token")
\ No newline at end of file
+        raise HTTPException(status_code=401, detail="Authentication failed - invalid token")
+
+async def get_current_admin(user: Annotated[User, Depends(get_current_user)]):
+    """Same as get_current_user, restricted to the admin role (403 otherwise)."""
+    if user.role != "admin":
+        raise HTTPException(status_code=403, detail="Admin access required")
+    return user
@@ -0,0 +1,57 @@
+from fastapi import APIRouter, Depends, Request
+from src.apis.middlewares.auth_middleware import get_current_admin
+from src.config.checkpointer import get_pool_stats
+from src.config.database import get_engine_pool_stats
+from src.agents.intent_router import router_stats
+from src.agents.semantic_cache import rag_answer_cache
+from src.agents.context import prompt_token_stats
+from src.config.llm_governor import llm_governor
+from src.config.vector_store import vector_store_crud
+
+# Operational data (pool sizes, queue depths, cache contents): admins only
+router = APIRouter(prefix="/metrics", tags=["Metrics"], dependencies=[Depends(get_current_admin)])
+
+@router.get("/checkpointer-pool")
+async def checkpointer_pool_stats(request: Request):
+    """Connection pool stats of the checkpointer, used to size the pool."""
+    return get_pool_stats(request.app.state.checkpointer_pool)
+
+@router.get("/db")
+async def db_pool_stats():
+    """SQLAlchemy engine pools (tools, analytics): connections in use, overflow and checkout wait times."""
+    return get_engine_pool_stats()
+
+@router.get("/router")
+async def router_path_stats():
+    """How many turns were routed locally (keyword/embedding) vs by the LLM."""
+    return router_stats.snapshot()
+
+@router.get("/semantic-cache")
+async def semantic_cache_stats():
+    """Hit/miss counters and size of the RAG semantic answer cache."""
+    return rag_answer_cache.stats()
+
+@router.get("/embedding-cache")
+async def embedding_cache_stats():
+    """Hit/miss counters of the query embedding cache."""
+    return vector_store_crud.embeddings.stats()
+
+@router.get("/summarizer")
+async def summarizer_stats(request: Request):
+    """Background summarization counters (scheduled, skipped, rebased, aborted, failed, duration)."""
+    return request.app.state.summarizer.stats()
+
+@router.get("/checkpoint-retention")
+async def checkpoint_retention_stats(request: Request):
+    """Retention policy and rows/bytes reclaimed by the last checkpoint retention run."""
+    return request.app.state.checkpoint_retention.stats()
+
+@router.get("/llm-governor")
+async def llm_governor_stats():
+    """LLM admission control: in-flight calls, queue depth (total, users waiting, deepest user queue), wait times and rate limit backoff."""
+    return llm_governor.stats()
+
+@router.get("/prompt-tokens")
+async def prompt_tokens_stats():
+    """Per-node context size sent to the agents and input tokens reported by the model."""
+    return prompt_token_stats.snapshot()
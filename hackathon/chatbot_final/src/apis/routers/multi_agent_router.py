@@ -1,64 +1,155 @@
-from fastapi import APIRouter, status, Depends, Form
+from fastapi import APIRouter, status, Depends, Form, Query, Request
 from fastapi.responses import JSONResponse, StreamingResponse
+from enum import IntEnum
+import asyncio
 import json
+import os
 from langchain_core.messages import HumanMessage
-from src.agents.graph import create_graph
 from src.apis.middlewares.auth_middleware import get_current_user, User
-from typing import Annotated
-from langgraph.checkpoint.postgres.aio import AsyncPostgresSaver
-from psycopg_pool import AsyncConnectionPool
-import os
+from src.config.llm_governor import set_llm_caller
+from typing import Annotated, AsyncIterator
 from dotenv import load_dotenv
 
 load_dotenv()
 
-DB_URI = os.getenv("DB_URI")
-
 router = APIRouter(prefix="/chatbot", tags=["AI"])
 
 user_dependency = Annotated[User, Depends(get_current_user)]
 
-connection_kwargs = {
-    "autocommit": True,
-    "prepare_threshold": None,
-}
-
-async def message_generator(input_graph: dict, config: dict):
-    async with AsyncConnectionPool(DB_URI, kwargs=connection_kwargs) as conn:
-        checkpointer = AsyncPostgresSaver(conn)
-        # await checkpointer.setup()
-        graph = create_graph()
-        multi_agent_graph = graph.compile(checkpointer=checkpointer)
-
-        stream_text = ""
-        async for event in multi_agent_graph.astream_events(
-            input=input_graph,
-            config=config,
-            version="v2",
-        ):
-            if event["event"] == "on_chat_model_stream" and event["metadata"]["langgraph_node"] == "agent":
-                chunk_content = event["data"]["chunk"].content
-                stream_text += chunk_content
-
-                yield json.dumps(
-                    {
-                        "type": "message",
-                        "content": stream_text,
-                    },
-                    ensure_ascii=False,
-                ) + "\n\n"
+class StreamVersion(IntEnum):
+    """Streaming protocol versions (any other value is rejected with a 422)."""
+    LEGACY = 1  # newline separated JSON, each message carries the whole text so far
+    DELTA = 2   # SSE framed deltas with event ids, small chunks coalesced per flush interval
+
+LEGACY_STREAM_VERSION = StreamVersion.LEGACY
+DELTA_STREAM_VERSION = StreamVersion.DELTA
+STREAM_FLUSH_INTERVAL = float(os.getenv("STREAM_FLUSH_INTERVAL_MS", "50")) / 1000
+_STREAM_END = object()
+
+async def stream_deltas(multi_agent_graph, input_graph: dict, config: dict) -> AsyncIterator[str]:
+    """Yield the text chunks produced by the answering agent."""
+    async for event in multi_agent_graph.astream_events(
+        input=input_graph,
+        config=config,
+        version="v2",
+    ):
+        if event["event"] == "on_chat_model_stream" and event["metadata"]["langgraph_node"] == "agent":
+            chunk_content = event["data"]["chunk"].content
+            if chunk_content:
+                yield chunk_content
+        elif event["event"] == "on_custom_event" and event["name"] == "cached_answer":
+            # Semantic cache hit: the whole answer is available at once
+            yield event["data"]["content"]
+
+async def message_generator(multi_agent_graph, input_graph: dict, config: dict):
+    """Legacy (v1) stream: every message repeats the accumulated text."""
+    stream_text = ""
+    async for chunk_content in stream_deltas(multi_agent_graph, input_graph, config):
+        stream_text += chunk_content
 
         yield json.dumps(
             {
-                "type": "final_message",
+                "type": "message",
                 "content": stream_text,
             },
             ensure_ascii=False,
-        )
+        ) + "\n\n"
+
+    yield json.dumps(
+        {
+            "type": "final_message",
+            "content": stream_text,
+        },
+        ensure_ascii=False,
+    )
+
+async def _pump(chunks: AsyncIterator[str], queue: asyncio.Queue) -> None:
+    """Move `chunks` into `queue`, then the end marker (or the error that ended them)."""
+    try:
+        async for chunk in chunks:
+            queue.put_nowait(chunk)
+        queue.put_nowait(_STREAM_END)
+    except Exception as error:
+        queue.put_nowait(error)
+
+def format_sse(event_id: int, event: str, data: dict) -> str:
+    """Encode one Server-Sent Event."""
+    payload = json.dumps(data, ensure_ascii=False, separators=(",", ":"))
+    return f"id: {event_id}\nevent: {event}\ndata: {payload}\n\n"
+
+async def delta_message_generator(
+    multi_agent_graph,
+    input_graph: dict,
+    config: dict,
+    flush_interval: float = STREAM_FLUSH_INTERVAL,
+):
+    """Delta (v2) stream: SSE events carrying only the text added since the last event.
+
+    Chunks arriving within `flush_interval` seconds of the previous event are
+    coalesced into one event, sent when the interval elapses even if the model
+    is still thinking (the graph is read by a separate task, so a slow next
+    chunk never holds back text already received). The final event carries
+    the complete answer once.
+    """
+    event_id = 0
+    yield format_sse(event_id, "start", {"type": "start", "version": DELTA_STREAM_VERSION})
+
+    loop = asyncio.get_running_loop()
+    chunks: asyncio.Queue = asyncio.Queue()
+    producer = asyncio.create_task(_pump(stream_deltas(multi_agent_graph, input_graph, config), chunks))
+    parts = []
+    pending = []
+    last_flush = loop.time()
+    try:
+        while True:
+            timeout = max(0.0, last_flush + flush_interval - loop.time()) if pending else None
+            try:
+                chunk_content = await asyncio.wait_for(chunks.get(), timeout)
+            except asyncio.TimeoutError:
+                pass
+            else:
+                if chunk_content is _STREAM_END:
+                    break
+                if isinstance(chunk_content, Exception):
+                    raise chunk_content
+                parts.append(chunk_content)
+                pending.append(chunk_content)
+
+            now = loop.time()
+            if pending and now - last_flush >= flush_interval:
+                event_id += 1
+                yield format_sse(event_id, "delta", {"type": "delta", "content": "".join(pending)})
+                pending = []
+                last_flush = now
+    finally:
+        # Client gone or graph failed: stop reading the graph
+        producer.cancel()
+
+    if pending:
+        event_id += 1
+        yield format_sse(event_id, "delta", {"type": "delta", "content": "".join(pending)})
+
+    event_id += 1
+    yield format_sse(event_id, "final_message", {"type": "final_message", "content": "".join(parts)})
+
+async def with_background_summary(stream: AsyncIterator[str], summarizer, multi_agent_graph, config: dict):
+    """Pass the stream through, then summarize the thread once the reply is complete."""
+    async for part in stream:
+        yield part
+    summarizer.schedule(multi_agent_graph, config)
 
 @router.post("/stream/{conversation_id}")
-async def multi_agent_stream(user: user_dependency, conversation_id: str, query: str = Form(...)):
+async def multi_agent_stream(
+    request: Request,
+    user: user_dependency,
+    conversation_id: str,
+    query: str = Form(...),
+    stream_version: StreamVersion = Query(DELTA_STREAM_VERSION, description="1 = legacy cumulative JSON, 2 = SSE deltas"),
+):
     try:
+        # LLM calls of this turn queue fairly under this user
+        set_llm_caller(user.user_id, user.role)
+
         config = {
             "configurable": {
                 "thread_id": conversation_id,
@@ -72,19 +163,28 @@ async def multi_agent_stream(user: user_dependency, conversation_id: str, query:
             "messages": [HumanMessage(content=query)],
             "route_decision": "",
             "response": "",
-            "summary": "",
             "user_id": str(user.user_id)
         }
 
+        generator = message_generator if stream_version == LEGACY_STREAM_VERSION else delta_message_generator
+
+        multi_agent_graph = request.app.state.multi_agent_graph
+        stream = generator(
+            multi_agent_graph=multi_agent_graph,
+            input_graph=input_graph,
+            config=config,
+        )
+
         return StreamingResponse(
-            message_generator(
-                input_graph=input_graph,
-                config=config,
-            ),
+            with_background_summary(stream, request.app.state.summarizer, multi_agent_graph, config),
             media_type="text/event-stream",
+            headers={
+                "Cache-Control": "no-cache",
+                "X-Accel-Buffering": "no",
+            },
         )
     except Exception as e:
         return JSONResponse(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             content={"error": f"Streaming error: {str(e)}"},
-        )
\ No newline at end of file
+        )
@@ -0,0 +1,47 @@
+from psycopg_pool import AsyncConnectionPool
+import os
+from dotenv import load_dotenv
+
+load_dotenv()
+
+DB_URI = os.getenv("DB_URI")
+
+# Pool sizing for the LangGraph checkpointer (one pool per process)
+CHECKPOINT_POOL_MIN_SIZE = int(os.getenv("CHECKPOINT_POOL_MIN_SIZE", "2"))
+CHECKPOINT_POOL_MAX_SIZE = int(os.getenv("CHECKPOINT_POOL_MAX_SIZE", "10"))
+CHECKPOINT_POOL_TIMEOUT = float(os.getenv("CHECKPOINT_POOL_TIMEOUT", "30"))
+CHECKPOINT_POOL_MAX_IDLE = float(os.getenv("CHECKPOINT_POOL_MAX_IDLE", "300"))
+CHECKPOINT_POOL_MAX_LIFETIME = float(os.getenv("CHECKPOINT_POOL_MAX_LIFETIME", "1800"))
+
+connection_kwargs = {
+    "autocommit": True,
+    "prepare_threshold": None,
+}
+
+def create_checkpointer_pool() -> AsyncConnectionPool:
+    """Create the (unopened) connection pool shared by the checkpointer.
+
+    Connections are health-checked on checkout so that connections killed by
+    Postgres or a proxy are replaced instead of failing a chat turn.
+    """
+    return AsyncConnectionPool(
+        DB_URI,
+        min_size=CHECKPOINT_POOL_MIN_SIZE,
+        max_size=CHECKPOINT_POOL_MAX_SIZE,
+        timeout=CHECKPOINT_POOL_TIMEOUT,
+        max_idle=CHECKPOINT_POOL_MAX_IDLE,
+        max_lifetime=CHECKPOINT_POOL_MAX_LIFETIME,
+        kwargs=connection_kwargs,
+        check=AsyncConnectionPool.check_connection,
+        name="checkpointer",
+        open=False,
+    )
+
+def get_pool_stats(pool: AsyncConnectionPool) -> dict:
+    """Return sizing information and counters of a connection pool."""
+    return {
+        "name": pool.name,
+        "min_size": pool.min_size,
+        "max_size": pool.max_size,
+        "stats": pool.get_stats(),
+    }
@@ -1,8 +1,14 @@
-from sqlalchemy import create_engine, Column, Integer, String, DateTime, Text, Index
+from sqlalchemy import create_engine, Column, Integer, String, DateTime, Text, Index, text, event, exc
+from sqlalchemy.engine import Engine
 from sqlalchemy.orm import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from sqlalchemy.pool import QueuePool, AsyncAdaptedQueuePool
+from collections import deque
 from datetime import datetime, timezone
 import os
+import threading
+import time
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -10,12 +16,146 @@ load_dotenv()
 # Database configuration
 DB_URI = os.getenv("DB_URI")
 
-engine = create_engine(DB_URI)
+def _to_async_uri(uri: str) -> str:
+    """Point a postgres URI at the psycopg (v3) driver, which supports asyncio."""
+    scheme, sep, rest = uri.partition("://")
+    if scheme.split("+")[0] in ("postgres", "postgresql"):
+        return f"postgresql+psycopg{sep}{rest}"
+    return uri
+
+ASYNC_DB_URI = os.getenv("ASYNC_DB_URI") or _to_async_uri(DB_URI)
+
+# Pool settings, applied to each engine (per process)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "10"))
+# Connections older than this are replaced on checkout (seconds, -1 disables)
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+# Test connections on checkout so a Postgres restart or failover does not fail a tool call
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() == "true"
+# Server-side limit per statement (milliseconds, 0 disables)
+DB_STATEMENT_TIMEOUT_MS = int(os.getenv("DB_STATEMENT_TIMEOUT_MS", "15000"))
+DB_APPLICATION_NAME = os.getenv("DB_APPLICATION_NAME", "fbot-chatbot")
+POOL_WAIT_SAMPLES = 1000
+
+class PoolWaitStats:
+    """Checkout wait times of a pool (time spent in `_do_get`, including opening a new connection)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._waits = deque(maxlen=POOL_WAIT_SAMPLES)
+        self.checkouts = 0
+        self.timeouts = 0
+        self.invalidated = 0
+        self.total_wait = 0.0
+
+    def record(self, seconds: float, timed_out: bool = False) -> None:
+        with self._lock:
+            self._waits.append(seconds)
+            self.total_wait += seconds
+            if timed_out:
+                self.timeouts += 1
+            else:
+                self.checkouts += 1
+
+    def record_invalidated(self) -> None:
+        with self._lock:
+            self.invalidated += 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            waits = sorted(self._waits)
+            counters = {
+                "checkouts": self.checkouts,
+                "timeouts": self.timeouts,
+                "invalidated": self.invalidated,
+                "total_wait_s": self.total_wait,
+            }
+
+        def pct(p: float) -> float:
+            return waits[min(len(waits) - 1, int(p * len(waits)))] * 1000 if waits else 0.0
+
+        return {**counters, "wait_ms": {"p50": pct(0.5), "p95": pct(0.95), "max": waits[-1] * 1000 if waits else 0.0}}
+
+class InstrumentedPoolMixin:
+    """Times every checkout; mixed into the queue pool used by each engine."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.wait_stats = PoolWaitStats()
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except exc.TimeoutError:
+            self.wait_stats.record(time.perf_counter() - start, timed_out=True)
+            raise
+        self.wait_stats.record(time.perf_counter() - start)
+        return connection
+
+class InstrumentedQueuePool(InstrumentedPoolMixin, QueuePool):
+    pass
+
+class InstrumentedAsyncQueuePool(InstrumentedPoolMixin, AsyncAdaptedQueuePool):
+    pass
+
+def _connect_args() -> dict:
+    args = {"application_name": DB_APPLICATION_NAME}
+    if DB_STATEMENT_TIMEOUT_MS > 0:
+        args["options"] = f"-c statement_timeout={DB_STATEMENT_TIMEOUT_MS}"
+    return args
+
+_pool_kwargs = {
+    "pool_size": DB_POOL_SIZE,
+    "max_overflow": DB_MAX_OVERFLOW,
+    "pool_timeout": DB_POOL_TIMEOUT,
+    "pool_recycle": DB_POOL_RECYCLE,
+    "pool_pre_ping": DB_POOL_PRE_PING,
+}
+
+engine = create_engine(DB_URI, poolclass=InstrumentedQueuePool, connect_args=_connect_args(), **_pool_kwargs)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+# Async engine for code running on the event loop (agent tools).
+# Prepared statements are disabled as for the checkpointer, so it works behind pgbouncer.
+async_engine = create_async_engine(
+    ASYNC_DB_URI,
+    poolclass=InstrumentedAsyncQueuePool,
+    connect_args={**_connect_args(), "prepare_threshold": None},
+    **_pool_kwargs,
+)
+
+def _count_invalidated(bind: Engine) -> None:
+    """Count connections discarded as broken (failed pre-ping or a disconnect error)."""
+    def on_invalidate(dbapi_connection, connection_record, exception):
+        wait_stats = getattr(bind.pool, "wait_stats", None)
+        if wait_stats is not None:
+            wait_stats.record_invalidated()
+    event.listen(bind, "invalidate", on_invalidate)
+
+_count_invalidated(engine)
+_count_invalidated(async_engine.sync_engine)
+AsyncSessionLocal = async_sessionmaker(bind=async_engine, autoflush=False, expire_on_commit=False)
 Base = declarative_base()
 
 class TodoItem(Base):
     __tablename__ = "todos"
+    # Composite indexes for the tool and analytics query shapes (every query filters on userId).
+    # Create them on an existing database with `python -m src.maintenance.todo_indexes --migrate`.
+    __table_args__ = (
+        Index('idx_user_status', 'userId', 'status'),
+        # Covering: analytics counts and groups a user's tasks created in a window by status,
+        # priority and deadline (and count(id)), answered by an index-only scan
+        Index('idx_user_created', 'userId', 'createdAt', postgresql_include=['status', 'priority', 'deadline', 'id']),
+        Index('idx_status_deadline', 'status', 'deadline'),
+        Index('idx_user_priority', 'userId', 'priority'),
+        # Completed tasks with their completion time (average completion time)
+        Index('idx_user_done_created', 'userId', 'createdAt', postgresql_include=['updatedAt'],
+              postgresql_where=text("status = 'done'")),
+        # Open tasks by deadline (overdue counts)
+        Index('idx_user_open_deadline', 'userId', 'deadline', postgresql_where=text("status <> 'done'")),
+    )
     
     id = Column(Integer, primary_key=True)
     userId = Column(Integer, nullable=False, index=True)
@@ -28,14 +168,39 @@ class TodoItem(Base):
     createdAt = Column(DateTime, default=lambda: datetime.now(timezone.utc), index=True)
     updatedAt = Column(DateTime, default=lambda: datetime.now(timezone.utc), onupdate=lambda: datetime.now(timezone.utc))
 
+class KnowledgeBaseVersion(Base):
+    """Single row counting changes to the knowledge base, shared by every process."""
+    __tablename__ = "knowledge_base_version"
+
+    id = Column(Integer, primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
+    updatedAt = Column(DateTime, default=lambda: datetime.now(timezone.utc), onupdate=lambda: datetime.now(timezone.utc))
+
 def create_tables():
+    # Also creates the indexes declared in TodoItem.__table_args__ and the knowledge base version table
     Base.metadata.create_all(bind=engine)
-    
-    # Create composite indexes for common query patterns
-    Index('idx_user_status', TodoItem.userId, TodoItem.status)
-    Index('idx_user_created', TodoItem.userId, TodoItem.createdAt)
-    Index('idx_status_deadline', TodoItem.status, TodoItem.deadline)
-    Index('idx_user_priority', TodoItem.userId, TodoItem.priority)
+
+def _engine_pool_stats(bind: Engine) -> dict:
+    pool = bind.pool
+    stats = {
+        "pool_size": pool.size(),
+        "max_overflow": DB_MAX_OVERFLOW,
+        "checked_out": pool.checkedout(),
+        "checked_in": pool.checkedin(),
+        # Connections open beyond pool_size (negative while the pool is still filling)
+        "overflow": pool.overflow(),
+    }
+    wait_stats = getattr(pool, "wait_stats", None)
+    if wait_stats is not None:
+        stats.update(wait_stats.snapshot())
+    return stats
+
+def get_engine_pool_stats() -> dict:
+    """Connections in use, overflow and checkout waits of the SQLAlchemy engines."""
+    return {
+        "sync": _engine_pool_stats(engine),
+        "async": _engine_pool_stats(async_engine.sync_engine),
+    }
 
 def get_db():
     db = SessionLocal()
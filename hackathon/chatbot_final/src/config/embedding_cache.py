@@ -0,0 +1,181 @@
+"""
+LRU cache of query embeddings.
+
+Wraps an Embeddings model so that repeated queries are not re-embedded.
+Entries are keyed by model name and normalized query. When a cache directory
+is configured the vectors live in a memory-mapped file (one directory per
+model) so the cache survives restarts. The slot table is rewritten every
+FLUSH_EVERY new entries, in a worker thread for async callers, and on shutdown.
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import re
+import threading
+import unicodedata
+from collections import OrderedDict
+from typing import List, Optional
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+# Persist the slot table every N new entries (the vectors are in the memmap already)
+FLUSH_EVERY = 100
+
+
+def normalize_query(text: str) -> str:
+    """NFC-normalize and collapse whitespace; casing is kept (course codes)."""
+    text = unicodedata.normalize("NFC", text)
+    return re.sub(r"\s+", " ", text).strip()
+
+
+class CachedQueryEmbeddings(Embeddings):
+    """Embeddings wrapper with a bounded LRU of normalized query -> vector."""
+
+    def __init__(
+        self,
+        embeddings: Embeddings,
+        model_name: str,
+        max_entries: int = 10000,
+        cache_dir: Optional[str] = None,
+    ):
+        self.embeddings = embeddings
+        self.model_name = model_name
+        self.max_entries = max_entries
+        self.cache_dir = None
+        if cache_dir:
+            model_hash = hashlib.sha1(model_name.encode("utf-8")).hexdigest()[:12]
+            self.cache_dir = os.path.join(cache_dir, model_hash)
+        self._lock = threading.Lock()
+        # Serializes writers of index.json (async callers flush from worker threads)
+        self._flush_lock = threading.Lock()
+        self._slots: "OrderedDict[str, int]" = OrderedDict()
+        self._free: List[int] = []
+        self._vectors: Optional[np.ndarray] = None
+        self._unflushed = 0
+        self.hits = 0
+        self.misses = 0
+        if self.cache_dir:
+            self._load()
+
+    # Storage
+
+    def _vectors_path(self) -> str:
+        return os.path.join(self.cache_dir, "vectors.f32")
+
+    def _index_path(self) -> str:
+        return os.path.join(self.cache_dir, "index.json")
+
+    def _allocate(self, dim: int) -> None:
+        if self.cache_dir:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            self._vectors = np.memmap(self._vectors_path(), dtype=np.float32, mode="w+", shape=(self.max_entries, dim))
+        else:
+            self._vectors = np.zeros((self.max_entries, dim), dtype=np.float32)
+        self._free = list(range(self.max_entries - 1, -1, -1))
+
+    def _load(self) -> None:
+        try:
+            with open(self._index_path(), encoding="utf-8") as f:
+                index = json.load(f)
+        except (OSError, ValueError):
+            return
+        if index.get("model_name") != self.model_name or index.get("capacity") != self.max_entries:
+            return
+        try:
+            self._vectors = np.memmap(self._vectors_path(), dtype=np.float32, mode="r+", shape=(self.max_entries, index["dim"]))
+        except (OSError, ValueError):
+            return
+        self._slots = OrderedDict((key, slot) for key, slot in index["slots"])
+        used = set(self._slots.values())
+        self._free = [slot for slot in range(self.max_entries - 1, -1, -1) if slot not in used]
+
+    def flush(self) -> None:
+        """Write the memory-mapped vectors and the slot table to disk."""
+        if not self.cache_dir or self._vectors is None:
+            return
+        with self._flush_lock:
+            with self._lock:
+                index = {
+                    "model_name": self.model_name,
+                    "capacity": self.max_entries,
+                    "dim": int(self._vectors.shape[1]),
+                    "slots": list(self._slots.items()),
+                }
+                self._unflushed = 0
+            self._vectors.flush()
+            tmp_path = self._index_path() + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(index, f, ensure_ascii=False)
+            os.replace(tmp_path, self._index_path())
+
+    # Cache operations
+
+    def _get(self, key: str) -> Optional[List[float]]:
+        with self._lock:
+            slot = self._slots.get(key)
+            if slot is None:
+                self.misses += 1
+                return None
+            self._slots.move_to_end(key)
+            self.hits += 1
+            return self._vectors[slot].tolist()
+
+    def _put(self, key: str, vector: List[float]) -> bool:
+        """Store a vector; returns whether the slot table is due for a flush."""
+        with self._lock:
+            if self._vectors is None:
+                self._allocate(len(vector))
+            if key in self._slots:
+                return False
+            if not self._free:
+                _, evicted_slot = self._slots.popitem(last=False)
+                self._free.append(evicted_slot)
+            slot = self._free.pop()
+            self._vectors[slot] = vector
+            self._slots[key] = slot
+            self._unflushed += 1
+            if self._unflushed < FLUSH_EVERY or not self.cache_dir:
+                return False
+            # Reset here so the next puts do not schedule the same flush again
+            self._unflushed = 0
+            return True
+
+    def embed_query(self, text: str) -> List[float]:
+        query = normalize_query(text)
+        vector = self._get(query)
+        if vector is None:
+            vector = self.embeddings.embed_query(query)
+            if self._put(query, vector):
+                self.flush()
+        return vector
+
+    async def aembed_query(self, text: str) -> List[float]:
+        query = normalize_query(text)
+        vector = self._get(query)
+        if vector is None:
+            vector = await self.embeddings.aembed_query(query)
+            if self._put(query, vector):
+                await asyncio.to_thread(self.flush)
+        return vector
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.embeddings.embed_documents(texts)
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        return await self.embeddings.aembed_documents(texts)
+
+    def stats(self) -> dict:
+        with self._lock:
+            size = len(self._slots)
+        total = self.hits + self.misses
+        return {
+            "model_name": self.model_name,
+            "size": size,
+            "max_entries": self.max_entries,
+            "persistent": bool(self.cache_dir),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / total if total else 0.0,
+        }
@@ -0,0 +1,118 @@
+"""
+Embedding model factory.
+
+Chooses the device automatically (CUDA, then MPS, then CPU) and the
+inference backend from EMBEDDING_BACKEND:
+  - torch       fp32 sentence-transformers (default, also for "auto")
+  - torch-int8  dynamic int8 quantization of the Linear layers (CPU only)
+  - onnx        ONNX Runtime through sentence-transformers' onnx backend;
+                EMBEDDING_ONNX_FILE selects a quantized export if available
+
+The faster backends are opt-in: their vectors drift slightly from fp32 ones,
+so queries must be embedded with the backend the index was built with. The
+index records the `model_signature` it was built with and refuses queries
+(local index) or re-embeds (ingest CLI) when it changes.
+"""
+
+import os
+from typing import Optional
+from langchain_huggingface import HuggingFaceEmbeddings
+from dotenv import load_dotenv
+
+load_dotenv()
+
+EMBEDDING_MODEL_NAME = os.getenv("EMBEDDING_MODEL_NAME", "Alibaba-NLP/gte-multilingual-base")
+EMBEDDING_DEVICE = os.getenv("EMBEDDING_DEVICE", "auto")        # auto, cpu, cuda, mps
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "torch")     # torch, torch-int8, onnx (auto = torch)
+EMBEDDING_ONNX_FILE = os.getenv("EMBEDDING_ONNX_FILE", "")      # e.g. onnx/model_qint8_avx512_vnni.onnx
+EMBEDDING_NUM_THREADS = int(os.getenv("EMBEDDING_NUM_THREADS", "0"))  # 0 = library default
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", "32"))
+
+BACKENDS = ("torch", "torch-int8", "onnx")
+
+
+def select_device(preferred: str = EMBEDDING_DEVICE) -> str:
+    """Return `preferred`, or the best available device when it is 'auto'."""
+    if preferred != "auto":
+        return preferred
+    try:
+        import torch
+
+        if torch.cuda.is_available():
+            return "cuda"
+        if torch.backends.mps.is_available():
+            return "mps"
+    except ImportError:
+        pass
+    return "cpu"
+
+
+def select_backend(device: str, preferred: str = EMBEDDING_BACKEND) -> str:
+    """Return `preferred`; 'auto' is fp32 torch on every device, quantized backends are opt-in."""
+    if preferred == "auto":
+        return "torch"
+    if preferred not in BACKENDS:
+        raise ValueError(f"Unknown embedding backend '{preferred}'. Available: {', '.join(BACKENDS)}")
+    if preferred == "torch-int8" and device != "cpu":
+        raise ValueError("The torch-int8 backend only runs on CPU")
+    return preferred
+
+
+def model_signature(model_name: str, backend: str) -> str:
+    """Identify the vectors a model/backend pair produces (quantized vectors differ slightly)."""
+    if backend == "onnx" and EMBEDDING_ONNX_FILE:
+        return f"{model_name}:{backend}:{EMBEDDING_ONNX_FILE}"
+    return f"{model_name}:{backend}"
+
+
+def create_embeddings(
+    model_name: str = EMBEDDING_MODEL_NAME,
+    device: Optional[str] = None,
+    backend: Optional[str] = None,
+    num_threads: int = EMBEDDING_NUM_THREADS,
+    batch_size: int = EMBEDDING_BATCH_SIZE,
+) -> HuggingFaceEmbeddings:
+    """Create normalized HuggingFace embeddings on the selected device and backend."""
+    device = device or select_device()
+    backend = select_backend(device, backend or EMBEDDING_BACKEND)
+
+    model_kwargs = {
+        "device": device,
+        "trust_remote_code": True,  # Required for Alibaba GTE models
+    }
+
+    if backend == "onnx":
+        import onnxruntime
+
+        onnx_kwargs = {"provider": "CUDAExecutionProvider" if device == "cuda" else "CPUExecutionProvider"}
+        if EMBEDDING_ONNX_FILE:
+            onnx_kwargs["file_name"] = EMBEDDING_ONNX_FILE
+        if num_threads:
+            session_options = onnxruntime.SessionOptions()
+            session_options.intra_op_num_threads = num_threads
+            onnx_kwargs["session_options"] = session_options
+        model_kwargs["backend"] = "onnx"
+        model_kwargs["model_kwargs"] = onnx_kwargs
+    elif num_threads:
+        import torch
+
+        torch.set_num_threads(num_threads)
+
+    embeddings = HuggingFaceEmbeddings(
+        model_name=model_name,
+        model_kwargs=model_kwargs,
+        encode_kwargs={
+            "normalize_embeddings": True,
+            "batch_size": batch_size,
+        },
+    )
+
+    if backend == "torch-int8":
+        import torch
+
+        # Quantize the SentenceTransformer held by the embeddings in place
+        torch.quantization.quantize_dynamic(
+            embeddings._client, {torch.nn.Linear}, dtype=torch.qint8, inplace=True
+        )
+
+    return embeddings
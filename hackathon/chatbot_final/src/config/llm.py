@@ -1,10 +1,80 @@
-from langchain_google_genai import ChatGoogleGenerativeAI
+"""
+Model registry: each graph node binds its own model, temperature, output
+token limit and timeout.
+
+Routing and summarization run on every (long) conversation and only need a
+short answer, so they default to the low-latency flash-lite tier; the agents
+use flash. Any value can be overridden per node from the environment, e.g.
+LLM_ROUTER_MODEL, LLM_RAG_AGENT_TEMPERATURE, LLM_SUMMARIZE_MAX_OUTPUT_TOKENS,
+LLM_ANALYTIC_AGENT_TIMEOUT.
+"""
+
+import os
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Dict, Optional
+from langchain_core.language_models.chat_models import BaseChatModel
+from src.config.llm_governor import GovernedChatGoogleGenerativeAI
 from dotenv import load_dotenv
 
 load_dotenv()
 
-llm = ChatGoogleGenerativeAI(
-    model="gemini-2.5-flash",
-    temperature=0.3,
-    max_retries=2,
-)
\ No newline at end of file
+LLM_MODEL = os.getenv("LLM_MODEL", "gemini-2.5-flash")
+LLM_FAST_MODEL = os.getenv("LLM_FAST_MODEL", "gemini-2.5-flash-lite")
+
+
+@dataclass(frozen=True)
+class ModelConfig:
+    model: str
+    temperature: float = 0.3
+    max_output_tokens: Optional[int] = None
+    timeout: Optional[float] = None
+
+
+DEFAULT_NODE_MODELS: Dict[str, ModelConfig] = {
+    "router": ModelConfig(LLM_FAST_MODEL, temperature=0.0, max_output_tokens=32, timeout=10),
+    "summarize": ModelConfig(LLM_FAST_MODEL, temperature=0.2, max_output_tokens=512, timeout=30),
+    "rag_agent": ModelConfig(LLM_MODEL, temperature=0.3, timeout=60),
+    "schedule_agent": ModelConfig(LLM_MODEL, temperature=0.1, timeout=60),
+    "generic_agent": ModelConfig(LLM_MODEL, temperature=0.5, timeout=60),
+    "analytic_agent": ModelConfig(LLM_MODEL, temperature=0.3, timeout=90),
+}
+DEFAULT_MODEL_CONFIG = ModelConfig(LLM_MODEL, temperature=0.3)
+
+
+def _env(node: str, name: str) -> Optional[str]:
+    return os.getenv(f"LLM_{node.upper()}_{name}") or None
+
+
+def model_config(node: str) -> ModelConfig:
+    """Configuration of `node`: registry default with environment overrides applied."""
+    config = DEFAULT_NODE_MODELS.get(node, DEFAULT_MODEL_CONFIG)
+    max_output_tokens = _env(node, "MAX_OUTPUT_TOKENS")
+    timeout = _env(node, "TIMEOUT")
+    temperature = _env(node, "TEMPERATURE")
+    return ModelConfig(
+        model=_env(node, "MODEL") or config.model,
+        temperature=float(temperature) if temperature else config.temperature,
+        max_output_tokens=int(max_output_tokens) if max_output_tokens else config.max_output_tokens,
+        timeout=float(timeout) if timeout else config.timeout,
+    )
+
+
+@lru_cache(maxsize=None)
+def _create_llm(config: ModelConfig) -> BaseChatModel:
+    # Async calls are admitted by the LLM governor, which also retries rate limited calls
+    return GovernedChatGoogleGenerativeAI(
+        model=config.model,
+        temperature=config.temperature,
+        max_output_tokens=config.max_output_tokens,
+        timeout=config.timeout,
+        max_retries=1,
+    )
+
+
+def get_llm(node: str) -> BaseChatModel:
+    """Chat model bound to graph node `node`; nodes with the same configuration share one client."""
+    return _create_llm(model_config(node))
+
+
+llm = get_llm("default")
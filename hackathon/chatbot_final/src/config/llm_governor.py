@@ -0,0 +1,223 @@
+"""
+Admission control for LLM calls.
+
+Every LLM call acquires a slot from the governor before reaching the provider:
+  - at most LLM_MAX_CONCURRENCY calls are in flight per process
+  - waiting calls queue per user and are admitted by weighted round robin, so
+    a burst from one user (or one class of students) only delays that user
+  - a 429 from the provider pauses admissions for everyone (shared exponential
+    backoff) instead of each call retrying on its own
+
+The user of a call is read from a context variable set by the request handler
+(`set_llm_caller`); calls outside a request share the "system" queue.
+"""
+
+import asyncio
+import logging
+import os
+import time
+from collections import OrderedDict, deque
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Deque, Dict, List, Optional
+from google.api_core.exceptions import ResourceExhausted
+from langchain_core.messages import BaseMessage
+from langchain_core.outputs import ChatGenerationChunk, ChatResult
+from langchain_google_genai import ChatGoogleGenerativeAI
+from dotenv import load_dotenv
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "16"))
+# Retries of a rate limited call, each after the shared backoff
+LLM_RATE_LIMIT_RETRIES = int(os.getenv("LLM_RATE_LIMIT_RETRIES", "3"))
+LLM_BACKOFF_INITIAL = float(os.getenv("LLM_BACKOFF_INITIAL_SECONDS", "1"))
+LLM_BACKOFF_MAX = float(os.getenv("LLM_BACKOFF_MAX_SECONDS", "30"))
+# Admissions per round robin turn, by role, e.g. "admin:2,user:1"
+LLM_ROLE_WEIGHTS = {
+    role.strip(): int(weight)
+    for role, weight in (item.split(":") for item in os.getenv("LLM_ROLE_WEIGHTS", "").split(",") if ":" in item)
+}
+WAIT_SAMPLES = 1000
+
+
+@dataclass(frozen=True)
+class LLMCaller:
+    user: str
+    weight: int = 1
+
+
+SYSTEM_CALLER = LLMCaller("system")
+current_llm_caller: ContextVar[LLMCaller] = ContextVar("current_llm_caller", default=SYSTEM_CALLER)
+
+
+def set_llm_caller(user_id: Any, role: Optional[str] = None) -> None:
+    """Attribute the LLM calls of the current request (and the tasks it spawns) to a user."""
+    current_llm_caller.set(LLMCaller(str(user_id), max(1, LLM_ROLE_WEIGHTS.get(role or "", 1))))
+
+
+class LLMGovernor:
+    """Global concurrency cap with per-user weighted round robin queues."""
+
+    def __init__(self, max_concurrency: int = LLM_MAX_CONCURRENCY):
+        self.max_concurrency = max_concurrency
+        self._active = 0
+        # user -> waiting futures; order of keys is the round robin ring
+        self._queues: "OrderedDict[str, Deque[asyncio.Future]]" = OrderedDict()
+        self._credits: Dict[str, int] = {}
+        self._weights: Dict[str, int] = {}
+        self._backoff_until = 0.0
+        self._backoff = 0.0
+        self._wakeup: Optional[asyncio.TimerHandle] = None
+        self._waits: Deque[float] = deque(maxlen=WAIT_SAMPLES)
+        self._counters = {"admitted": 0, "queued": 0, "rate_limited": 0, "cancelled": 0}
+
+    @property
+    def queue_depth(self) -> int:
+        return sum(len(queue) for queue in self._queues.values())
+
+    def _backing_off(self) -> bool:
+        return time.monotonic() < self._backoff_until
+
+    async def acquire(self, caller: LLMCaller) -> None:
+        start = time.monotonic()
+        if self._active < self.max_concurrency and not self._queues and not self._backing_off():
+            self._active += 1
+        else:
+            future = asyncio.get_running_loop().create_future()
+            self._queues.setdefault(caller.user, deque()).append(future)
+            self._weights[caller.user] = caller.weight
+            self._counters["queued"] += 1
+            self._dispatch()
+            try:
+                await future
+            except asyncio.CancelledError:
+                self._counters["cancelled"] += 1
+                if future.done() and not future.cancelled():
+                    # Admitted just before the cancellation: give the slot back
+                    self.release()
+                raise
+        self._counters["admitted"] += 1
+        self._waits.append(time.monotonic() - start)
+
+    def release(self) -> None:
+        self._active -= 1
+        self._dispatch()
+
+    def _next_user(self) -> Optional[str]:
+        """Weighted round robin: the head user is served `weight` times, then rotated to the back."""
+        while self._queues:
+            user, queue = next(iter(self._queues.items()))
+            while queue and queue[0].done():
+                queue.popleft()  # cancelled waiter
+            if not queue:
+                del self._queues[user]
+                self._credits.pop(user, None)
+                continue
+            credits = self._credits.get(user) or self._weights.get(user, 1)
+            credits -= 1
+            if credits > 0:
+                self._credits[user] = credits
+            else:
+                self._credits.pop(user, None)
+                self._queues.move_to_end(user)
+            return user
+        return None
+
+    def _dispatch(self) -> None:
+        if self._backing_off():
+            self._schedule_wakeup()
+            return
+        while self._active < self.max_concurrency:
+            user = self._next_user()
+            if user is None:
+                return
+            future = self._queues[user].popleft()
+            self._active += 1
+            future.set_result(None)
+
+    def _schedule_wakeup(self) -> None:
+        if not self._backing_off() or self._wakeup is not None:
+            return
+        delay = self._backoff_until - time.monotonic()
+
+        def wake() -> None:
+            self._wakeup = None
+            self._dispatch()
+
+        self._wakeup = asyncio.get_running_loop().call_later(delay, wake)
+
+    def rate_limited(self) -> float:
+        """Pause admissions after a 429; returns the backoff in seconds."""
+        self._counters["rate_limited"] += 1
+        self._backoff = min(LLM_BACKOFF_MAX, self._backoff * 2 if self._backoff else LLM_BACKOFF_INITIAL)
+        self._backoff_until = max(self._backoff_until, time.monotonic() + self._backoff)
+        logger.warning("LLM rate limited, pausing admissions for %.1fs", self._backoff)
+        return self._backoff
+
+    def succeeded(self) -> None:
+        self._backoff = 0.0
+
+    def stats(self) -> dict:
+        waits = sorted(self._waits)
+
+        def pct(p: float) -> float:
+            return waits[min(len(waits) - 1, int(p * len(waits)))] * 1000 if waits else 0.0
+
+        return {
+            **self._counters,
+            "max_concurrency": self.max_concurrency,
+            "active": self._active,
+            "queue_depth": self.queue_depth,
+            "queued_users": len(self._queues),
+            "max_user_queue_depth": max((len(queue) for queue in self._queues.values()), default=0),
+            "backoff_remaining_s": max(0.0, self._backoff_until - time.monotonic()),
+            "wait_ms": {"p50": pct(0.5), "p95": pct(0.95), "max": waits[-1] * 1000 if waits else 0.0},
+        }
+
+
+llm_governor = LLMGovernor()
+
+
+class GovernedChatGoogleGenerativeAI(ChatGoogleGenerativeAI):
+    """Gemini chat model whose async calls go through `llm_governor`.
+
+    The provider client makes a single attempt (max_retries=1); rate limited
+    calls are retried here after the shared backoff.
+    """
+
+    async def _agenerate(self, messages: List[BaseMessage], *args: Any, **kwargs: Any) -> ChatResult:
+        caller = current_llm_caller.get()
+        for attempt in range(LLM_RATE_LIMIT_RETRIES + 1):
+            await llm_governor.acquire(caller)
+            try:
+                result = await super()._agenerate(messages, *args, **kwargs)
+                llm_governor.succeeded()
+                return result
+            except ResourceExhausted:
+                llm_governor.rate_limited()
+                if attempt == LLM_RATE_LIMIT_RETRIES:
+                    raise
+            finally:
+                llm_governor.release()
+
+    async def _astream(self, messages: List[BaseMessage], *args: Any, **kwargs: Any) -> AsyncIterator[ChatGenerationChunk]:
+        caller = current_llm_caller.get()
+        for attempt in range(LLM_RATE_LIMIT_RETRIES + 1):
+            await llm_governor.acquire(caller)
+            started = False
+            try:
+                async for chunk in super()._astream(messages, *args, **kwargs):
+                    started = True
+                    yield chunk
+                llm_governor.succeeded()
+                return
+            except ResourceExhausted:
+                llm_governor.rate_limited()
+                # Chunks already streamed to the client cannot be retried
+                if started or attempt == LLM_RATE_LIMIT_RETRIES:
+                    raise
+            finally:
+                llm_governor.release()
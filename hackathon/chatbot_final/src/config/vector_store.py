@@ -1,41 +1,332 @@
 from langchain_pinecone import PineconeVectorStore
-from langchain_huggingface import HuggingFaceEmbeddings
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, AsyncIterator, Tuple, Union
 from langchain.schema import Document
 from langchain.vectorstores import VectorStore
+from src.config.embedding_cache import CachedQueryEmbeddings
+from src.retrieval.local_index import LocalVectorStore, matches_filter
+from src.retrieval.bm25 import BM25Index, reciprocal_rank_fusion
+from src.retrieval.knowledge_version import bump_knowledge_version
+from src.config.embeddings import create_embeddings, select_device, select_backend, model_signature, EMBEDDING_MODEL_NAME
 from dotenv import load_dotenv
+import asyncio
+import bisect
+import logging
+import os
 
 load_dotenv()
 
+EMBEDDING_CACHE_SIZE = int(os.getenv("EMBEDDING_CACHE_SIZE", "10000"))
+# Directory for the memory-mapped query embedding cache; empty keeps it in memory only
+EMBEDDING_CACHE_DIR = os.getenv("EMBEDDING_CACHE_DIR", "")
+# "pinecone" (school-info index) or "local" (in-process IVF index, no network)
+VECTOR_STORE_BACKEND = os.getenv("VECTOR_STORE_BACKEND", "pinecone")
+LOCAL_VECTOR_STORE_PATH = os.getenv("LOCAL_VECTOR_STORE_PATH", "data/vector_store")
+# Hybrid retrieval: BM25 over the same chunks (kept up to date by the writes below,
+# built from scratch by `src.retrieval.ingest --rebuild-bm25`), fused with dense search by reciprocal rank
+HYBRID_SEARCH = os.getenv("HYBRID_SEARCH", "false").lower() == "true"
+HYBRID_CANDIDATES = int(os.getenv("HYBRID_CANDIDATES", "20"))
+BM25_INDEX_PATH = os.getenv("BM25_INDEX_PATH", "data/bm25_index.json")
+
+logger = logging.getLogger(__name__)
+
+# Projections supported by VectorStoreCRUD.iter_documents
+PROJECTIONS = ("full", "metadata", "ids")
+# Pinecone's top_k cap: filtered iteration over Pinecone refuses filters matching more documents
+PINECONE_FILTER_SCAN_LIMIT = 10000
+
+
+def _project(document: Document, projection: str) -> Union[Document, str]:
+    if projection == "ids":
+        return document.id
+    if projection == "metadata":
+        return Document(id=document.id, page_content="", metadata=document.metadata)
+    return document
+
+
 class VectorStoreCRUD:
     def __init__(self, k: int = 3, score_threshold: float = 0.3) -> VectorStore:
-        self.embeddings = HuggingFaceEmbeddings(
-            model_name="Alibaba-NLP/gte-multilingual-base",
-            model_kwargs={
-                'device': 'cuda',  # Dùng 'cuda' nếu có GPU
-                'trust_remote_code': True  # Required for Alibaba GTE models
-            },
-            encode_kwargs={'normalize_embeddings': True}  # Normalize embeddings
-        )
-        self.vector_store = PineconeVectorStore(
-            index_name="school-info",
-            embedding=self.embeddings
+        # Device and inference backend are chosen from the environment (CPU-only nodes included)
+        device = select_device()
+        backend = select_backend(device)
+        base_embeddings = create_embeddings(EMBEDDING_MODEL_NAME, device=device, backend=backend)
+        self.model_signature = model_signature(EMBEDDING_MODEL_NAME, backend)
+        self.embeddings = CachedQueryEmbeddings(
+            base_embeddings,
+            model_name=self.model_signature,
+            max_entries=EMBEDDING_CACHE_SIZE,
+            cache_dir=EMBEDDING_CACHE_DIR or None,
         )
+        if VECTOR_STORE_BACKEND == "local":
+            self.vector_store = LocalVectorStore(
+                LOCAL_VECTOR_STORE_PATH, embedding=self.embeddings, model_signature=self.model_signature
+            )
+        elif VECTOR_STORE_BACKEND == "pinecone":
+            self.vector_store = PineconeVectorStore(
+                index_name="school-info",
+                embedding=self.embeddings
+            )
+        else:
+            raise ValueError(f"Unknown VECTOR_STORE_BACKEND '{VECTOR_STORE_BACKEND}'. Use 'pinecone' or 'local'")
+        self.k = k
+        self.score_threshold = score_threshold
         self.retriever = self.vector_store.as_retriever(
             search_type="similarity_score_threshold",
             search_kwargs={"k": k, "score_threshold": score_threshold},
         )
+        # Updated by add/delete; searches reload it when another process rewrote the file
+        self.lexical_index = BM25Index(BM25_INDEX_PATH) if HYBRID_SEARCH else None
+        self._lexical_lock = asyncio.Lock()
+        # One Pinecone client for the direct index calls (fetch, upsert, list), closed by `aclose`
+        self._pinecone_index = None
+
+    async def search(self, query: str, filter: Optional[Dict[str, Any]] = None, k: Optional[int] = None):
+        """Top-k chunks for `query`: dense results, fused with BM25 results when hybrid search is on.
+
+        BM25 scores have no relevance threshold, so lexical hits are only fused
+        in when some dense result passed `score_threshold`: an off-topic
+        question sharing a few words with a chunk still retrieves nothing.
+        """
+        k = k or self.k
+        if self.lexical_index is None:
+            return await self.dense_search(query, k, filter)
+        dense, lexical = await asyncio.gather(
+            self.dense_search(query, HYBRID_CANDIDATES, filter),
+            self.lexical_search(query, HYBRID_CANDIDATES, filter),
+        )
+        if not dense:
+            return []
+        return reciprocal_rank_fusion([dense, lexical], k)
+
+    async def dense_search(self, query: str, k: int, filter: Optional[Dict[str, Any]] = None) -> List[Document]:
+        results = await self.vector_store.asimilarity_search_with_relevance_scores(
+            query, k, filter=filter, score_threshold=self.score_threshold
+        )
+        return [doc for doc, _ in results]
+
+    async def lexical_search(self, query: str, k: int, filter: Optional[Dict[str, Any]] = None) -> List[Document]:
+        if self.lexical_index is None:
+            return []
+        await self._reload_lexical_index_if_changed()
+        # Over-fetch when filtering, the BM25 index does not know the metadata
+        hits = await asyncio.to_thread(self.lexical_index.search, query, k * 3 if filter else k)
+        documents = await self.get_documents_by_ids([doc_id for doc_id, _ in hits])
+        return [doc for doc in documents if matches_filter(doc.metadata, filter)][:k]
+
+    async def get_documents_by_ids(self, ids: List[str]) -> List[Document]:
+        """Fetch documents by id, in the order of `ids` (missing ids are skipped)."""
+        if not ids:
+            return []
+        if isinstance(self.vector_store, LocalVectorStore):
+            return await asyncio.to_thread(self.vector_store.get_by_ids, ids)
+        return await self._fetch_pinecone_documents(self.pinecone_index(), ids)
+
+    def pinecone_index(self):
+        """The shared asyncio client of the Pinecone index (each `async_index` access opens a new session)."""
+        if self._pinecone_index is None:
+            self._pinecone_index = self.vector_store.async_index
+        return self._pinecone_index
+
+    async def aclose(self) -> None:
+        """Close the Pinecone client (on shutdown)."""
+        if self._pinecone_index is not None:
+            await self._pinecone_index.close()
+            self._pinecone_index = None
 
-    async def search(self, query: str, filter: Optional[Dict[str, Any]] = None):
-        return await self.retriever.ainvoke(query, filter=filter)
+    async def _fetch_pinecone_documents(self, index, ids: List[str]) -> List[Document]:
+        fetched = await index.fetch(ids=ids, namespace=self.vector_store._namespace)
+        documents = []
+        for doc_id in ids:
+            vector = fetched.vectors.get(doc_id)
+            if vector is None:
+                continue
+            metadata = dict(vector.metadata or {})
+            text = metadata.pop(self.vector_store._text_key, "")
+            documents.append(Document(id=doc_id, page_content=text, metadata=metadata))
+        return documents
+
+    async def load_lexical_index(self) -> None:
+        """Load the BM25 index written by the ingest CLI; search stays dense-only while there is none."""
+        if self.lexical_index is None:
+            return
+        if await asyncio.to_thread(self.lexical_index.load):
+            logger.info("BM25 index loaded with %d documents", len(self.lexical_index))
+        else:
+            logger.warning(
+                "No BM25 index at %s, hybrid search returns dense results only. "
+                "Build it with: python -m src.retrieval.ingest <source dir> --rebuild-bm25",
+                BM25_INDEX_PATH,
+            )
+
+    async def _reload_lexical_index_if_changed(self) -> None:
+        if not await asyncio.to_thread(self.lexical_index.changed_on_disk):
+            return
+        async with self._lexical_lock:
+            await self._reload_lexical_index_locked()
+
+    async def _reload_lexical_index_locked(self) -> None:
+        if await asyncio.to_thread(self.lexical_index.changed_on_disk):
+            await asyncio.to_thread(self.lexical_index.load)
+            logger.info("BM25 index reloaded with %d documents", len(self.lexical_index))
+
+    async def _update_lexical_index(
+        self,
+        add: Optional[List[Document]] = None,
+        ids: Optional[List[str]] = None,
+        delete: Optional[List[str]] = None,
+        persist: bool = True,
+    ) -> None:
+        """Apply a write to the BM25 index, on top of the latest copy on disk."""
+        if self.lexical_index is None:
+            return
+        async with self._lexical_lock:
+            await self._reload_lexical_index_locked()
+            if delete:
+                await asyncio.to_thread(self.lexical_index.delete, delete)
+            if add:
+                await asyncio.to_thread(self.lexical_index.add, ids, [doc.page_content for doc in add])
+            if persist:
+                await asyncio.to_thread(self.lexical_index.save)
+
+    async def save_lexical_index(self) -> None:
+        """Persist BM25 updates made with persist_lexical=False."""
+        if self.lexical_index is not None:
+            async with self._lexical_lock:
+                await asyncio.to_thread(self.lexical_index.save)
+
+    def flush(self) -> None:
+        """Persist the query embedding cache."""
+        self.embeddings.flush()
 
     async def add_documents(self, documents: List[Document], ids: List[str]):
         await self.vector_store.aadd_documents(documents, ids=ids)
+        await self._update_lexical_index(add=documents, ids=ids)
+        # Shared with the other processes so their caches invalidate
+        await bump_knowledge_version()
+
+    async def add_embedded_documents(
+        self,
+        documents: List[Document],
+        vectors: List[List[float]],
+        ids: List[str],
+        persist_lexical: bool = True,
+    ):
+        """Upsert documents whose vectors were already computed (bulk ingestion).
+
+        persist_lexical=False defers rewriting the BM25 file to `save_lexical_index`.
+        """
+        if isinstance(self.vector_store, LocalVectorStore):
+            await asyncio.to_thread(
+                self.vector_store.add_embeddings,
+                [doc.page_content for doc in documents],
+                vectors,
+                [doc.metadata for doc in documents],
+                ids,
+            )
+        else:
+            text_key = self.vector_store._text_key
+            metadatas = [{**doc.metadata, text_key: doc.page_content} for doc in documents]
+            await self.pinecone_index().upsert(vectors=list(zip(ids, vectors, metadatas)), namespace=self.vector_store._namespace)
+        await self._update_lexical_index(add=documents, ids=ids, persist=persist_lexical)
+        await bump_knowledge_version()
+
+    async def iter_document_pages(
+        self,
+        filter: Optional[Dict[str, Any]] = None,
+        page_size: int = 100,
+        projection: str = "full",
+        cursor: Optional[str] = None,
+    ) -> AsyncIterator[Tuple[List[Union[Document, str]], Optional[str]]]:
+        """Page through the documents matching `filter`, without embedding a query.
+
+        Yields (items, next_cursor); pass next_cursor back as `cursor` to resume.
+        Items are Documents for the "full" projection, Documents with empty
+        page_content for "metadata" and plain ids for "ids". Pages can be
+        shorter than `page_size` when a filter is set on the local index.
+        On Pinecone the filter runs server-side and at most
+        PINECONE_FILTER_SCAN_LIMIT documents may match it; a cursor is only
+        valid for the filter it was returned with.
+        """
+        if projection not in PROJECTIONS:
+            raise ValueError(f"Unknown projection '{projection}'. Use one of: {', '.join(PROJECTIONS)}")
+        if isinstance(self.vector_store, LocalVectorStore):
+            pages = self._iter_local_pages(filter, page_size, projection, cursor)
+        else:
+            pages = self._iter_pinecone_pages(filter, page_size, projection, cursor)
+        async for items, next_cursor in pages:
+            if items:
+                yield items, next_cursor
+
+    async def iter_documents(
+        self,
+        filter: Optional[Dict[str, Any]] = None,
+        page_size: int = 100,
+        projection: str = "full",
+    ) -> AsyncIterator[Union[Document, str]]:
+        """Iterate over every document matching `filter`, one page in memory at a time."""
+        async for items, _ in self.iter_document_pages(filter, page_size, projection):
+            for item in items:
+                yield item
+
+    async def _iter_local_pages(self, filter, page_size, projection, cursor):
+        store = self.vector_store
+        next_row = int(cursor) if cursor else 0
+        while next_row is not None:
+            rows, next_row = await asyncio.to_thread(store.scan, next_row, page_size)
+            if projection == "ids" and not filter:
+                items = [store.id_of(row) for row in rows]
+            else:
+                documents = await asyncio.to_thread(lambda: [store.read_row(row) for row in rows])
+                items = [_project(doc, projection) for doc in documents if matches_filter(doc.metadata, filter)]
+            yield items, None if next_row is None else str(next_row)
+
+    async def _iter_pinecone_pages(self, filter, page_size, projection, cursor):
+        if filter:
+            async for page in self._iter_pinecone_filtered_pages(filter, page_size, projection, cursor):
+                yield page
+            return
+        # Index listing is only available on serverless indexes; one list page holds at most 100 ids
+        namespace = self.vector_store._namespace
+        index = self.pinecone_index()
+        token = cursor
+        while True:
+            listing = await index.list_paginated(limit=min(page_size, 100), pagination_token=token, namespace=namespace)
+            ids = [item.id for item in listing.vectors or []]
+            token = listing.pagination.next if listing.pagination else None
+            if projection == "ids" or not ids:
+                items = ids
+            else:
+                items = [_project(doc, projection) for doc in await self._fetch_pinecone_documents(index, ids)]
+            yield items, token
+            if not token:
+                return
+
+    async def _iter_pinecone_filtered_pages(self, filter, page_size, projection, cursor):
+        # Listing cannot filter, so ask a query for every match: any unit vector will do since
+        # top_k covers all of them. Ids are sorted so the last id of a page is the cursor.
+        namespace = self.vector_store._namespace
+        index = self.pinecone_index()
+        dimension = (await index.describe_index_stats()).dimension
+        probe = [1.0] + [0.0] * (dimension - 1)
+        response = await index.query(
+            vector=probe, filter=filter, top_k=PINECONE_FILTER_SCAN_LIMIT, namespace=namespace, include_metadata=False
+        )
+        ids = sorted(match.id for match in response.matches)
+        if len(ids) >= PINECONE_FILTER_SCAN_LIMIT:
+            raise ValueError(f"The filter matches {PINECONE_FILTER_SCAN_LIMIT} documents or more, narrow it down: {filter}")
+        if cursor:
+            ids = ids[bisect.bisect_right(ids, cursor):]
+        page_size = min(page_size, 100)
+        for start in range(0, len(ids), page_size):
+            page = ids[start:start + page_size]
+            items = page if projection == "ids" else [_project(doc, projection) for doc in await self._fetch_pinecone_documents(index, page)]
+            yield items, page[-1] if start + page_size < len(ids) else None
 
-    async def get_documents(self, filter: Optional[Dict[str, Any]] = None):
-        return await self.vector_store.asimilarity_search("", 10000, filter=filter)
+    async def get_documents(self, filter: Optional[Dict[str, Any]] = None) -> List[Document]:
+        return [doc async for doc in self.iter_documents(filter)]
 
-    async def delete_documents(self, ids: List[str]):
+    async def delete_documents(self, ids: List[str], persist_lexical: bool = True):
         await self.vector_store.adelete(ids=ids)
+        await self._update_lexical_index(delete=ids, persist=persist_lexical)
+        await bump_knowledge_version()
 
 vector_store_crud = VectorStoreCRUD()
\ No newline at end of file
@@ -0,0 +1,22 @@
+"""
+Maintenance package for the chatbot service.
+Contains database housekeeping jobs, runnable as CLIs or from the API lifespan.
+"""
+
+from .checkpoint_retention import (
+    CheckpointRetention,
+    RetentionReport
+)
+from .todo_indexes import (
+    migrate as migrate_todo_indexes,
+    verify as verify_todo_indexes,
+    VerifyReport
+)
+
+__all__ = [
+    'CheckpointRetention',
+    'RetentionReport',
+    'migrate_todo_indexes',
+    'verify_todo_indexes',
+    'VerifyReport',
+]
@@ -0,0 +1,304 @@
+"""
+Retention for the LangGraph checkpoint tables.
+
+AsyncPostgresSaver writes a checkpoint (plus channel blobs and pending writes)
+for every graph step and never deletes any. This job walks threads in
+thread_id order, in batches, and per batch:
+  - deletes threads idle for longer than the TTL from all three tables
+  - keeps only the latest N root checkpoints (checkpoint_ns = '') of every
+    other thread. The agents run as subgraphs under a namespace that is new
+    every turn, so their checkpoints are not counted per namespace: those
+    older than the oldest kept root checkpoint belong to finished turns and
+    are deleted
+  - compacts checkpoint_writes: writes of a checkpoint that already has a
+    child were applied and are dropped (the task writes a kept checkpoint
+    reads as pending sends are kept)
+  - deletes channel blobs no remaining checkpoint references, including
+    those of the deleted subgraph namespaces
+Threads active within the grace period are left alone, so a turn that is
+writing its checkpoint never loses a blob.
+
+Usage (from chatbot_final/):
+    python -m src.maintenance.checkpoint_retention --dry-run
+    python -m src.maintenance.checkpoint_retention --keep 5 --ttl-days 30 --vacuum
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import time
+from dataclasses import asdict, dataclass, field
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional
+from psycopg_pool import AsyncConnectionPool
+from langgraph.checkpoint.serde.types import TASKS
+from src.config.checkpointer import create_checkpointer_pool
+from dotenv import load_dotenv
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+CHECKPOINT_KEEP_LATEST = int(os.getenv("CHECKPOINT_KEEP_LATEST", "5"))
+CHECKPOINT_THREAD_TTL_DAYS = float(os.getenv("CHECKPOINT_THREAD_TTL_DAYS", "30"))
+CHECKPOINT_RETENTION_GRACE_MINUTES = float(os.getenv("CHECKPOINT_RETENTION_GRACE_MINUTES", "10"))
+CHECKPOINT_RETENTION_BATCH = int(os.getenv("CHECKPOINT_RETENTION_BATCH", "200"))
+# 0 disables the periodic task started by the API lifespan
+CHECKPOINT_RETENTION_INTERVAL_MINUTES = float(os.getenv("CHECKPOINT_RETENTION_INTERVAL_MINUTES", "0"))
+
+RETENTION_LOCK_KEY = "checkpoint_retention"
+
+SELECT_THREADS_SQL = """
+    SELECT thread_id, max((checkpoint ->> 'ts')::timestamptz) AS last_ts
+    FROM checkpoints
+    WHERE thread_id > %(after)s
+    GROUP BY thread_id
+    ORDER BY thread_id
+    LIMIT %(limit)s
+"""
+
+DELETE_THREAD_SQL = {
+    "checkpoints": """
+        WITH d AS (
+            DELETE FROM checkpoints WHERE thread_id = ANY(%(threads)s)
+            RETURNING pg_column_size(checkpoints.*) AS bytes
+        ) SELECT count(*), coalesce(sum(bytes), 0) FROM d
+    """,
+    "checkpoint_writes": """
+        WITH d AS (
+            DELETE FROM checkpoint_writes WHERE thread_id = ANY(%(threads)s)
+            RETURNING pg_column_size(checkpoint_writes.*) AS bytes
+        ) SELECT count(*), coalesce(sum(bytes), 0) FROM d
+    """,
+    "checkpoint_blobs": """
+        WITH d AS (
+            DELETE FROM checkpoint_blobs WHERE thread_id = ANY(%(threads)s)
+            RETURNING pg_column_size(checkpoint_blobs.*) AS bytes
+        ) SELECT count(*), coalesce(sum(bytes), 0) FROM d
+    """,
+}
+
+# Order matters: writes and blobs are judged against the checkpoints that remain
+PRUNE_SQL = {
+    "checkpoints": """
+        WITH kept AS (
+            SELECT thread_id, min(checkpoint_id) AS oldest_kept
+            FROM (
+                SELECT thread_id, checkpoint_id,
+                       row_number() OVER (PARTITION BY thread_id ORDER BY checkpoint_id DESC) AS rn
+                FROM checkpoints
+                WHERE thread_id = ANY(%(threads)s) AND checkpoint_ns = ''
+            ) AS root
+            WHERE rn <= %(keep)s
+            GROUP BY thread_id
+        ), d AS (
+            -- checkpoint ids are time ordered across namespaces
+            DELETE FROM checkpoints c
+            USING kept k
+            WHERE c.thread_id = k.thread_id
+              AND c.checkpoint_id < k.oldest_kept
+            RETURNING pg_column_size(c.*) AS bytes
+        ) SELECT count(*), coalesce(sum(bytes), 0) FROM d
+    """,
+    "checkpoint_writes": """
+        WITH d AS (
+            DELETE FROM checkpoint_writes w
+            WHERE w.thread_id = ANY(%(threads)s)
+              -- keep the writes of leaf checkpoints (no child checkpoint yet)
+              AND NOT EXISTS (
+                  SELECT 1 FROM checkpoints c
+                  WHERE c.thread_id = w.thread_id
+                    AND c.checkpoint_ns = w.checkpoint_ns
+                    AND c.checkpoint_id = w.checkpoint_id
+                    AND NOT EXISTS (
+                        SELECT 1 FROM checkpoints child
+                        WHERE child.thread_id = c.thread_id
+                          AND child.checkpoint_ns = c.checkpoint_ns
+                          AND child.parent_checkpoint_id = c.checkpoint_id
+                    )
+              )
+              -- keep the task writes that kept checkpoints load as pending sends
+              AND NOT (
+                  w.channel = %(tasks)s AND EXISTS (
+                      SELECT 1 FROM checkpoints c
+                      WHERE c.thread_id = w.thread_id
+                        AND c.checkpoint_ns = w.checkpoint_ns
+                        AND c.parent_checkpoint_id = w.checkpoint_id
+                  )
+              )
+            RETURNING pg_column_size(w.*) AS bytes
+        ) SELECT count(*), coalesce(sum(bytes), 0) FROM d
+    """,
+    "checkpoint_blobs": """
+        WITH d AS (
+            DELETE FROM checkpoint_blobs b
+            WHERE b.thread_id = ANY(%(threads)s)
+              AND NOT EXISTS (
+                  SELECT 1 FROM checkpoints c
+                  WHERE c.thread_id = b.thread_id
+                    AND c.checkpoint_ns = b.checkpoint_ns
+                    AND c.checkpoint -> 'channel_versions' ->> b.channel = b.version
+              )
+            RETURNING pg_column_size(b.*) AS bytes
+        ) SELECT count(*), coalesce(sum(bytes), 0) FROM d
+    """,
+}
+
+TABLES = ("checkpoints", "checkpoint_writes", "checkpoint_blobs")
+
+
+@dataclass
+class RetentionReport:
+    started_at: str = ""
+    dry_run: bool = False
+    threads_scanned: int = 0
+    threads_expired: int = 0
+    threads_pruned: int = 0
+    rows_deleted: Dict[str, int] = field(default_factory=lambda: dict.fromkeys(TABLES, 0))
+    bytes_reclaimed: Dict[str, int] = field(default_factory=lambda: dict.fromkeys(TABLES, 0))
+    seconds: float = 0.0
+    skipped: bool = False
+
+    def add(self, table: str, rows: int, size: int) -> None:
+        self.rows_deleted[table] += rows
+        self.bytes_reclaimed[table] += size
+
+    def summary(self) -> str:
+        lines = [
+            f"threads: {self.threads_scanned} scanned, {self.threads_expired} expired, {self.threads_pruned} pruned"
+            + (" (dry run, rolled back)" if self.dry_run else ""),
+        ]
+        for table in TABLES:
+            lines.append(f"{table}: {self.rows_deleted[table]} rows, {self.bytes_reclaimed[table] / 1024:.1f} KiB")
+        lines.append(f"elapsed: {self.seconds:.1f}s")
+        return "\n".join(lines)
+
+
+class _DryRunRollback(Exception):
+    pass
+
+
+class CheckpointRetention:
+    """Runs the retention policy over the checkpointer's connection pool."""
+
+    def __init__(
+        self,
+        pool: AsyncConnectionPool,
+        keep_latest: int = CHECKPOINT_KEEP_LATEST,
+        ttl_days: float = CHECKPOINT_THREAD_TTL_DAYS,
+        grace_minutes: float = CHECKPOINT_RETENTION_GRACE_MINUTES,
+        batch_size: int = CHECKPOINT_RETENTION_BATCH,
+    ):
+        if keep_latest < 1:
+            raise ValueError("keep_latest must be at least 1: the latest checkpoint is the thread's state")
+        self.pool = pool
+        self.keep_latest = keep_latest
+        self.ttl = timedelta(days=ttl_days)
+        self.grace = timedelta(minutes=grace_minutes)
+        self.batch_size = batch_size
+        self.last_report: Optional[RetentionReport] = None
+
+    async def _delete(self, conn, statements: Dict[str, str], params: dict, report: RetentionReport) -> None:
+        for table in TABLES:
+            cursor = await conn.execute(statements[table], params)
+            rows, size = await cursor.fetchone()
+            report.add(table, rows, size)
+
+    async def _process_batch(self, conn, threads: List[str], expired: List[str], report: RetentionReport, dry_run: bool) -> None:
+        try:
+            async with conn.transaction():
+                if expired:
+                    await self._delete(conn, DELETE_THREAD_SQL, {"threads": expired}, report)
+                if threads:
+                    params = {"threads": threads, "keep": self.keep_latest, "tasks": TASKS}
+                    await self._delete(conn, PRUNE_SQL, params, report)
+                if dry_run:
+                    raise _DryRunRollback()
+        except _DryRunRollback:
+            pass
+
+    async def run(self, dry_run: bool = False) -> RetentionReport:
+        """Apply the policy to every thread, one transaction per batch."""
+        report = RetentionReport(started_at=datetime.now(timezone.utc).isoformat(), dry_run=dry_run)
+        start = time.perf_counter()
+        async with self.pool.connection() as conn:
+            cursor = await conn.execute("SELECT pg_try_advisory_lock(hashtext(%s))", (RETENTION_LOCK_KEY,))
+            if not (await cursor.fetchone())[0]:
+                logger.info("checkpoint retention already running in another process, skipping")
+                report.skipped = True
+                return report
+            try:
+                after = ""
+                while True:
+                    now = datetime.now(timezone.utc)
+                    cursor = await conn.execute(SELECT_THREADS_SQL, {"after": after, "limit": self.batch_size})
+                    rows = await cursor.fetchall()
+                    if not rows:
+                        break
+                    after = rows[-1][0]
+                    rows = [(thread, last_ts) for thread, last_ts in rows if last_ts is not None]
+                    expired = [thread for thread, last_ts in rows if last_ts < now - self.ttl]
+                    prunable = [thread for thread, last_ts in rows if now - self.ttl <= last_ts < now - self.grace]
+                    await self._process_batch(conn, prunable, expired, report, dry_run)
+                    report.threads_scanned += len(rows)
+                    report.threads_expired += len(expired)
+                    report.threads_pruned += len(prunable)
+            finally:
+                await conn.execute("SELECT pg_advisory_unlock(hashtext(%s))", (RETENTION_LOCK_KEY,))
+        report.seconds = time.perf_counter() - start
+        self.last_report = report
+        logger.info("checkpoint retention finished\n%s", report.summary())
+        return report
+
+    async def vacuum(self) -> None:
+        """VACUUM (ANALYZE) the checkpoint tables so freed space is reused and stats are fresh."""
+        async with self.pool.connection() as conn:
+            for table in TABLES:
+                await conn.execute(f"VACUUM (ANALYZE) {table}")
+
+    async def run_forever(self, interval_minutes: float) -> None:
+        """Periodic task for the API lifespan; errors are logged and retried next interval."""
+        while True:
+            await asyncio.sleep(interval_minutes * 60)
+            try:
+                await self.run()
+            except Exception:
+                logger.exception("checkpoint retention failed")
+
+    def stats(self) -> dict:
+        return {
+            "keep_latest": self.keep_latest,
+            "ttl_days": self.ttl.total_seconds() / 86400,
+            "last_run": asdict(self.last_report) if self.last_report else None,
+        }
+
+
+async def main(args: argparse.Namespace) -> None:
+    pool = create_checkpointer_pool()
+    await pool.open(wait=True)
+    try:
+        retention = CheckpointRetention(
+            pool,
+            keep_latest=args.keep,
+            ttl_days=args.ttl_days,
+            grace_minutes=args.grace_minutes,
+            batch_size=args.batch_size,
+        )
+        report = await retention.run(dry_run=args.dry_run)
+        print(report.summary())
+        if args.vacuum and not args.dry_run:
+            await retention.vacuum()
+    finally:
+        await pool.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--keep", type=int, default=CHECKPOINT_KEEP_LATEST, help="root checkpoints kept per thread")
+    parser.add_argument("--ttl-days", type=float, default=CHECKPOINT_THREAD_TTL_DAYS, help="delete threads idle for longer")
+    parser.add_argument("--grace-minutes", type=float, default=CHECKPOINT_RETENTION_GRACE_MINUTES)
+    parser.add_argument("--batch-size", type=int, default=CHECKPOINT_RETENTION_BATCH, help="threads per transaction")
+    parser.add_argument("--dry-run", action="store_true", help="report what would be deleted, then roll back")
+    parser.add_argument("--vacuum", action="store_true", help="VACUUM (ANALYZE) the tables afterwards")
+    asyncio.run(main(parser.parse_args()))
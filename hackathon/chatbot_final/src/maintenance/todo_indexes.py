@@ -0,0 +1,225 @@
+"""
+Migration and plan verifier for the indexes of the todos table.
+
+The indexes are declared on `TodoItem.__table_args__`. `create_all` only
+creates them with a new table, so `--migrate` creates the missing ones on an
+existing database: CONCURRENTLY, so the table stays writable, and rebuilding
+any index left invalid by an interrupted build.
+
+`--verify` runs every analytics function once, captures the SQL it emits and
+EXPLAINs each statement with `enable_seqscan = off`. With seq scans
+penalized, a query still planned as a seq scan on todos has no usable index,
+whatever the size of the table. It also counts the statements of each
+analysis, which should compute its data in at most MAX_ANALYTICS_QUERIES
+aggregate queries. The command exits with status 1 when a declared index is
+missing or invalid, a query seq scans or an analysis issues more statements.
+
+Usage (from chatbot_final/):
+    python -m src.maintenance.todo_indexes --migrate
+    python -m src.maintenance.todo_indexes --verify --user-id 1 --days 30
+"""
+
+import argparse
+import logging
+import sys
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Iterator, List, Tuple
+from sqlalchemy import event, text
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.orm import Session
+from sqlalchemy.schema import CreateIndex
+from src.config.database import engine, TodoItem
+from src.analytics.todo_analytics import (
+    analyze_productivity,
+    analyze_patterns,
+    analyze_completion_rate,
+    analyze_workload,
+    get_analytics_summary
+)
+from src.utils.date_helpers import get_date_range
+
+logger = logging.getLogger(__name__)
+
+ANALYTICS: Dict[str, Callable] = {
+    "productivity": analyze_productivity,
+    "patterns": analyze_patterns,
+    "completion_rate": analyze_completion_rate,
+    "workload": analyze_workload,
+    "summary": get_analytics_summary,
+}
+
+# Statements one analysis may issue (each runs a single aggregate query)
+MAX_ANALYTICS_QUERIES = 2
+
+EXISTING_INDEXES_SQL = """
+    SELECT c.relname, i.indisvalid
+    FROM pg_index i
+    JOIN pg_class c ON c.oid = i.indexrelid
+    WHERE i.indrelid = to_regclass(:table)
+"""
+
+
+@dataclass
+class QueryPlan:
+    analysis: str
+    statement: str
+    # (node type, index name) of each scan on the todos table
+    scans: List[Tuple[str, str]] = field(default_factory=list)
+
+    @property
+    def seq_scan(self) -> bool:
+        return any(node == "Seq Scan" for node, _ in self.scans)
+
+
+@dataclass
+class VerifyReport:
+    missing: List[str] = field(default_factory=list)
+    invalid: List[str] = field(default_factory=list)
+    plans: List[QueryPlan] = field(default_factory=list)
+    # analysis -> statements issued by one run
+    statements: Dict[str, int] = field(default_factory=dict)
+
+    @property
+    def too_many_statements(self) -> Dict[str, int]:
+        return {analysis: count for analysis, count in self.statements.items() if count > MAX_ANALYTICS_QUERIES}
+
+    @property
+    def ok(self) -> bool:
+        return (
+            not self.missing
+            and not self.invalid
+            and not self.too_many_statements
+            and not any(plan.seq_scan for plan in self.plans)
+        )
+
+    def summary(self) -> str:
+        lines = [
+            "statements per analysis: " + ", ".join(f"{analysis}={count}" for analysis, count in self.statements.items())
+        ]
+        for plan in self.plans:
+            scans = ", ".join(f"{node} using {index}" if index else node for node, index in plan.scans)
+            status = "SEQ SCAN" if plan.seq_scan else "ok"
+            lines.append(f"[{status:>8}] {plan.analysis:<16} {scans}")
+            if plan.seq_scan:
+                lines.append("           " + " ".join(plan.statement.split()))
+        if self.missing:
+            lines.append(f"missing indexes: {', '.join(self.missing)}")
+        if self.invalid:
+            lines.append(f"invalid indexes: {', '.join(self.invalid)}")
+        if self.too_many_statements:
+            lines.append(f"more than {MAX_ANALYTICS_QUERIES} statements: {', '.join(self.too_many_statements)}")
+        lines.append("OK" if self.ok else "FAILED")
+        return "\n".join(lines)
+
+
+def declared_indexes() -> list:
+    return sorted(TodoItem.__table__.indexes, key=lambda index: index.name)
+
+
+def existing_indexes(conn: Connection) -> Dict[str, bool]:
+    """Index name -> valid, for the indexes present on the todos table."""
+    rows = conn.execute(text(EXISTING_INDEXES_SQL), {"table": TodoItem.__tablename__})
+    return {name: valid for name, valid in rows}
+
+
+def migrate(bind: Engine = engine) -> List[str]:
+    """Create the declared indexes that are missing (or invalid); returns their names."""
+    created = []
+    with bind.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        # Index builds on a large table outlast the engine's per-statement timeout
+        conn.execute(text("SET statement_timeout = 0"))
+        existing = existing_indexes(conn)
+        for index in declared_indexes():
+            if existing.get(index.name):
+                continue
+            if index.name in existing:
+                logger.warning("rebuilding invalid index %s", index.name)
+                conn.execute(text(f'DROP INDEX CONCURRENTLY IF EXISTS "{index.name}"'))
+            ddl = str(CreateIndex(index, if_not_exists=True).compile(dialect=conn.dialect))
+            conn.execute(text(ddl.replace("CREATE INDEX ", "CREATE INDEX CONCURRENTLY ", 1)))
+            created.append(index.name)
+        if created:
+            conn.execute(text(f"ANALYZE {TodoItem.__tablename__}"))
+    return created
+
+
+def capture_statements(conn: Connection, analyzer: Callable, user_id: int, days: int) -> List[Tuple[str, object]]:
+    """SQL statements (with parameters) emitted by one run of `analyzer`."""
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append((statement, parameters))
+
+    start_date, end_date = get_date_range(days)
+    event.listen(conn, "before_cursor_execute", record)
+    try:
+        with Session(bind=conn) as db:
+            analyzer(db, start_date, end_date, user_id)
+    finally:
+        event.remove(conn, "before_cursor_execute", record)
+    return statements
+
+
+def _plan_nodes(node: dict) -> Iterator[dict]:
+    yield node
+    for child in node.get("Plans", []):
+        yield from _plan_nodes(child)
+
+
+def explain(conn: Connection, analysis: str, statement: str, parameters) -> QueryPlan:
+    plan = conn.exec_driver_sql(f"EXPLAIN (FORMAT JSON) {statement}", parameters).scalar()
+    result = QueryPlan(analysis, statement)
+    for node in _plan_nodes(plan[0]["Plan"]):
+        # Bitmap index scans carry the index name but not the relation
+        if node.get("Relation Name") == TodoItem.__tablename__ or node["Node Type"] == "Bitmap Index Scan":
+            result.scans.append((node["Node Type"], node.get("Index Name", "")))
+    return result
+
+
+def verify(bind: Engine = engine, user_id: int = 1, days: int = 30) -> VerifyReport:
+    report = VerifyReport()
+    with bind.connect() as conn:
+        existing = existing_indexes(conn)
+        for index in declared_indexes():
+            if index.name not in existing:
+                report.missing.append(index.name)
+            elif not existing[index.name]:
+                report.invalid.append(index.name)
+
+        for analysis, analyzer in ANALYTICS.items():
+            statements = capture_statements(conn, analyzer, user_id, days)
+            report.statements[analysis] = len(statements)
+            # Local to this read-only transaction, rolled back below
+            conn.execute(text("SET LOCAL enable_seqscan = off"))
+            explained = set()
+            for statement, parameters in statements:
+                # The same shape repeats across loop iterations (e.g. weekly windows)
+                if statement not in explained:
+                    explained.add(statement)
+                    report.plans.append(explain(conn, analysis, statement, parameters))
+            conn.rollback()
+    return report
+
+
+def main(args: argparse.Namespace) -> int:
+    if args.migrate:
+        created = migrate()
+        print(f"created indexes: {', '.join(created)}" if created else "all declared indexes exist")
+    if args.verify:
+        report = verify(user_id=args.user_id, days=args.days)
+        print(report.summary())
+        return 0 if report.ok else 1
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--migrate", action="store_true", help="create missing or invalid declared indexes")
+    parser.add_argument("--verify", action="store_true", help="EXPLAIN the analytics queries and fail on seq scans or extra statements")
+    parser.add_argument("--user-id", type=int, default=1, help="user the analytics queries are run for")
+    parser.add_argument("--days", type=int, default=30, help="analysis window of the analytics queries")
+    args = parser.parse_args()
+    if not (args.migrate or args.verify):
+        parser.error("nothing to do: pass --migrate and/or --verify")
+    logging.basicConfig(level=logging.INFO)
+    sys.exit(main(args))
@@ -0,0 +1,15 @@
+"""
+Retrieval package for the school knowledge base.
+Contains the local vector index, the BM25 lexical index and related retrieval tools.
+"""
+
+from .local_index import LocalVectorStore, matches_filter
+from .bm25 import BM25Index, reciprocal_rank_fusion, tokenize
+
+__all__ = [
+    'LocalVectorStore',
+    'matches_filter',
+    'BM25Index',
+    'reciprocal_rank_fusion',
+    'tokenize',
+]
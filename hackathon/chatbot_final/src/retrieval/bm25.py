@@ -0,0 +1,234 @@
+"""
+BM25 inverted index over the knowledge base chunks, fused with dense search.
+
+Dense embeddings blur the exact tokens Vietnamese questions often hinge on:
+course codes (SWP391), fee amounts (25.000.000đ), regulation numbers. The
+tokenizer keeps those intact and indexes, per chunk:
+  - NFC-normalized, lowercased syllables, numbers without thousands separators
+  - diacritic-free variants, so "hoc phi" matches "học phí"
+  - diacritic-free syllable bigrams, approximating multi-syllable words
+  - letter/digit splits of codes and amounts, so "SWP 391" matches "SWP391"
+
+VectorStoreCRUD updates the index incrementally on every add/delete (API
+and ingest CLI alike) and persists it as JSON; each process reloads it when
+another one rewrote the file.
+"""
+
+import heapq
+import json
+import math
+import os
+import re
+import threading
+import unicodedata
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+from langchain_core.documents import Document
+
+BM25_K1 = 1.5
+BM25_B = 0.75
+RRF_K = 60
+
+_TOKEN = re.compile(r"\w+")
+_GROUPED_NUMBER = re.compile(r"(?<![\w.,])\d{1,3}(?:[.,]\d{3})+(?![.,]?\d)")
+_ALNUM_RUN = re.compile(r"[^\W\d_]+|\d+")
+
+
+def strip_diacritics(text: str) -> str:
+    decomposed = unicodedata.normalize("NFD", text.replace("đ", "d").replace("Đ", "D"))
+    return "".join(c for c in decomposed if unicodedata.category(c) != "Mn")
+
+
+def tokenize(text: str) -> List[str]:
+    """Vietnamese-aware BM25 terms of `text` (see module docstring)."""
+    text = unicodedata.normalize("NFC", text).lower()
+    text = _GROUPED_NUMBER.sub(lambda m: re.sub(r"[.,]", "", m.group()), text)
+    syllables = _TOKEN.findall(text)
+    plain = [strip_diacritics(s) for s in syllables]
+
+    terms = list(syllables)
+    terms.extend(p for s, p in zip(syllables, plain) if p != s)
+    terms.extend(f"{a}_{b}" for a, b in zip(plain, plain[1:]))
+    for p in plain:
+        parts = _ALNUM_RUN.findall(p)
+        if len(parts) > 1:
+            terms.extend(parts)
+            terms.extend(f"{a}_{b}" for a, b in zip(parts, parts[1:]))
+    return terms
+
+
+def document_key(document: Document) -> str:
+    return document.id or document.page_content
+
+
+def reciprocal_rank_fusion(rankings: Sequence[Sequence[Document]], k: int, rrf_k: int = RRF_K) -> List[Document]:
+    """Merge ranked lists: each document scores sum(1 / (rrf_k + rank)) over the lists it appears in."""
+    scores: Dict[str, float] = {}
+    documents: Dict[str, Document] = {}
+    for ranking in rankings:
+        for rank, document in enumerate(ranking, start=1):
+            key = document_key(document)
+            scores[key] = scores.get(key, 0.0) + 1.0 / (rrf_k + rank)
+            documents.setdefault(key, document)
+    best = heapq.nlargest(k, scores.items(), key=lambda item: item[1])
+    return [documents[key] for key, _ in best]
+
+
+class BM25Index:
+    """In-memory BM25 index keyed by document id."""
+
+    def __init__(self, path: Optional[str] = None, k1: float = BM25_K1, b: float = BM25_B):
+        self.path = path
+        self.k1 = k1
+        self.b = b
+        self._lock = threading.Lock()
+        self._postings: Dict[str, Dict[int, int]] = {}
+        self._ids: List[Optional[str]] = []
+        self._lengths: List[int] = []
+        self._doc_terms: List[Tuple[str, ...]] = []
+        self._slot_of: Dict[str, int] = {}
+        self._free: List[int] = []
+        self._total_length = 0
+        self._loaded_mtime: Optional[int] = None
+        self.dirty = False
+
+    def __len__(self) -> int:
+        return len(self._slot_of)
+
+    # Updates
+
+    def _remove(self, doc_id: str) -> None:
+        slot = self._slot_of.pop(doc_id, None)
+        if slot is None:
+            return
+        for term in self._doc_terms[slot]:
+            postings = self._postings[term]
+            del postings[slot]
+            if not postings:
+                del self._postings[term]
+        self._total_length -= self._lengths[slot]
+        self._ids[slot] = None
+        self._lengths[slot] = 0
+        self._doc_terms[slot] = ()
+        self._free.append(slot)
+
+    def _insert(self, doc_id: str, frequencies: Dict[str, int], length: int) -> None:
+        if self._free:
+            slot = self._free.pop()
+            self._ids[slot] = doc_id
+            self._lengths[slot] = length
+            self._doc_terms[slot] = tuple(frequencies)
+        else:
+            slot = len(self._ids)
+            self._ids.append(doc_id)
+            self._lengths.append(length)
+            self._doc_terms.append(tuple(frequencies))
+        self._slot_of[doc_id] = slot
+        self._total_length += length
+        for term, tf in frequencies.items():
+            self._postings.setdefault(term, {})[slot] = tf
+
+    def add(self, ids: Sequence[str], texts: Sequence[str]) -> None:
+        """Index (or re-index) documents."""
+        tokenized = []
+        for text in texts:
+            terms = tokenize(text)
+            frequencies: Dict[str, int] = {}
+            for term in terms:
+                frequencies[term] = frequencies.get(term, 0) + 1
+            tokenized.append((frequencies, len(terms)))
+        with self._lock:
+            for doc_id, (frequencies, length) in zip(ids, tokenized):
+                self._remove(doc_id)
+                self._insert(doc_id, frequencies, length)
+            self.dirty = True
+
+    def delete(self, ids: Iterable[str]) -> None:
+        with self._lock:
+            for doc_id in ids:
+                self._remove(doc_id)
+            self.dirty = True
+
+    # Search
+
+    def search(self, query: str, k: int) -> List[Tuple[str, float]]:
+        """Return the k best (id, BM25 score) pairs; documents sharing no term with the query are left out."""
+        terms = set(tokenize(query))
+        with self._lock:
+            n_docs = len(self._slot_of)
+            if not n_docs:
+                return []
+            avg_length = self._total_length / n_docs
+            scores: Dict[int, float] = {}
+            for term in terms:
+                postings = self._postings.get(term)
+                if not postings:
+                    continue
+                idf = math.log(1 + (n_docs - len(postings) + 0.5) / (len(postings) + 0.5))
+                for slot, tf in postings.items():
+                    norm = self.k1 * (1 - self.b + self.b * self._lengths[slot] / avg_length)
+                    scores[slot] = scores.get(slot, 0.0) + idf * tf * (self.k1 + 1) / (tf + norm)
+            best = heapq.nlargest(k, scores.items(), key=lambda item: item[1])
+            return [(self._ids[slot], score) for slot, score in best]
+
+    # Persistence
+
+    def save(self) -> None:
+        """Write the index atomically to `path` if it changed since the last save."""
+        if not self.path or not self.dirty:
+            return
+        with self._lock:
+            postings = {term: [v for item in docs.items() for v in item] for term, docs in self._postings.items()}
+            data = {"ids": list(self._ids), "lengths": list(self._lengths), "postings": postings}
+            self.dirty = False
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, separators=(",", ":"))
+        os.replace(tmp_path, self.path)
+        # Our own write is not a change to reload
+        self._loaded_mtime = self._file_mtime()
+
+    def _file_mtime(self) -> Optional[int]:
+        try:
+            return os.stat(self.path).st_mtime_ns
+        except (OSError, TypeError):
+            return None
+
+    def changed_on_disk(self) -> bool:
+        """Whether the file at `path` was written since this index was loaded."""
+        mtime = self._file_mtime()
+        return mtime is not None and mtime != self._loaded_mtime
+
+    def load(self) -> bool:
+        """Load the index from `path`; return False if there is no saved index.
+
+        The structures are rebuilt before taking the lock, so searches running
+        meanwhile only wait for the swap.
+        """
+        mtime = self._file_mtime()
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, TypeError, ValueError):
+            return False
+        ids = data["ids"]
+        postings: Dict[str, Dict[int, int]] = {}
+        doc_terms: List[List[str]] = [[] for _ in ids]
+        for term, flat in data["postings"].items():
+            docs = dict(zip(flat[::2], flat[1::2]))
+            postings[term] = docs
+            for slot in docs:
+                doc_terms[slot].append(term)
+        with self._lock:
+            self._ids = ids
+            self._lengths = data["lengths"]
+            self._postings = postings
+            self._doc_terms = [tuple(terms) for terms in doc_terms]
+            self._slot_of = {doc_id: slot for slot, doc_id in enumerate(ids) if doc_id is not None}
+            self._free = [slot for slot, doc_id in enumerate(ids) if doc_id is None]
+            self._total_length = sum(self._lengths)
+            self._loaded_mtime = mtime
+            self.dirty = False
+        return True
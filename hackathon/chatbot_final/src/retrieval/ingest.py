@@ -0,0 +1,373 @@
+"""
+Resumable bulk ingestion of school documents into the knowledge base.
+
+Walks a directory of source files, splits them lazily into chunks, embeds the
+chunks in large batches and upserts them in smaller batches with bounded
+concurrency. Chunk ids are content hashes, so unchanged chunks are skipped on
+re-runs; a manifest records per-file progress so a crashed run resumes where
+it stopped. Chunks of a modified file that no longer exist are deleted, and
+so are all the chunks of a file removed from the source directory.
+Each file also records the embedding model signature it was ingested with:
+changing EMBEDDING_MODEL_NAME or EMBEDDING_BACKEND re-embeds every file.
+Every write bumps the knowledge base version shared through Postgres
+(DB_URI), which invalidates the semantic answer cache of the running API.
+
+With HYBRID_SEARCH=true the BM25 index (BM25_INDEX_PATH) follows every
+upsert and delete, and is saved once when the run ends; the API reloads it
+when the file changes. --rebuild-bm25 rebuilds it from the source files
+alone, without embedding or upserting (first deployment of hybrid search,
+or after a run was killed).
+
+Usage (from chatbot_final/):
+    python -m src.retrieval.ingest data/school_docs
+    python -m src.retrieval.ingest data/school_docs --manifest data/ingest_manifest.json --embed-batch 512
+    python -m src.retrieval.ingest data/school_docs --rebuild-bm25
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import time
+from dataclasses import dataclass
+from itertools import islice
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+from langchain_core.documents import Document
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+from src.config.vector_store import vector_store_crud, BM25_INDEX_PATH
+from src.retrieval.bm25 import BM25Index
+
+SUPPORTED_EXTENSIONS = (".txt", ".md", ".pdf")
+DEFAULT_MANIFEST = "data/ingest_manifest.json"
+
+
+def file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def chunk_id(source: str, text: str) -> str:
+    """Stable id of a chunk: hash of its source path and content."""
+    return hashlib.sha256(f"{source}\x00{text}".encode("utf-8")).hexdigest()[:40]
+
+
+def read_text(path: str) -> str:
+    if path.lower().endswith(".pdf"):
+        from pypdf import PdfReader
+
+        return "\n\n".join(page.extract_text() or "" for page in PdfReader(path).pages)
+    with open(path, encoding="utf-8") as f:
+        return f.read()
+
+
+def iter_source_files(root: str) -> Iterator[str]:
+    for directory, _, files in sorted(os.walk(root)):
+        for name in sorted(files):
+            if name.lower().endswith(SUPPORTED_EXTENSIONS):
+                yield os.path.join(directory, name)
+
+
+@dataclass
+class Chunk:
+    source: str
+    id: str
+    document: Document
+
+
+@dataclass
+class IngestStats:
+    files_seen: int = 0
+    files_ingested: int = 0
+    files_skipped: int = 0
+    chunks_upserted: int = 0
+    chunks_skipped: int = 0
+    chunks_deleted: int = 0
+    files_removed: int = 0
+    seconds: float = 0.0
+
+    def report(self) -> str:
+        seconds = self.seconds or 1e-9
+        return (
+            f"files: {self.files_ingested} ingested, {self.files_skipped} unchanged ({self.files_seen} seen), "
+            f"{self.files_removed} removed\n"
+            f"chunks: {self.chunks_upserted} upserted, {self.chunks_skipped} skipped, {self.chunks_deleted} stale deleted\n"
+            f"elapsed: {self.seconds:.1f}s, {self.files_ingested / seconds:.2f} docs/s, "
+            f"{self.chunks_upserted / seconds:.1f} chunks/s"
+        )
+
+
+class IngestManifest:
+    """Per-file ingestion progress, saved atomically as JSON.
+
+    Entry per source: sha256 of the file, embedding model signature, status
+    (in_progress/done), ids of all its chunks, ids already upserted and ids
+    of the previous version with the signature they were embedded with.
+    Sources are relative to `root`, the directory the manifest was built from.
+    """
+
+    def __init__(self, path: str, model_signature: str):
+        self.path = path
+        self.model_signature = model_signature
+        try:
+            with open(path, encoding="utf-8") as f:
+                data = json.load(f)
+            self.files: Dict[str, dict] = data["files"]
+            self.root: Optional[str] = data.get("root")
+        except (OSError, ValueError, KeyError):
+            self.files = {}
+            self.root = None
+
+    def save(self) -> None:
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"root": self.root, "files": self.files}, f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+
+    def is_done(self, source: str, sha256: str) -> bool:
+        entry = self.files.get(source)
+        return (
+            bool(entry)
+            and entry["sha256"] == sha256
+            and entry["status"] == "done"
+            and entry.get("model_signature") == self.model_signature
+        )
+
+    def begin(self, source: str, sha256: str) -> dict:
+        entry = self.files.get(source)
+        if entry and entry["sha256"] == sha256 and entry.get("model_signature") == self.model_signature:
+            # Resume: keep the ids upserted by the crashed run
+            entry.update(chunk_ids=[], generated=False)
+        else:
+            previous_ids, previous_signature = self._indexed_version(entry)
+            entry = {
+                "sha256": sha256,
+                "model_signature": self.model_signature,
+                "status": "in_progress",
+                "chunk_ids": [],
+                "done_ids": [],
+                "previous_ids": previous_ids,
+                "previous_signature": previous_signature,
+                "generated": False,
+            }
+            self.files[source] = entry
+        return entry
+
+    @staticmethod
+    def _indexed_version(entry: Optional[dict]) -> Tuple[List[str], Optional[str]]:
+        """Ids of the chunks `entry` left in the index, and the signature they were embedded with.
+
+        A done entry left exactly its chunk_ids. A run that crashed mid-file
+        left the previous version (not deleted yet) plus the chunks it had
+        upserted; its chunk_ids were only partially generated. When those
+        two sets were embedded by different models, None marks the mix so
+        none of it is reused.
+        """
+        if not entry:
+            return [], None
+        if entry["status"] == "done":
+            return entry["chunk_ids"], entry.get("model_signature")
+        ids = sorted(set(entry["previous_ids"]) | set(entry["done_ids"]))
+        same_model = not entry["previous_ids"] or entry.get("previous_signature") == entry.get("model_signature")
+        return ids, entry.get("model_signature") if same_model else None
+
+    def indexed_ids(self, source: str) -> List[str]:
+        """Every chunk id of `source` that may be in the index."""
+        entry = self.files[source]
+        return sorted(set(entry["chunk_ids"]) | set(entry["done_ids"]) | set(entry["previous_ids"]))
+
+    def missing_sources(self, root: str) -> List[str]:
+        """Sources of the manifest whose file no longer exists under `root`."""
+        return [source for source in self.files if not os.path.isfile(os.path.join(root, source))]
+
+    def reusable_ids(self, entry: dict) -> Set[str]:
+        """Chunk ids of `entry` whose vectors need no upsert (unchanged and embedded by the current model)."""
+        reusable = set(entry["done_ids"])
+        if entry.get("previous_signature") == self.model_signature:
+            reusable.update(entry["previous_ids"])
+        return reusable
+
+    def mark_upserted(self, chunks: List[Chunk]) -> None:
+        for chunk in chunks:
+            self.files[chunk.source]["done_ids"].append(chunk.id)
+
+    def completed_files(self) -> Iterator[str]:
+        for source, entry in self.files.items():
+            if entry["status"] == "in_progress" and entry["generated"] and set(entry["chunk_ids"]) <= set(entry["done_ids"]):
+                yield source
+
+
+def iter_chunks(root: str, manifest: IngestManifest, splitter: RecursiveCharacterTextSplitter, stats: IngestStats) -> Iterator[Chunk]:
+    """Lazily yield the chunks that still need to be upserted, file by file."""
+    for path in iter_source_files(root):
+        stats.files_seen += 1
+        source = os.path.relpath(path, root)
+        sha256 = file_sha256(path)
+        if manifest.is_done(source, sha256):
+            stats.files_skipped += 1
+            continue
+
+        entry = manifest.begin(source, sha256)
+        done = manifest.reusable_ids(entry)
+        for index, text in enumerate(splitter.split_text(read_text(path))):
+            cid = chunk_id(source, text)
+            entry["chunk_ids"].append(cid)
+            if cid in done:
+                stats.chunks_skipped += 1
+                if cid not in entry["done_ids"]:
+                    entry["done_ids"].append(cid)
+                continue
+            yield Chunk(source=source, id=cid, document=Document(page_content=text, metadata={"source": source, "chunk": index}))
+        entry["generated"] = True
+
+
+def rebuild_lexical_index(root: str, chunk_size: int = 1000, chunk_overlap: int = 150, path: str = BM25_INDEX_PATH) -> int:
+    """Rebuild the BM25 index from the chunks of every source file; returns the number of chunks."""
+    splitter = RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+    index = BM25Index(path)
+    for file_path in iter_source_files(root):
+        source = os.path.relpath(file_path, root)
+        texts = splitter.split_text(read_text(file_path))
+        index.add([chunk_id(source, text) for text in texts], texts)
+    index.save()
+    return len(index)
+
+
+def batched(iterable: Iterator[Chunk], size: int) -> Iterator[List[Chunk]]:
+    while True:
+        batch = list(islice(iterable, size))
+        if not batch:
+            return
+        yield batch
+
+
+async def ingest_directory(
+    root: str,
+    manifest_path: str = DEFAULT_MANIFEST,
+    embed_batch_size: int = 256,
+    upsert_batch_size: int = 100,
+    upsert_concurrency: int = 4,
+    chunk_size: int = 1000,
+    chunk_overlap: int = 150,
+) -> IngestStats:
+    """Ingest every supported file under `root` into the vector store."""
+    manifest = IngestManifest(manifest_path, vector_store_crud.model_signature)
+    root_path = os.path.abspath(root)
+    if manifest.files and manifest.root and manifest.root != root_path:
+        # Reconciling against another directory would delete the whole knowledge base
+        raise ValueError(f"{manifest_path} tracks the files of {manifest.root}, use another --manifest for {root_path}")
+    manifest.root = root_path
+    splitter = RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+    stats = IngestStats()
+    semaphore = asyncio.Semaphore(upsert_concurrency)
+    pending: Set[asyncio.Task] = set()
+    errors: List[BaseException] = []
+    manifest_lock = asyncio.Lock()
+
+    async def finish_completed_files() -> None:
+        for source in list(manifest.completed_files()):
+            entry = manifest.files[source]
+            stale = sorted(set(entry["previous_ids"]) - set(entry["chunk_ids"]))
+            if stale:
+                await vector_store_crud.delete_documents(stale, persist_lexical=False)
+                stats.chunks_deleted += len(stale)
+            entry.update(status="done", done_ids=[], previous_ids=[])
+            stats.files_ingested += 1
+
+    async def remove_missing_files() -> None:
+        for source in manifest.missing_sources(root):
+            ids = manifest.indexed_ids(source)
+            if ids:
+                await vector_store_crud.delete_documents(ids, persist_lexical=False)
+                stats.chunks_deleted += len(ids)
+            del manifest.files[source]
+            stats.files_removed += 1
+            manifest.save()
+
+    async def upsert(chunks: List[Chunk], vectors: List[List[float]]) -> None:
+        try:
+            await vector_store_crud.add_embedded_documents(
+                [chunk.document for chunk in chunks], vectors, [chunk.id for chunk in chunks], persist_lexical=False
+            )
+            async with manifest_lock:
+                manifest.mark_upserted(chunks)
+                stats.chunks_upserted += len(chunks)
+                await finish_completed_files()
+                manifest.save()
+        except Exception as error:
+            # Re-raised by the main loop, which stops scheduling upserts and cancels the running ones
+            errors.append(error)
+        finally:
+            semaphore.release()
+
+    start = time.perf_counter()
+    try:
+        await remove_missing_files()
+        for batch in batched(iter_chunks(root, manifest, splitter, stats), embed_batch_size):
+            vectors = await vector_store_crud.embeddings.aembed_documents([chunk.document.page_content for chunk in batch])
+            for i in range(0, len(batch), upsert_batch_size):
+                await semaphore.acquire()
+                if errors:
+                    semaphore.release()
+                    raise errors[0]
+                task = asyncio.create_task(upsert(batch[i:i + upsert_batch_size], vectors[i:i + upsert_batch_size]))
+                pending.add(task)
+                task.add_done_callback(pending.discard)
+        while pending and not errors:
+            await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+        if errors:
+            raise errors[0]
+    finally:
+        # After a failure, stop the in-flight upserts before recording progress and closing
+        # the client, so the manifest only lists the batches whose upsert returned
+        running = list(pending)
+        for task in running:
+            task.cancel()
+        await asyncio.gather(*running, return_exceptions=True)
+        async with manifest_lock:
+            await finish_completed_files()
+            manifest.save()
+        await vector_store_crud.save_lexical_index()
+        vector_store_crud.flush()
+        await vector_store_crud.aclose()
+        stats.seconds = time.perf_counter() - start
+    return stats
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("root", help="directory of .txt/.md/.pdf source files")
+    parser.add_argument("--manifest", default=DEFAULT_MANIFEST)
+    parser.add_argument("--embed-batch", type=int, default=256)
+    parser.add_argument("--upsert-batch", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=4, help="parallel upsert batches")
+    parser.add_argument("--chunk-size", type=int, default=1000)
+    parser.add_argument("--chunk-overlap", type=int, default=150)
+    parser.add_argument("--rebuild-bm25", action="store_true", help="only rebuild the BM25 index from the source files")
+    args = parser.parse_args()
+
+    if args.rebuild_bm25:
+        count = rebuild_lexical_index(args.root, chunk_size=args.chunk_size, chunk_overlap=args.chunk_overlap)
+        print(f"BM25 index rebuilt with {count} chunks at {BM25_INDEX_PATH}")
+        return
+
+    stats = asyncio.run(ingest_directory(
+        args.root,
+        manifest_path=args.manifest,
+        embed_batch_size=args.embed_batch,
+        upsert_batch_size=args.upsert_batch,
+        upsert_concurrency=args.concurrency,
+        chunk_size=args.chunk_size,
+        chunk_overlap=args.chunk_overlap,
+    ))
+    print(stats.report())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""
+Knowledge base version shared across processes.
+
+The API workers and the ingest CLI change the knowledge base from different
+processes, so an in-process counter cannot tell a worker that its cached
+answers are stale. Every change bumps one row of the knowledge_base_version
+table instead; caches read it on lookup and drop their entries when it moved.
+
+Reads are cached in-process for KNOWLEDGE_VERSION_TTL_SECONDS, so a change
+made by another process is seen within that delay; a bump made by this
+process is seen immediately.
+"""
+
+import os
+import time
+from typing import Optional
+from dotenv import load_dotenv
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert
+from src.config.database import async_engine, AsyncSessionLocal, KnowledgeBaseVersion
+
+load_dotenv()
+
+VERSION_ROW_ID = 1
+KNOWLEDGE_VERSION_TTL_SECONDS = float(os.getenv("KNOWLEDGE_VERSION_TTL_SECONDS", "5"))
+
+_table_ready = False
+_cached_version: Optional[int] = None
+_cached_at = 0.0
+
+
+async def _ensure_table() -> None:
+    global _table_ready
+    if _table_ready:
+        return
+    async with async_engine.begin() as conn:
+        await conn.run_sync(KnowledgeBaseVersion.__table__.create, checkfirst=True)
+    _table_ready = True
+
+
+def _remember(version: int) -> None:
+    global _cached_version, _cached_at
+    _cached_version = version
+    _cached_at = time.monotonic()
+
+
+async def _read_version() -> int:
+    await _ensure_table()
+    async with AsyncSessionLocal() as db:
+        version = await db.scalar(select(KnowledgeBaseVersion.version).where(KnowledgeBaseVersion.id == VERSION_ROW_ID))
+    return version or 0
+
+
+async def get_knowledge_version(max_age: float = KNOWLEDGE_VERSION_TTL_SECONDS) -> int:
+    """Current version of the knowledge base (0 until the first change), at most `max_age` seconds old."""
+    if _cached_version is not None and time.monotonic() - _cached_at < max_age:
+        return _cached_version
+    version = await _read_version()
+    _remember(version)
+    return version
+
+
+async def bump_knowledge_version() -> int:
+    """Record a change to the knowledge base; returns the new version."""
+    await _ensure_table()
+    statement = insert(KnowledgeBaseVersion).values(id=VERSION_ROW_ID, version=1)
+    statement = statement.on_conflict_do_update(
+        index_elements=[KnowledgeBaseVersion.id],
+        set_={"version": KnowledgeBaseVersion.version + 1, "updatedAt": statement.excluded.updatedAt},
+    ).returning(KnowledgeBaseVersion.version)
+    async with AsyncSessionLocal() as db, db.begin():
+        version = await db.scalar(statement)
+    _remember(version)
+    return version
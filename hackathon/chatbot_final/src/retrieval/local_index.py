@@ -0,0 +1,442 @@
+"""
+In-process vector index, a drop-in for the Pinecone index.
+
+Vectors, document offsets and tombstones live in memory-mapped files; the
+documents themselves are an append-only JSON lines file read through mmap.
+Search is exact while the index is small and switches to an IVF index
+(spherical k-means centroids, `n_probe` lists scanned per query) once it has
+enough vectors. Scores and metadata filters follow Pinecone's cosine index, so
+the `similarity_score_threshold` retriever behaves the same on both backends.
+
+Layout of the index directory:
+    state.json      dim, count, capacity, IVF training size, model signature
+    vectors.f32     float32 [capacity, dim]
+    offsets.i64     int64   [capacity, 2]  (offset, length) in docs.jsonl
+    alive.u1        uint8   [capacity]     0 = deleted / replaced
+    lists.i32       int32   [capacity]     IVF list of each row
+    centroids.npy   float32 [n_lists, dim]
+    ids.txt         one document id per row
+    docs.jsonl      {"id", "text", "metadata"} per row
+
+Rows are appended to ids.txt/docs.jsonl first and committed by the `count`
+saved in state.json; lines past it were left by an interrupted write and
+are truncated on load. Rows replaced by an upsert are only tombstoned once
+their new rows are committed (the newest live row of an id wins on load).
+"""
+
+import json
+import mmap
+import os
+import threading
+import uuid
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.vectorstores import VectorStore
+
+INITIAL_CAPACITY = 1024
+# Build the IVF index once this many vectors are stored, rebuild when the index grows 4x
+IVF_MIN_TRAIN = 4096
+IVF_RETRAIN_GROWTH = 4
+IVF_TRAIN_SAMPLE = 50000
+KMEANS_ITERATIONS = 15
+DEFAULT_N_PROBE = 8
+
+
+def _compare(value: Any, operator: str, operand: Any) -> bool:
+    values = value if isinstance(value, list) else [value]
+    if operator == "$eq":
+        return operand in values
+    if operator == "$ne":
+        return operand not in values
+    if operator == "$in":
+        return any(v in operand for v in values)
+    if operator == "$nin":
+        return all(v not in operand for v in values)
+    if operator == "$exists":
+        return (value is not None) == bool(operand)
+    if value is None:
+        return False
+    try:
+        if operator == "$gt":
+            return value > operand
+        if operator == "$gte":
+            return value >= operand
+        if operator == "$lt":
+            return value < operand
+        if operator == "$lte":
+            return value <= operand
+    except TypeError:
+        return False
+    raise ValueError(f"Unsupported filter operator: {operator}")
+
+
+def matches_filter(metadata: Dict[str, Any], filter: Optional[Dict[str, Any]]) -> bool:
+    """Evaluate a Pinecone-style metadata filter against one document's metadata."""
+    if not filter:
+        return True
+    for key, condition in filter.items():
+        if key == "$and":
+            if not all(matches_filter(metadata, sub) for sub in condition):
+                return False
+        elif key == "$or":
+            if not any(matches_filter(metadata, sub) for sub in condition):
+                return False
+        elif isinstance(condition, dict):
+            value = metadata.get(key)
+            if not all(_compare(value, operator, operand) for operator, operand in condition.items()):
+                return False
+        elif not _compare(metadata.get(key), "$eq", condition):
+            return False
+    return True
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+class LocalVectorStore(VectorStore):
+    """Memory-mapped IVF vector store with the LangChain VectorStore interface."""
+
+    def __init__(
+        self,
+        path: str,
+        embedding: Embeddings,
+        n_probe: int = DEFAULT_N_PROBE,
+        model_signature: Optional[str] = None,
+    ):
+        self.path = path
+        self.embedding = embedding
+        self.n_probe = n_probe
+        # Model/backend the stored vectors were embedded with (see src.config.embeddings)
+        self.model_signature = model_signature
+        self._lock = threading.RLock()
+        self._dim: Optional[int] = None
+        self._count = 0
+        self._capacity = 0
+        self._trained_count = 0
+        self._vectors: Optional[np.memmap] = None
+        self._offsets: Optional[np.memmap] = None
+        self._alive: Optional[np.memmap] = None
+        self._lists: Optional[np.memmap] = None
+        self._centroids: Optional[np.ndarray] = None
+        self._inverted: List[List[int]] = []
+        self._ids: List[str] = []
+        self._row_of: Dict[str, int] = {}
+        self._docs_map: Optional[mmap.mmap] = None
+        os.makedirs(path, exist_ok=True)
+        self._load()
+
+    # Files
+
+    def _file(self, name: str) -> str:
+        return os.path.join(self.path, name)
+
+    def _open_memmaps(self, mode: str) -> None:
+        self._vectors = np.memmap(self._file("vectors.f32"), dtype=np.float32, mode=mode, shape=(self._capacity, self._dim))
+        self._offsets = np.memmap(self._file("offsets.i64"), dtype=np.int64, mode=mode, shape=(self._capacity, 2))
+        self._alive = np.memmap(self._file("alive.u1"), dtype=np.uint8, mode=mode, shape=(self._capacity,))
+        self._lists = np.memmap(self._file("lists.i32"), dtype=np.int32, mode=mode, shape=(self._capacity,))
+
+    def _load(self) -> None:
+        try:
+            with open(self._file("state.json"), encoding="utf-8") as f:
+                state = json.load(f)
+        except OSError:
+            return
+        stored_signature = state.get("model_signature")
+        if stored_signature and self.model_signature and stored_signature != self.model_signature:
+            raise ValueError(
+                f"The index at {self.path} was built with '{stored_signature}' but queries would be embedded "
+                f"with '{self.model_signature}'. Set EMBEDDING_BACKEND accordingly or re-ingest the documents."
+            )
+        self.model_signature = self.model_signature or stored_signature
+        self._dim = state["dim"]
+        self._count = state["count"]
+        self._capacity = state["capacity"]
+        self._trained_count = state.get("trained_count", 0)
+        self._open_memmaps("r+")
+        with open(self._file("ids.txt"), encoding="utf-8") as f:
+            self._ids = [line.rstrip("\n") for line in f]
+        self._truncate_uncommitted()
+        self._row_of = {}
+        for row, doc_id in enumerate(self._ids):
+            if self._alive[row]:
+                previous = self._row_of.get(doc_id)
+                if previous is not None:
+                    # Interrupted upsert: the new row was committed, the old one not tombstoned yet
+                    self._alive[previous] = 0
+                self._row_of[doc_id] = row
+        if self._trained_count:
+            self._centroids = np.load(self._file("centroids.npy"))
+            self._inverted = [[] for _ in range(len(self._centroids))]
+            for row, list_id in enumerate(self._lists[: self._count].tolist()):
+                self._inverted[list_id].append(row)
+
+    def _truncate_uncommitted(self) -> None:
+        """Drop the ids.txt/docs.jsonl lines appended after the last committed row."""
+        if len(self._ids) > self._count:
+            self._ids = self._ids[: self._count]
+            tmp_path = self._file("ids.txt.tmp")
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.writelines(doc_id + "\n" for doc_id in self._ids)
+            os.replace(tmp_path, self._file("ids.txt"))
+        docs_end = int(self._offsets[self._count - 1].sum()) if self._count else 0
+        with open(self._file("docs.jsonl"), "ab") as f:
+            if f.seek(0, os.SEEK_END) > docs_end:
+                f.truncate(docs_end)
+
+    def _save_state(self) -> None:
+        for array in (self._vectors, self._offsets, self._alive, self._lists):
+            array.flush()
+        state = {
+            "dim": self._dim,
+            "count": self._count,
+            "capacity": self._capacity,
+            "trained_count": self._trained_count,
+            "model_signature": self.model_signature,
+        }
+        tmp_path = self._file("state.json.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(state, f)
+        os.replace(tmp_path, self._file("state.json"))
+
+    def _ensure_capacity(self, needed: int, dim: int) -> None:
+        if self._dim is None:
+            self._dim = dim
+        elif dim != self._dim:
+            raise ValueError(f"Vector dimension {dim} does not match index dimension {self._dim}")
+        if needed <= self._capacity:
+            return
+        new_capacity = max(needed, self._capacity * 2, INITIAL_CAPACITY)
+        row_bytes = {
+            "vectors.f32": 4 * self._dim,
+            "offsets.i64": 16,
+            "alive.u1": 1,
+            "lists.i32": 4,
+        }
+        self._vectors = self._offsets = self._alive = self._lists = None
+        for name, size in row_bytes.items():
+            with open(self._file(name), "ab") as f:
+                f.truncate(new_capacity * size)
+        self._capacity = new_capacity
+        self._open_memmaps("r+")
+
+    def _read_document(self, row: int) -> Document:
+        offset, length = (int(v) for v in self._offsets[row])
+        if self._docs_map is None or offset + length > len(self._docs_map):
+            with open(self._file("docs.jsonl"), "rb") as f:
+                self._docs_map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        record = json.loads(self._docs_map[offset: offset + length])
+        return Document(id=record["id"], page_content=record["text"], metadata=record["metadata"])
+
+    # IVF
+
+    def _nearest_lists(self, vectors: np.ndarray) -> np.ndarray:
+        return np.argmax(vectors @ self._centroids.T, axis=1).astype(np.int32)
+
+    def _train_ivf(self) -> None:
+        rows = np.flatnonzero(self._alive[: self._count])
+        rng = np.random.default_rng(0)
+        sample = rows if len(rows) <= IVF_TRAIN_SAMPLE else np.sort(rng.choice(rows, IVF_TRAIN_SAMPLE, replace=False))
+        data = np.asarray(self._vectors[sample])
+        n_lists = max(1, int(np.sqrt(len(rows))))
+        centroids = data[rng.choice(len(data), n_lists, replace=False)].copy()
+        for _ in range(KMEANS_ITERATIONS):
+            assignment = np.argmax(data @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assignment, data)
+            empty = ~sums.any(axis=1)
+            sums[empty] = centroids[empty]
+            centroids = _normalize(sums)
+
+        self._centroids = centroids.astype(np.float32)
+        self._inverted = [[] for _ in range(n_lists)]
+        for start in range(0, self._count, 8192):
+            end = min(start + 8192, self._count)
+            assignment = self._nearest_lists(np.asarray(self._vectors[start:end]))
+            self._lists[start:end] = assignment
+            for row, list_id in zip(range(start, end), assignment.tolist()):
+                self._inverted[list_id].append(row)
+        np.save(self._file("centroids.npy"), self._centroids)
+        self._trained_count = len(rows)
+
+    def _maybe_train(self) -> None:
+        alive = len(self._row_of)
+        if alive < IVF_MIN_TRAIN:
+            return
+        if not self._trained_count or alive >= self._trained_count * IVF_RETRAIN_GROWTH:
+            self._train_ivf()
+
+    # Writes
+
+    def add_embeddings(
+        self,
+        texts: Sequence[str],
+        vectors: Sequence[Sequence[float]],
+        metadatas: Optional[Sequence[dict]] = None,
+        ids: Optional[Sequence[str]] = None,
+    ) -> List[str]:
+        """Upsert documents whose vectors are already computed."""
+        if not texts:
+            return []
+        ids = list(ids) if ids is not None else [str(uuid.uuid4()) for _ in texts]
+        metadatas = list(metadatas) if metadatas is not None else [{} for _ in texts]
+        matrix = _normalize(np.asarray(vectors, dtype=np.float32))
+
+        with self._lock:
+            self._ensure_capacity(self._count + len(texts), matrix.shape[1])
+            start = self._count
+            rows = range(start, start + len(texts))
+
+            with open(self._file("docs.jsonl"), "ab") as docs, open(self._file("ids.txt"), "a", encoding="utf-8") as id_file:
+                for row, doc_id, text, metadata in zip(rows, ids, texts, metadatas):
+                    line = (json.dumps({"id": doc_id, "text": text, "metadata": metadata}, ensure_ascii=False) + "\n").encode("utf-8")
+                    self._offsets[row] = (docs.tell(), len(line))
+                    docs.write(line)
+                    id_file.write(doc_id + "\n")
+
+            self._vectors[start:start + len(texts)] = matrix
+            self._alive[start:start + len(texts)] = 1
+            if self._centroids is not None:
+                self._lists[start:start + len(texts)] = self._nearest_lists(matrix)
+            self._ids.extend(ids)
+            self._count += len(texts)
+            # Commit the new rows before tombstoning the rows they replace
+            self._save_state()
+
+            for row, doc_id in zip(rows, ids):
+                previous = self._row_of.get(doc_id)
+                if previous is not None:
+                    self._alive[previous] = 0
+                self._row_of[doc_id] = row
+            if self._centroids is not None:
+                for row, list_id in zip(rows, self._lists[start:start + len(texts)].tolist()):
+                    self._inverted[list_id].append(row)
+            self._maybe_train()
+            self._save_state()
+        return ids
+
+    def add_texts(
+        self,
+        texts: Iterable[str],
+        metadatas: Optional[List[dict]] = None,
+        *,
+        ids: Optional[List[str]] = None,
+        **kwargs: Any,
+    ) -> List[str]:
+        texts = list(texts)
+        vectors = self.embedding.embed_documents(texts)
+        return self.add_embeddings(texts, vectors, metadatas, ids)
+
+    def delete(self, ids: Optional[List[str]] = None, **kwargs: Any) -> Optional[bool]:
+        if not ids:
+            return False
+        with self._lock:
+            for doc_id in ids:
+                row = self._row_of.pop(doc_id, None)
+                if row is not None:
+                    self._alive[row] = 0
+            self._save_state()
+        return True
+
+    # Reads
+
+    @property
+    def embeddings(self) -> Embeddings:
+        return self.embedding
+
+    def __len__(self) -> int:
+        return len(self._row_of)
+
+    def get_by_ids(self, ids: Sequence[str], /) -> List[Document]:
+        with self._lock:
+            rows = [self._row_of[doc_id] for doc_id in ids if doc_id in self._row_of]
+            return [self._read_document(row) for row in rows]
+
+    def scan(self, cursor: int = 0, limit: int = 100) -> Tuple[List[int], Optional[int]]:
+        """Return up to `limit` live rows from row `cursor` on, and the cursor of the next page (None at the end)."""
+        with self._lock:
+            rows: List[int] = []
+            row = cursor
+            while row < self._count and len(rows) < limit:
+                end = min(self._count, row + 4 * limit)
+                live = np.flatnonzero(self._alive[row:end]) + row
+                rows.extend(live[: limit - len(rows)].tolist())
+                row = rows[-1] + 1 if len(rows) == limit else end
+            return rows, row if row < self._count else None
+
+    def id_of(self, row: int) -> str:
+        return self._ids[row]
+
+    def read_row(self, row: int) -> Document:
+        with self._lock:
+            return self._read_document(row)
+
+    def similarity_search_with_score_by_vector(
+        self,
+        embedding: List[float],
+        k: int = 4,
+        filter: Optional[Dict[str, Any]] = None,
+        **kwargs: Any,
+    ) -> List[Tuple[Document, float]]:
+        """Return the k best (document, cosine similarity) pairs matching `filter`."""
+        query = _normalize(np.asarray(embedding, dtype=np.float32))
+        with self._lock:
+            if self._count == 0:
+                return []
+            if self._centroids is not None:
+                probe = np.argsort(-(self._centroids @ query))[: self.n_probe]
+                rows = np.fromiter((row for list_id in probe for row in self._inverted[list_id]), dtype=np.int64)
+                rows = rows[self._alive[rows] == 1]
+                scores = self._vectors[rows] @ query
+            else:
+                rows = np.flatnonzero(self._alive[: self._count])
+                scores = (self._vectors[: self._count] @ query)[rows]
+
+            results = []
+            for index in np.argsort(-scores):
+                document = self._read_document(int(rows[index]))
+                if not matches_filter(document.metadata, filter):
+                    continue
+                results.append((document, float(scores[index])))
+                if len(results) == k:
+                    break
+            return results
+
+    def similarity_search_with_score(
+        self,
+        query: str,
+        k: int = 4,
+        filter: Optional[Dict[str, Any]] = None,
+        **kwargs: Any,
+    ) -> List[Tuple[Document, float]]:
+        return self.similarity_search_with_score_by_vector(self.embedding.embed_query(query), k, filter)
+
+    def similarity_search_by_vector(self, embedding: List[float], k: int = 4, **kwargs: Any) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_with_score_by_vector(embedding, k, **kwargs)]
+
+    def similarity_search(self, query: str, k: int = 4, **kwargs: Any) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_with_score(query, k, **kwargs)]
+
+    def _select_relevance_score_fn(self) -> Callable[[float], float]:
+        # Same mapping as langchain_pinecone for cosine indexes
+        return lambda score: (score + 1) / 2
+
+    @classmethod
+    def from_texts(
+        cls,
+        texts: List[str],
+        embedding: Embeddings,
+        metadatas: Optional[List[dict]] = None,
+        *,
+        ids: Optional[List[str]] = None,
+        path: str = "data/vector_store",
+        **kwargs: Any,
+    ) -> "LocalVectorStore":
+        store = cls(path, embedding, **kwargs)
+        store.add_texts(texts, metadatas, ids=ids)
+        return store
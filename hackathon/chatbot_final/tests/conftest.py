@@ -0,0 +1,68 @@
+"""
+Shared test setup.
+
+The src modules read their settings from the environment at import, so the
+environment is prepared here, before any test imports them:
+  - the vector store is the local backend in a temporary directory, with
+    hybrid search and the semantic cache off
+  - the embedding model is a deterministic fake (nothing is downloaded) and
+    every node's LLM is the fixed-latency fake of the benchmarks
+  - the database is TEST_DB_URI (a scratch Postgres database, libpq URI);
+    tests using the `pg_pool` or `graph` fixtures are skipped without it
+"""
+
+import os
+import tempfile
+
+TEST_DB_URI = os.getenv("TEST_DB_URI", "")
+
+os.environ["DB_URI"] = TEST_DB_URI or "postgresql://test@localhost/test"
+os.environ["VECTOR_STORE_BACKEND"] = "local"
+os.environ["LOCAL_VECTOR_STORE_PATH"] = tempfile.mkdtemp(prefix="test-vector-store-")
+os.environ["BM25_INDEX_PATH"] = os.path.join(os.environ["LOCAL_VECTOR_STORE_PATH"], "bm25_index.json")
+os.environ["HYBRID_SEARCH"] = "false"
+os.environ["SEMANTIC_CACHE_ENABLED"] = "false"
+os.environ["ROUTER_LOCAL_ENABLED"] = "false"
+os.environ["EMBEDDING_CACHE_DIR"] = ""
+os.environ.setdefault("TAVILY_API_KEY", "test")
+os.environ.setdefault("PINECONE_API_KEY", "test")
+
+import pytest
+from langchain_core.embeddings import DeterministicFakeEmbedding
+import src.config.embeddings as embeddings_config
+from benchmarks.fakes import LatencyChatModel, install_fake_llm
+
+EMBEDDING_DIM = 64
+
+embeddings_config.create_embeddings = lambda *args, **kwargs: DeterministicFakeEmbedding(size=EMBEDDING_DIM)
+install_fake_llm(LatencyChatModel(latency=0))
+
+CHECKPOINT_TABLES = ("checkpoints", "checkpoint_writes", "checkpoint_blobs")
+
+
+@pytest.fixture
+async def pg_pool():
+    """Opened checkpointer pool on TEST_DB_URI, with empty checkpoint tables."""
+    if not TEST_DB_URI:
+        pytest.skip("TEST_DB_URI is not set")
+    from langgraph.checkpoint.postgres.aio import AsyncPostgresSaver
+    from src.config.checkpointer import create_checkpointer_pool
+
+    pool = create_checkpointer_pool()
+    await pool.open(wait=True)
+    await AsyncPostgresSaver(pool).setup()
+    async with pool.connection() as conn:
+        await conn.execute(f"TRUNCATE {', '.join(CHECKPOINT_TABLES)}")
+    try:
+        yield pool
+    finally:
+        await pool.close()
+
+
+@pytest.fixture
+async def graph(pg_pool):
+    """The multi-agent graph compiled with the Postgres checkpointer, as in the API lifespan."""
+    from langgraph.checkpoint.postgres.aio import AsyncPostgresSaver
+    from src.agents.graph import create_graph
+
+    return create_graph().compile(checkpointer=AsyncPostgresSaver(pg_pool))
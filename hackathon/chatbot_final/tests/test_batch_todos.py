@@ -0,0 +1,78 @@
+import json
+import os
+import pytest
+from sqlalchemy import select
+from src.agents.tools import batch_todos
+
+pytestmark = pytest.mark.skipif(not os.getenv("TEST_DB_URI"), reason="TEST_DB_URI is not set")
+
+USER_ID = 990101
+OTHER_USER_ID = 990102
+
+
+@pytest.fixture
+async def todos():
+    """Empty todos for the two test users; returns a reader of (title, status) per user."""
+    from src.config.database import AsyncSessionLocal, Base, TodoItem, async_engine
+
+    async def clear():
+        async with AsyncSessionLocal() as db, db.begin():
+            await db.execute(TodoItem.__table__.delete().where(TodoItem.userId.in_([USER_ID, OTHER_USER_ID])))
+
+    async def read(user_id=USER_ID):
+        async with AsyncSessionLocal() as db:
+            rows = await db.execute(select(TodoItem.id, TodoItem.title, TodoItem.status).where(TodoItem.userId == user_id).order_by(TodoItem.id))
+            return [tuple(row) for row in rows]
+
+    async with async_engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all, tables=[TodoItem.__table__])
+    await clear()
+    try:
+        yield read
+    finally:
+        await clear()
+        await async_engine.dispose()
+
+
+async def run(*operations, user_id=USER_ID):
+    return json.loads(await batch_todos.ainvoke({"input": {"userId": user_id, "operations": list(operations)}}))
+
+
+async def test_batch_applies_every_operation(todos):
+    await run({"op": "create", "title": "khác"}, user_id=OTHER_USER_ID)
+    (other_id, _, _), = await todos(OTHER_USER_ID)
+    result = await run(
+        {"op": "create", "title": "Ôn thi Toán", "deadline": "2026-11-20"},
+        {"op": "create", "title": "Nộp báo cáo"},
+        {"op": "create", "title": "Họp nhóm"},
+    )
+    first, second, third = [item["id"] for item in result["results"]]
+    result = await run(
+        {"op": "update", "todo_ids": [first, second, other_id], "status": "done"},
+        {"op": "delete", "todo_ids": [third]},
+    )
+    assert (result["updated"], result["deleted"]) == (2, 1)
+    assert result["results"][0]["not_found"] == [other_id]
+    assert await todos() == [(first, "Ôn thi Toán", "done"), (second, "Nộp báo cáo", "done")]
+    assert await todos(OTHER_USER_ID) == [(other_id, "khác", "pending")]
+
+
+async def test_one_invalid_operation_applies_nothing(todos):
+    result = await run(
+        {"op": "create", "title": "Ôn thi Toán"},
+        {"op": "update", "todo_ids": [1], "deadline": "20/11/2026"},
+        {"op": "delete"},
+    )
+    assert result["error"] == "No operation was applied"
+    assert [item["index"] for item in result["invalid"]] == [1, 2]
+    assert await todos() == []
+
+
+async def test_a_failing_statement_rolls_back_the_creates(todos):
+    # The ids fit the tool schema but not the integer column: the update fails after the insert
+    result = await run(
+        {"op": "create", "title": "Ôn thi Toán"},
+        {"op": "update", "todo_ids": [2 ** 40], "status": "done"},
+    )
+    assert result["error"].startswith("Error applying batch, no operation was applied")
+    assert await todos() == []
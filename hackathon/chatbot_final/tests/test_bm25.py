@@ -0,0 +1,87 @@
+import os
+import unicodedata
+from langchain_core.documents import Document
+from src.retrieval.bm25 import BM25Index, reciprocal_rank_fusion, tokenize
+
+
+def test_tokenize_adds_diacritic_free_terms_and_bigrams():
+    terms = tokenize("Học phí")
+    assert {"học", "phí", "hoc", "phi", "hoc_phi"} <= set(terms)
+
+
+def test_tokenize_keeps_amounts_and_splits_codes():
+    terms = set(tokenize("Học phí 25.000.000đ cho môn SWP391"))
+    assert "25000000đ" in terms
+    assert {"swp391", "swp", "391", "swp_391"} <= terms
+    # "SWP 391" written apart shares the code terms
+    assert {"swp", "391", "swp_391"} <= set(tokenize("SWP 391"))
+
+
+def test_tokenize_normalizes_unicode_and_case():
+    decomposed = "Học phí"
+    assert tokenize(decomposed) == tokenize("học PHÍ")
+
+
+def doc(doc_id: str) -> Document:
+    return Document(id=doc_id, page_content=doc_id)
+
+
+def test_reciprocal_rank_fusion_favours_documents_in_both_rankings():
+    dense = [doc("a"), doc("b"), doc("c")]
+    lexical = [doc("d"), doc("c")]
+    fused = reciprocal_rank_fusion([dense, lexical], k=3)
+    assert [d.id for d in fused] == ["c", "a", "d"]
+
+
+def test_reciprocal_rank_fusion_of_one_ranking_keeps_its_order():
+    ranking = [doc("a"), doc("b"), doc("c")]
+    assert [d.id for d in reciprocal_rank_fusion([ranking, []], k=2)] == ["a", "b"]
+
+
+def test_search_ranks_by_bm25_and_leaves_out_unrelated_documents():
+    index = BM25Index()
+    index.add(
+        ["fee", "dorm", "code"],
+        ["Học phí ngành AI là 25.000.000đ mỗi kỳ", "Ký túc xá có phòng 4 người", "Môn SWP391 học ở kỳ 5"],
+    )
+    hits = [doc_id for doc_id, _ in index.search("hoc phi nganh AI", 5)]
+    assert hits[0] == "fee" and "dorm" not in hits
+    assert index.search("SWP 391", 5)[0][0] == "code"
+    assert index.search("thời tiết", 5) == []
+
+
+def test_readd_and_delete_update_postings():
+    index = BM25Index()
+    index.add(["a", "b"], ["học phí", "ký túc xá"])
+    index.add(["a"], ["điểm chuẩn"])
+    assert index.search("học phí", 5) == []
+    index.delete(["b"])
+    assert len(index) == 1
+    assert index.search("ký túc xá", 5) == []
+    # Freed slots are reused
+    index.add(["c"], ["ký túc xá"])
+    assert index.search("ký túc xá", 5)[0][0] == "c"
+
+
+def test_save_load_round_trip_and_change_detection(tmp_path):
+    path = str(tmp_path / "bm25.json")
+    writer = BM25Index(path)
+    writer.add(["a", "b"], ["học phí ngành AI", "ký túc xá"])
+    writer.save()
+
+    reader = BM25Index(path)
+    assert reader.load()
+    assert reader.search("hoc phi", 5) == writer.search("hoc phi", 5)
+    assert not reader.changed_on_disk()
+
+    writer.add(["c"], ["điểm chuẩn"])
+    writer.save()
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1))
+    assert reader.changed_on_disk()
+    assert reader.load() and len(reader) == 3
+
+
+def test_load_without_file():
+    assert not BM25Index("/nonexistent/bm25.json").load()
+    assert not BM25Index("/nonexistent/bm25.json").changed_on_disk()
@@ -0,0 +1,106 @@
+from langchain_core.messages import HumanMessage
+from src.maintenance.checkpoint_retention import CheckpointRetention, TABLES
+
+THREAD = "retention-thread"
+
+
+async def run_turn(graph, thread_id: str = THREAD, user_id: str = "1") -> None:
+    config = {"configurable": {"thread_id": thread_id}}
+    await graph.ainvoke({"messages": [HumanMessage(content="Xin chào, hôm nay thế nào?")], "user_id": user_id}, config)
+
+
+async def row_counts(pool, thread_id: str = THREAD) -> dict:
+    counts = {}
+    async with pool.connection() as conn:
+        for table in TABLES:
+            cursor = await conn.execute(f"SELECT count(*) FROM {table} WHERE thread_id = %s", (thread_id,))
+            counts[table] = (await cursor.fetchone())[0]
+    return counts
+
+
+async def namespaces(pool, thread_id: str = THREAD) -> set:
+    async with pool.connection() as conn:
+        cursor = await conn.execute("SELECT DISTINCT checkpoint_ns FROM checkpoints WHERE thread_id = %s", (thread_id,))
+        return {row[0] for row in await cursor.fetchall()}
+
+
+def retention(pool, keep: int = 2) -> CheckpointRetention:
+    # No grace period: the thread was written a moment ago
+    return CheckpointRetention(pool, keep_latest=keep, ttl_days=30, grace_minutes=0)
+
+
+async def test_agent_subgraphs_write_a_new_namespace_every_turn(graph, pg_pool):
+    for _ in range(3):
+        await run_turn(graph)
+    subgraph_namespaces = {ns for ns in await namespaces(pg_pool) if ns}
+    assert len(subgraph_namespaces) == 3
+
+
+async def test_row_count_stays_flat_across_turns(graph, pg_pool):
+    job = retention(pg_pool)
+    counts = []
+    for _ in range(6):
+        await run_turn(graph)
+        await job.run()
+        counts.append(await row_counts(pg_pool))
+    # Once the kept window is full, every turn adds as many rows as pruning removes
+    assert counts[-1] == counts[-2] == counts[-3]
+    state = await graph.aget_state({"configurable": {"thread_id": THREAD}})
+    assert len(state.values["messages"]) == 12
+
+
+async def test_keeps_latest_root_checkpoints_and_drops_older_subgraphs(graph, pg_pool):
+    for _ in range(4):
+        await run_turn(graph)
+    async with pg_pool.connection() as conn:
+        cursor = await conn.execute(
+            "SELECT checkpoint_id FROM checkpoints WHERE thread_id = %s AND checkpoint_ns = '' ORDER BY checkpoint_id DESC LIMIT 3",
+            (THREAD,),
+        )
+        latest_roots = [row[0] for row in await cursor.fetchall()]
+
+    await retention(pg_pool, keep=3).run()
+
+    async with pg_pool.connection() as conn:
+        cursor = await conn.execute(
+            "SELECT checkpoint_ns, checkpoint_id FROM checkpoints WHERE thread_id = %s", (THREAD,)
+        )
+        remaining = await cursor.fetchall()
+        cursor = await conn.execute(
+            """
+            SELECT count(*) FROM checkpoint_blobs b
+            WHERE b.thread_id = %s AND NOT EXISTS (
+                SELECT 1 FROM checkpoints c
+                WHERE c.thread_id = b.thread_id AND c.checkpoint_ns = b.checkpoint_ns
+                  AND c.checkpoint -> 'channel_versions' ->> b.channel = b.version
+            )
+            """,
+            (THREAD,),
+        )
+        orphan_blobs = (await cursor.fetchone())[0]
+    assert sorted(cp for ns, cp in remaining if ns == "") == sorted(latest_roots)
+    assert all(cp > min(latest_roots) for ns, cp in remaining if ns)
+    assert orphan_blobs == 0
+
+
+async def test_expired_threads_are_deleted_and_dry_run_rolls_back(graph, pg_pool):
+    await run_turn(graph, thread_id="expired-thread")
+    await run_turn(graph)
+    async with pg_pool.connection() as conn:
+        await conn.execute(
+            """
+            UPDATE checkpoints
+            SET checkpoint = jsonb_set(checkpoint, '{ts}', to_jsonb((now() - interval '60 days')::text))
+            WHERE thread_id = 'expired-thread'
+            """
+        )
+    before = await row_counts(pg_pool, "expired-thread")
+
+    report = await retention(pg_pool).run(dry_run=True)
+    assert report.threads_expired == 1
+    assert report.rows_deleted["checkpoints"] >= before["checkpoints"]
+    assert await row_counts(pg_pool, "expired-thread") == before
+
+    await retention(pg_pool).run()
+    assert await row_counts(pg_pool, "expired-thread") == dict.fromkeys(TABLES, 0)
+    assert (await row_counts(pg_pool))["checkpoints"] > 0
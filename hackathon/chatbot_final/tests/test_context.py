@@ -0,0 +1,90 @@
+import pytest
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage, ToolMessage
+import src.agents.context as context_module
+from src.agents.context import (
+    COLLAPSE_MESSAGE_TOKENS,
+    SUMMARY_PREFIX,
+    build_context,
+    count_tokens,
+    message_tokens,
+    prompt_token_stats,
+    tokens_with_input,
+    tokens_with_reply,
+)
+
+NODE = "rag_agent"
+
+
+@pytest.fixture
+def budget(monkeypatch):
+    def set_budget(tokens):
+        monkeypatch.setitem(context_module.NODE_CONTEXT_BUDGETS, NODE, tokens)
+    return set_budget
+
+
+def turns(n, words=20):
+    messages = []
+    for i in range(n):
+        messages.append(HumanMessage(content=f"câu hỏi {i} " + "học phí " * words))
+        messages.append(AIMessage(content=f"trả lời {i} " + "ba mươi triệu " * words))
+    return messages
+
+
+def test_short_conversation_is_sent_whole(budget):
+    budget(3000)
+    messages = turns(2) + [HumanMessage(content="Còn ngành SE?")]
+    assert build_context({"messages": messages}, NODE) == messages
+
+
+def test_oldest_turns_are_dropped_to_fit_the_budget(budget):
+    messages = turns(10) + [HumanMessage(content="Còn ngành SE?")]
+    budget(count_tokens(messages) // 3)
+    context = build_context({"messages": messages}, NODE)
+    assert count_tokens(context) <= count_tokens(messages) // 3
+    assert context == messages[-len(context):]
+    assert isinstance(context[0], HumanMessage)
+
+
+def test_summary_comes_first_and_counts_against_the_budget(budget):
+    messages = turns(4) + [HumanMessage(content="Còn ngành SE?")]
+    budget(count_tokens(messages))
+    context = build_context({"messages": messages, "summary": "Người dùng hỏi học phí. " * 20}, NODE)
+    assert isinstance(context[0], SystemMessage) and context[0].content.startswith(SUMMARY_PREFIX)
+    assert count_tokens(context) <= count_tokens(messages)
+    assert len(context) - 1 < len(messages)
+
+
+def test_long_old_messages_are_collapsed_but_the_latest_exchange_is_not(budget):
+    budget(100000)
+    pasted = "Quy chế đào tạo. " * 2000
+    messages = [HumanMessage(content=pasted), AIMessage(content="Đã đọc."), HumanMessage(content="Tóm tắt giúp tôi"), AIMessage(content=pasted)]
+    context = build_context({"messages": messages}, NODE)
+    assert message_tokens(context[0]) <= COLLAPSE_MESSAGE_TOKENS + 10 and context[0].content.endswith("(đã rút gọn)")
+    assert context[-1].content == pasted
+
+
+def test_latest_message_is_sent_even_over_budget(budget):
+    budget(10)
+    messages = turns(2) + [HumanMessage(content="học phí " * 500)]
+    assert build_context({"messages": messages}, NODE) == messages[-1:]
+
+
+def test_dropped_messages_are_recorded(budget):
+    messages = turns(6) + [HumanMessage(content="Còn ngành SE?")]
+    budget(count_tokens(messages) // 2)
+    before = prompt_token_stats.snapshot().get(NODE, {}).get("dropped_messages", 0)
+    context = build_context({"messages": messages}, NODE)
+    assert prompt_token_stats.snapshot()[NODE]["dropped_messages"] - before == len(messages) - len(context)
+
+
+def test_running_token_total():
+    messages = turns(2) + [HumanMessage(content="Còn ngành SE?")]
+    # Threads checkpointed before the running total existed are counted in full once
+    assert tokens_with_input({"messages": messages}) == count_tokens(messages)
+    state = {"messages": messages, "context_tokens": count_tokens(messages[:-1])}
+    assert tokens_with_input(state) == count_tokens(messages)
+
+    reply = AIMessage(content="", tool_calls=[{"name": "rag_retrieve", "args": {"query": "học phí SE"}, "id": "1"}])
+    assert message_tokens(reply) > message_tokens(AIMessage(content=""))
+    assert tokens_with_reply({"messages": messages, "context_tokens": 100}, reply) == 100 + message_tokens(reply)
+    assert message_tokens(ToolMessage(content=[{"type": "text", "text": "30 triệu"}], tool_call_id="1")) > 0
@@ -0,0 +1,41 @@
+import threading
+import pytest
+from langchain_core.embeddings import DeterministicFakeEmbedding
+import src.config.embedding_cache as embedding_cache_module
+from src.config.embedding_cache import CachedQueryEmbeddings
+
+
+def cached(tmp_path):
+    return CachedQueryEmbeddings(DeterministicFakeEmbedding(size=8), "fake-model", max_entries=16, cache_dir=str(tmp_path))
+
+
+async def test_periodic_flush_runs_off_the_event_loop(tmp_path, monkeypatch):
+    monkeypatch.setattr(embedding_cache_module, "FLUSH_EVERY", 2)
+    embeddings = cached(tmp_path)
+    flush = embeddings.flush
+    flush_threads = []
+
+    def recording_flush():
+        flush_threads.append(threading.get_ident())
+        flush()
+
+    monkeypatch.setattr(embeddings, "flush", recording_flush)
+    first = await embeddings.aembed_query("Học phí ngành AI?")
+    await embeddings.aembed_query("Điểm chuẩn ngành AI?")
+    await embeddings.aembed_query("Học phí ngành AI?")
+
+    assert len(flush_threads) == 1
+    assert flush_threads[0] != threading.get_ident()
+    # The flushed slot table is loaded after a restart
+    reloaded = cached(tmp_path)
+    assert await reloaded.aembed_query("Học phí ngành AI?") == pytest.approx(first, rel=1e-6)
+    assert reloaded.stats()["hits"] == 1
+
+
+async def test_shutdown_flush_persists_the_entries_since_the_last_flush(tmp_path):
+    embeddings = cached(tmp_path)
+    vector = await embeddings.aembed_query("Học phí ngành AI?")
+    embeddings.flush()
+    reloaded = cached(tmp_path)
+    assert reloaded.embed_query("Học phí ngành AI?") == pytest.approx(vector, rel=1e-6)
+    assert reloaded.stats()["hits"] == 1
@@ -0,0 +1,29 @@
+import pytest
+from langchain_core.embeddings import DeterministicFakeEmbedding
+from src.config.embeddings import select_backend, model_signature
+from src.retrieval.local_index import LocalVectorStore
+
+
+@pytest.mark.parametrize("device", ["cpu", "cuda", "mps"])
+def test_auto_is_fp32_torch_on_every_device(device):
+    assert select_backend(device, "auto") == "torch"
+
+
+def test_quantized_backends_are_opt_in():
+    assert select_backend("cpu", "torch-int8") == "torch-int8"
+    assert select_backend("cpu", "onnx") == "onnx"
+    with pytest.raises(ValueError):
+        select_backend("cuda", "torch-int8")
+    with pytest.raises(ValueError):
+        select_backend("cpu", "int4")
+
+
+def test_local_index_refuses_another_model_signature(tmp_path):
+    embedding = DeterministicFakeEmbedding(size=8)
+    fp32 = model_signature("gte", "torch")
+    store = LocalVectorStore(str(tmp_path), embedding, model_signature=fp32)
+    store.add_texts(["Học phí ngành AI"], ids=["a"])
+
+    assert LocalVectorStore(str(tmp_path), embedding, model_signature=fp32).get_by_ids(["a"])
+    with pytest.raises(ValueError, match="torch-int8"):
+        LocalVectorStore(str(tmp_path), embedding, model_signature=model_signature("gte", "torch-int8"))
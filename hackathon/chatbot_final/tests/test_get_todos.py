@@ -0,0 +1,58 @@
+import json
+import os
+from datetime import datetime
+import pytest
+from src.agents.tools import get_todos
+
+pytestmark = pytest.mark.skipif(not os.getenv("TEST_DB_URI"), reason="TEST_DB_URI is not set")
+
+USER_ID = 990103
+
+
+@pytest.fixture
+async def add_todo():
+    """Empty todo list for the test user; returns an inserter of (title, deadline)."""
+    from src.config.database import AsyncSessionLocal, Base, TodoItem, async_engine
+
+    async def clear():
+        async with AsyncSessionLocal() as db, db.begin():
+            await db.execute(TodoItem.__table__.delete().where(TodoItem.userId == USER_ID))
+
+    async def add(title, deadline=None):
+        async with AsyncSessionLocal() as db, db.begin():
+            db.add(TodoItem(title=title, deadline=deadline, status="pending", userId=USER_ID))
+
+    async with async_engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all, tables=[TodoItem.__table__])
+    await clear()
+    try:
+        yield add
+    finally:
+        await clear()
+        await async_engine.dispose()
+
+
+async def titles(**filters):
+    result = json.loads(await get_todos.ainvoke({"input": {"userId": USER_ID, "include_past": True, **filters}}))
+    return sorted(todo["title"] for todo in result["todos"])
+
+
+async def test_title_filter_matches_wildcards_literally(add_todo):
+    await add_todo("Đạt 100% bài tập")
+    await add_todo("Đạt 1000 điểm")
+    await add_todo("file_name.txt")
+    await add_todo("filename.txt")
+    await add_todo("C:\\temp")
+    assert await titles(title_contains="100%") == ["Đạt 100% bài tập"]
+    assert await titles(title_contains="file_") == ["file_name.txt"]
+    assert await titles(title_contains="%") == ["Đạt 100% bài tập"]
+    assert await titles(title_contains="c:\\t") == ["C:\\temp"]
+
+
+async def test_date_only_deadline_to_includes_the_whole_day(add_todo):
+    await add_todo("sáng", datetime(2026, 11, 20, 8, 0))
+    await add_todo("tối", datetime(2026, 11, 20, 23, 30))
+    await add_todo("hôm sau", datetime(2026, 11, 21, 0, 0))
+    assert await titles(deadline_to="2026-11-20") == ["sáng", "tối"]
+    assert await titles(deadline_to="2026-11-20 08:00") == ["sáng"]
+    assert await titles(deadline_from="2026-11-20 09:00", deadline_to="2026-11-21") == ["hôm sau", "tối"]
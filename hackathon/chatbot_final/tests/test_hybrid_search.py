@@ -0,0 +1,117 @@
+import os
+import pytest
+from langchain_core.documents import Document
+import src.config.vector_store as vector_store_module
+from src.config.vector_store import VectorStoreCRUD
+from src.retrieval.bm25 import BM25Index
+from src.retrieval.ingest import chunk_id, rebuild_lexical_index
+
+CHUNKS = {
+    "fee": "Học phí ngành Trí tuệ nhân tạo là 25.000.000đ mỗi kỳ",
+    "dorm": "Ký túc xá có phòng 4 người, giá 1.500.000đ một tháng",
+    "code": "Môn SWP391 là đồ án phần mềm ở kỳ 5",
+}
+
+
+@pytest.fixture
+def crud(monkeypatch, tmp_path):
+    monkeypatch.setattr(vector_store_module, "HYBRID_SEARCH", True)
+    monkeypatch.setattr(vector_store_module, "LOCAL_VECTOR_STORE_PATH", str(tmp_path / "store"))
+    monkeypatch.setattr(vector_store_module, "BM25_INDEX_PATH", str(tmp_path / "bm25.json"))
+    crud = VectorStoreCRUD()
+    texts = list(CHUNKS.values())
+    crud.vector_store.add_embeddings(texts, crud.embeddings.embed_documents(texts), [{} for _ in texts], list(CHUNKS))
+    return crud
+
+
+def write_index(path: str, ids) -> None:
+    index = BM25Index(path)
+    index.add(list(ids), [CHUNKS[doc_id] for doc_id in ids])
+    index.save()
+    # Make sure the reader sees a new mtime even on coarse-grained filesystems
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+
+
+async def test_missing_lexical_index_does_not_fail_startup(crud):
+    await crud.load_lexical_index()
+    assert len(crud.lexical_index) == 0
+    assert await crud.lexical_search("học phí", 5) == []
+
+
+async def test_lexical_hits_are_not_fused_without_a_dense_result(crud, monkeypatch):
+    write_index(crud.lexical_index.path, CHUNKS)
+    await crud.load_lexical_index()
+
+    async def nothing_relevant(query, k, filter=None):
+        return []
+
+    monkeypatch.setattr(crud, "dense_search", nothing_relevant)
+    assert [doc.id for doc in await crud.lexical_search("học phí", 5)] == ["fee"]
+    assert await crud.search("học phí") == []
+
+
+async def test_lexical_hits_are_fused_with_dense_results(crud, monkeypatch):
+    write_index(crud.lexical_index.path, CHUNKS)
+    await crud.load_lexical_index()
+
+    async def dense(query, k, filter=None):
+        return [Document(id="dorm", page_content=CHUNKS["dorm"])]
+
+    monkeypatch.setattr(crud, "dense_search", dense)
+    assert {doc.id for doc in await crud.search("học phí", k=3)} == {"dorm", "fee"}
+
+
+async def test_index_rewritten_by_the_ingest_cli_is_reloaded(crud):
+    write_index(crud.lexical_index.path, ["dorm"])
+    await crud.load_lexical_index()
+    assert await crud.lexical_search("SWP391", 5) == []
+
+    write_index(crud.lexical_index.path, ["dorm", "code"])
+    assert [doc.id for doc in await crud.lexical_search("SWP391", 5)] == ["code"]
+
+
+def test_rebuild_lexical_index_from_source_files(tmp_path):
+    root = tmp_path / "docs"
+    (root / "fees").mkdir(parents=True)
+    (root / "fees" / "ai.md").write_text(CHUNKS["fee"], encoding="utf-8")
+    (root / "dorm.txt").write_text(CHUNKS["dorm"], encoding="utf-8")
+    path = str(tmp_path / "bm25.json")
+
+    assert rebuild_lexical_index(str(root), path=path) == 2
+    index = BM25Index(path)
+    assert index.load()
+    assert index.search("học phí", 1)[0][0] == chunk_id(os.path.join("fees", "ai.md"), CHUNKS["fee"])
+
+
+async def test_crud_writes_update_the_lexical_index(crud, monkeypatch):
+    async def no_version():
+        return 0
+
+    monkeypatch.setattr(vector_store_module, "bump_knowledge_version", no_version)
+    write_index(crud.lexical_index.path, CHUNKS)
+    await crud.load_lexical_index()
+
+    notice = Document(page_content="Lịch thi môn SWP391 được dời sang tuần sau", metadata={})
+    await crud.add_documents([notice], ids=["notice"])
+    await crud.delete_documents(["code"])
+    assert [doc.id for doc in await crud.lexical_search("SWP391", 5)] == ["notice"]
+
+    # Persisted for the other processes, which reload it
+    other = BM25Index(crud.lexical_index.path)
+    assert other.load() and {doc_id for doc_id, _ in other.search("SWP391", 5)} == {"notice"}
+    assert not crud.lexical_index.changed_on_disk()
+
+
+async def test_deferred_lexical_updates_are_saved_on_demand(crud, monkeypatch):
+    async def no_version():
+        return 0
+
+    monkeypatch.setattr(vector_store_module, "bump_knowledge_version", no_version)
+    await crud.delete_documents(["fee"], persist_lexical=False)
+    texts = ["Học phí ngành AI là 30.000.000đ"]
+    await crud.add_embedded_documents([Document(page_content=texts[0])], crud.embeddings.embed_documents(texts), ["fee-2026"], persist_lexical=False)
+    assert not os.path.exists(crud.lexical_index.path)
+    await crud.save_lexical_index()
+    saved = BM25Index(crud.lexical_index.path)
+    assert saved.load() and [doc_id for doc_id, _ in saved.search("học phí", 5)] == ["fee-2026"]
@@ -0,0 +1,133 @@
+import asyncio
+import os
+import pytest
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+import src.config.vector_store as vector_store_module
+import src.retrieval.ingest as ingest_module
+from src.retrieval.bm25 import BM25Index
+from src.retrieval.ingest import IngestManifest, IngestStats, ingest_directory, iter_chunks
+
+SPLITTER = RecursiveCharacterTextSplitter(chunk_size=40, chunk_overlap=0)
+
+
+def write_docs(root, text):
+    root.mkdir(exist_ok=True)
+    (root / "hoc_phi.md").write_text(text, encoding="utf-8")
+
+
+def ingest(root, manifest):
+    """Run the chunking side of an ingest and mark every yielded chunk upserted."""
+    chunks = list(iter_chunks(str(root), manifest, SPLITTER, IngestStats()))
+    manifest.mark_upserted(chunks)
+    for source in list(manifest.completed_files()):
+        manifest.files[source].update(status="done", done_ids=[], previous_ids=[])
+    manifest.save()
+    return [chunk.id for chunk in chunks]
+
+
+TEXT = "Học phí ngành AI là 30 triệu một kỳ.\n\nHọc phí ngành SE là 28 triệu một kỳ."
+
+
+def test_changing_the_model_signature_re_embeds_every_file(tmp_path):
+    root, path = tmp_path / "docs", str(tmp_path / "manifest.json")
+    write_docs(root, TEXT)
+    first = ingest(root, IngestManifest(path, "gte:torch"))
+    assert len(first) == 2
+
+    assert ingest(root, IngestManifest(path, "gte:torch")) == []
+    assert ingest(root, IngestManifest(path, "gte:torch-int8")) == first
+    assert IngestManifest(path, "gte:torch-int8").files["hoc_phi.md"]["model_signature"] == "gte:torch-int8"
+
+
+def test_crashed_version_is_carried_over_when_the_file_changes_again(tmp_path):
+    root, path = tmp_path / "docs", str(tmp_path / "manifest.json")
+    write_docs(root, "Học phí ngành AI là 30 triệu một kỳ.\n\nHọc phí ngành SE là 28 triệu một kỳ.")
+    v1 = ingest(root, IngestManifest(path, "gte:torch"))
+
+    # v2 crashes after upserting its first new chunk: v1 is still in the index
+    write_docs(root, "Học phí ngành AI là 30 triệu một kỳ.\n\nHọc phí ngành GD là 26 triệu một kỳ.")
+    manifest = IngestManifest(path, "gte:torch")
+    chunks = iter_chunks(str(root), manifest, SPLITTER, IngestStats())
+    v2_chunk = next(chunks)
+    manifest.mark_upserted([v2_chunk])
+    manifest.save()
+
+    write_docs(root, "Học phí ngành AI là 30 triệu một kỳ.\n\nHọc phí ngành IA là 27 triệu một kỳ.")
+    manifest = IngestManifest(path, "gte:torch")
+    upserted = [chunk.id for chunk in iter_chunks(str(root), manifest, SPLITTER, IngestStats())]
+    entry = manifest.files["hoc_phi.md"]
+    assert set(entry["previous_ids"]) == set(v1) | {v2_chunk.id}
+    # The unchanged chunk is reused, the crashed run's chunk and v1's second chunk become stale
+    assert upserted == [entry["chunk_ids"][1]]
+    assert set(entry["previous_ids"]) - set(entry["chunk_ids"]) == {v1[1], v2_chunk.id}
+
+
+@pytest.fixture
+def local_crud(monkeypatch, tmp_path):
+    async def no_version(*args):
+        return 0
+
+    monkeypatch.setattr(vector_store_module, "LOCAL_VECTOR_STORE_PATH", str(tmp_path / "store"))
+    monkeypatch.setattr(vector_store_module, "bump_knowledge_version", no_version)
+    monkeypatch.setattr(vector_store_module, "HYBRID_SEARCH", True)
+    monkeypatch.setattr(vector_store_module, "BM25_INDEX_PATH", str(tmp_path / "bm25.json"))
+    crud = vector_store_module.VectorStoreCRUD()
+    monkeypatch.setattr(ingest_module, "vector_store_crud", crud)
+    return crud
+
+
+async def test_chunks_of_removed_files_are_deleted(tmp_path, local_crud):
+    root, path = tmp_path / "docs", str(tmp_path / "manifest.json")
+    write_docs(root, TEXT)
+    (root / "ky_tuc_xa.md").write_text("Ký túc xá có phòng 4 người.", encoding="utf-8")
+    stats = await ingest_directory(str(root), manifest_path=path, chunk_size=40, chunk_overlap=0)
+    assert stats.chunks_upserted == 3
+    dorm_ids = IngestManifest(path, local_crud.model_signature).files["ky_tuc_xa.md"]["chunk_ids"]
+
+    os.remove(root / "ky_tuc_xa.md")
+    stats = await ingest_directory(str(root), manifest_path=path, chunk_size=40, chunk_overlap=0)
+    assert (stats.files_removed, stats.chunks_deleted, stats.files_skipped) == (1, 1, 1)
+    assert local_crud.vector_store.get_by_ids(dorm_ids) == []
+    assert len(local_crud.vector_store) == 2
+    assert "ky_tuc_xa.md" not in IngestManifest(path, local_crud.model_signature).files
+    lexical_index = BM25Index(local_crud.lexical_index.path)
+    assert lexical_index.load() and len(lexical_index) == 2
+
+
+async def test_manifest_of_another_directory_is_refused(tmp_path, local_crud):
+    path = str(tmp_path / "manifest.json")
+    write_docs(tmp_path / "docs", TEXT)
+    await ingest_directory(str(tmp_path / "docs"), manifest_path=path, chunk_size=40, chunk_overlap=0)
+    (tmp_path / "other").mkdir()
+    with pytest.raises(ValueError, match="another --manifest"):
+        await ingest_directory(str(tmp_path / "other"), manifest_path=path)
+    assert len(local_crud.vector_store) == 2
+
+
+async def test_failed_upsert_cancels_the_running_ones(tmp_path, local_crud, monkeypatch):
+    root, path = tmp_path / "docs", str(tmp_path / "manifest.json")
+    write_docs(root, "\n\n".join(f"Học phí ngành {major} là 30 triệu một kỳ." for major in ("AI", "SE", "GD", "IA", "KT")))
+    add = local_crud.add_embedded_documents
+    calls, cancelled = [], []
+
+    async def flaky_add(documents, vectors, ids, persist_lexical=True):
+        calls.append(ids)
+        if len(calls) == 1:
+            return await add(documents, vectors, ids, persist_lexical=persist_lexical)
+        if len(calls) == 2:
+            await asyncio.sleep(0.01)
+            raise ConnectionError("upsert failed")
+        try:
+            await asyncio.Event().wait()
+        except asyncio.CancelledError:
+            cancelled.append(ids)
+            raise
+
+    monkeypatch.setattr(local_crud, "add_embedded_documents", flaky_add)
+    with pytest.raises(ConnectionError):
+        await ingest_directory(str(root), manifest_path=path, upsert_batch_size=1, upsert_concurrency=3, chunk_size=40, chunk_overlap=0)
+
+    # The batches still running when the second one failed were cancelled, the last one was never scheduled
+    assert cancelled == calls[2:] and len(calls) < 5
+    entry = IngestManifest(path, local_crud.model_signature).files["hoc_phi.md"]
+    assert entry["status"] != "done" and entry["done_ids"] == calls[0]
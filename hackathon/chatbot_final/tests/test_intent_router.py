@@ -0,0 +1,73 @@
+import pytest
+from src.agents.intent_router import IntentRouter, ROUTER_CONFIDENCE_THRESHOLD, ROUTER_MIN_SIMILARITY
+
+EXAMPLES = {"rag_agent": ["rag"], "schedule_agent": ["schedule"], "analytic_agent": ["analytic"], "generic_agent": ["generic"]}
+BASIS = {"rag": [1, 0, 0, 0], "schedule": [0, 1, 0, 0], "analytic": [0, 0, 1, 0], "generic": [0, 0, 0, 1]}
+
+
+class ScriptedEmbeddings:
+    """Examples embed to the basis vectors; queries to the vector scripted for them (zero otherwise)."""
+
+    def __init__(self, queries=None, fail=False):
+        self.queries = queries or {}
+        self.fail = fail
+        self.query_calls = 0
+
+    async def aembed_documents(self, texts):
+        return [BASIS[text] for text in texts]
+
+    async def aembed_query(self, text):
+        self.query_calls += 1
+        if self.fail:
+            raise ConnectionError("embedding backend down")
+        return self.queries.get(text, [0, 0, 0, 0])
+
+
+def similarities(rag=0.0, schedule=0.0, analytic=0.0, generic=0.0):
+    return [rag, schedule, analytic, generic]
+
+
+async def classify(text, vector=None, **kwargs):
+    embeddings = ScriptedEmbeddings({text: vector} if vector else None, **kwargs)
+    return await IntentRouter(embeddings, EXAMPLES).classify(text), embeddings
+
+
+async def test_short_follow_ups_without_keywords_go_to_the_llm():
+    decision, embeddings = await classify("xóa nó")
+    assert (decision.route, decision.path) == (None, "llm")
+    assert embeddings.query_calls == 0
+
+
+async def test_keyword_match_routes_without_similar_examples():
+    decision, _ = await classify("Cho mình hỏi học phí ngành AI với")
+    assert (decision.route, decision.path) == ("rag_agent", "keyword")
+
+
+async def test_keywords_outweigh_a_small_embedding_lead():
+    decision, _ = await classify("Giúp mình xóa task ôn thi nhé", similarities(rag=0.7, schedule=0.55))
+    assert (decision.route, decision.path) == ("schedule_agent", "keyword")
+
+
+async def test_similar_example_routes_by_embedding():
+    decision, _ = await classify("Tuần này tôi có bị quá tải không", similarities(analytic=0.9, generic=0.3))
+    assert (decision.route, decision.path) == ("analytic_agent", "embedding")
+    assert decision.confidence == pytest.approx(0.6)
+
+
+@pytest.mark.parametrize("best, second, route", [
+    (0.9, 0.9 - ROUTER_CONFIDENCE_THRESHOLD / 2, None),      # ambiguous
+    (0.9, 0.9 - ROUTER_CONFIDENCE_THRESHOLD * 1.5, "generic_agent"),
+    (ROUTER_MIN_SIMILARITY - 0.05, 0.0, None),                # confident but not similar enough
+    (ROUTER_MIN_SIMILARITY + 0.05, 0.0, "generic_agent"),
+])
+async def test_embedding_thresholds(best, second, route):
+    decision, _ = await classify("Kể cho tôi nghe chuyện gì đó vui", similarities(generic=best, rag=second))
+    assert decision.route == route
+    assert decision.path == ("embedding" if route else "llm")
+
+
+async def test_embedding_failure_falls_back_to_keywords():
+    decision, _ = await classify("Thời tiết Hà Nội hôm nay thế nào", fail=True)
+    assert (decision.route, decision.path) == ("generic_agent", "keyword")
+    decision, _ = await classify("Viết giúp tôi một email xin nghỉ", fail=True)
+    assert (decision.route, decision.path) == (None, "llm")
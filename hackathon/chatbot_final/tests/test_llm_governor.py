@@ -0,0 +1,78 @@
+import asyncio
+import time
+import pytest
+import src.config.llm_governor as governor_module
+from src.config.llm_governor import LLMCaller, LLMGovernor
+
+
+async def admission_order(governor, callers):
+    """Queue one call per caller behind a busy slot, then record the order they are admitted in."""
+    await governor.acquire(LLMCaller("busy"))
+    order = []
+
+    async def call(caller, n):
+        await governor.acquire(caller)
+        order.append(f"{caller.user}{n}")
+        governor.release()
+
+    tasks = [asyncio.create_task(call(caller, n)) for n, caller in enumerate(callers)]
+    await asyncio.sleep(0)
+    governor.release()
+    await asyncio.gather(*tasks)
+    return order
+
+
+async def test_a_burst_from_one_user_does_not_delay_the_others():
+    student_a, student_b = LLMCaller("a"), LLMCaller("b")
+    order = await admission_order(LLMGovernor(max_concurrency=1), [student_a] * 4 + [student_b])
+    assert order == ["a0", "b4", "a1", "a2", "a3"]
+
+
+async def test_role_weight_sets_the_admissions_per_turn():
+    admin, student = LLMCaller("admin", weight=2), LLMCaller("s")
+    order = await admission_order(LLMGovernor(max_concurrency=1), [admin] * 3 + [student] * 3)
+    assert order == ["admin0", "admin1", "s3", "admin2", "s4", "s5"]
+
+
+async def test_cancelled_waiters_are_skipped():
+    governor = LLMGovernor(max_concurrency=1)
+    await governor.acquire(LLMCaller("busy"))
+    waiting = asyncio.create_task(governor.acquire(LLMCaller("a")))
+    await asyncio.sleep(0)
+    waiting.cancel()
+    await asyncio.sleep(0)
+    governor.release()
+    await asyncio.wait_for(governor.acquire(LLMCaller("b")), 1)
+    assert governor.stats()["cancelled"] == 1 and governor.queue_depth == 0
+
+
+def test_backoff_doubles_up_to_the_cap_and_resets_on_success(monkeypatch):
+    monkeypatch.setattr(governor_module, "LLM_BACKOFF_INITIAL", 1.0)
+    monkeypatch.setattr(governor_module, "LLM_BACKOFF_MAX", 5.0)
+    governor = LLMGovernor()
+    assert [governor.rate_limited() for _ in range(4)] == [1.0, 2.0, 4.0, 5.0]
+    governor.succeeded()
+    assert governor.rate_limited() == 1.0
+
+
+async def test_rate_limit_pauses_admissions_for_everyone(monkeypatch):
+    monkeypatch.setattr(governor_module, "LLM_BACKOFF_INITIAL", 0.1)
+    governor = LLMGovernor(max_concurrency=4)
+    governor.rate_limited()
+    start = time.monotonic()
+    await asyncio.gather(governor.acquire(LLMCaller("a")), governor.acquire(LLMCaller("b")))
+    assert time.monotonic() - start >= 0.09
+    assert governor.stats()["active"] == 2
+
+
+async def test_stats_do_not_expose_user_ids():
+    governor = LLMGovernor(max_concurrency=1)
+    await governor.acquire(LLMCaller("busy"))
+    waiting = [asyncio.create_task(governor.acquire(LLMCaller(user))) for user in ("42", "42", "7")]
+    await asyncio.sleep(0)
+    stats = governor.stats()
+    assert (stats["queue_depth"], stats["queued_users"], stats["max_user_queue_depth"]) == (3, 2, 2)
+    assert all(isinstance(value, (int, float)) for key, value in stats.items() if key != "wait_ms")
+    for task in waiting:
+        task.cancel()
+    await asyncio.gather(*waiting, return_exceptions=True)
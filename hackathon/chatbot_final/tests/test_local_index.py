@@ -0,0 +1,150 @@
+import numpy as np
+import pytest
+from langchain_core.embeddings import DeterministicFakeEmbedding
+import src.retrieval.local_index as local_index_module
+from src.retrieval.local_index import LocalVectorStore, matches_filter
+
+DIM = 32
+
+
+@pytest.mark.parametrize("filter, expected", [
+    (None, True),
+    ({"source": "hoc_phi.md"}, True),
+    ({"source": "khac.md"}, False),
+    ({"source": {"$ne": "khac.md"}}, True),
+    ({"year": {"$gte": 2025, "$lt": 2027}}, True),
+    ({"year": {"$gt": 2026}}, False),
+    ({"missing": {"$gt": 1}}, False),
+    ({"missing": {"$exists": False}}, True),
+    ({"tags": "ai"}, True),
+    ({"tags": {"$in": ["se", "gd"]}}, False),
+    ({"tags": {"$nin": ["se", "gd"]}}, True),
+    ({"$or": [{"source": "khac.md"}, {"year": 2026}]}, True),
+    ({"$and": [{"source": "hoc_phi.md"}, {"tags": {"$in": ["se"]}}]}, False),
+    ({"source": {"$gt": 3}}, False),  # incomparable types never match
+])
+def test_matches_filter(filter, expected):
+    metadata = {"source": "hoc_phi.md", "year": 2026, "tags": ["ai", "fee"]}
+    assert matches_filter(metadata, filter) is expected
+
+
+def test_unknown_operator_is_an_error():
+    with pytest.raises(ValueError, match="Unsupported"):
+        matches_filter({"year": 2026}, {"year": {"$between": [1, 2]}})
+
+
+def clustered_vectors(n_clusters=20, per_cluster=60, seed=0):
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(n_clusters, DIM))
+    return np.concatenate([center + 0.1 * rng.normal(size=(per_cluster, DIM)) for center in centers]).astype(np.float32)
+
+
+def build(path, vectors, **kwargs):
+    store = LocalVectorStore(str(path), DeterministicFakeEmbedding(size=DIM), **kwargs)
+    ids = [f"doc-{i}" for i in range(len(vectors))]
+    metadatas = [{"parity": i % 2} for i in range(len(vectors))]
+    store.add_embeddings([f"chunk {i}" for i in range(len(vectors))], vectors, metadatas, ids)
+    return store
+
+
+def exact_top_ids(vectors, query, k):
+    normalized = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+    return {f"doc-{i}" for i in np.argsort(-(normalized @ (query / np.linalg.norm(query))))[:k]}
+
+
+def test_exact_search_before_ivf_training(tmp_path):
+    vectors = clustered_vectors(n_clusters=3, per_cluster=10)
+    store = build(tmp_path, vectors)
+    assert store._centroids is None
+    results = store.similarity_search_with_score_by_vector(vectors[4].tolist(), k=5)
+    assert results[0][0].id == "doc-4" and results[0][1] == pytest.approx(1.0, abs=1e-5)
+    assert {doc.id for doc, _ in results} == exact_top_ids(vectors, vectors[4], 5)
+
+
+def test_ivf_search_recall_filters_and_persistence(tmp_path, monkeypatch):
+    monkeypatch.setattr(local_index_module, "IVF_MIN_TRAIN", 500)
+    vectors = clustered_vectors()
+    store = build(tmp_path, vectors)
+    assert store._centroids is not None and len(store._centroids) == int(np.sqrt(len(vectors)))
+
+    rng = np.random.default_rng(1)
+    queries = vectors[rng.choice(len(vectors), 20, replace=False)] + 0.05 * rng.normal(size=(20, DIM))
+    recall = np.mean([
+        len({doc.id for doc in store.similarity_search_by_vector(query.tolist(), k=10)} & exact_top_ids(vectors, query, 10)) / 10
+        for query in queries
+    ])
+    assert recall >= 0.9
+
+    hits = store.similarity_search_by_vector(vectors[7].tolist(), k=5, filter={"parity": 0})
+    assert len(hits) == 5 and all(doc.metadata["parity"] == 0 for doc in hits)
+
+    store.delete(["doc-7"])
+    reopened = LocalVectorStore(str(tmp_path), DeterministicFakeEmbedding(size=DIM))
+    assert reopened._centroids is not None
+    assert reopened.similarity_search_by_vector(vectors[7].tolist(), k=3)[0].id != "doc-7"
+    assert len(reopened) == len(vectors) - 1
+
+
+def test_upsert_replaces_the_previous_row(tmp_path):
+    vectors = clustered_vectors(n_clusters=2, per_cluster=5)
+    store = build(tmp_path, vectors)
+    store.add_embeddings(["chunk 0 v2"], [vectors[9]], [{"parity": 0}], ["doc-0"])
+    assert len(store) == len(vectors)
+    assert store.get_by_ids(["doc-0"])[0].page_content == "chunk 0 v2"
+    top = store.similarity_search_by_vector(vectors[9].tolist(), k=2)
+    assert {doc.id for doc in top} == {"doc-0", "doc-9"}
+    # Iteration sees each live document once
+    rows, cursor, seen = [], 0, []
+    while cursor is not None:
+        rows, cursor = store.scan(cursor, 3)
+        seen.extend(store.id_of(row) for row in rows)
+    assert sorted(seen) == sorted(f"doc-{i}" for i in range(len(vectors)))
+
+
+def crash_on_save(store, monkeypatch, completed=False):
+    """Make the next state save of `store` raise, as if the process died just before (or after) it."""
+    save = store._save_state
+
+    def crashing_save():
+        if completed:
+            save()
+        raise KeyboardInterrupt("crash")
+
+    monkeypatch.setattr(store, "_save_state", crashing_save)
+
+
+def reopen(path):
+    return LocalVectorStore(str(path), DeterministicFakeEmbedding(size=DIM))
+
+
+def test_rows_appended_by_an_interrupted_write_are_dropped(tmp_path, monkeypatch):
+    vectors = clustered_vectors(n_clusters=2, per_cluster=3)
+    store = build(tmp_path, vectors)
+    crash_on_save(store, monkeypatch)
+    with pytest.raises(KeyboardInterrupt):
+        store.add_embeddings(["lost 1", "lost 2"], vectors[:2], ids=["lost-1", "lost-2"])
+
+    store = reopen(tmp_path)
+    assert len(store) == len(vectors) and store.get_by_ids(["lost-1"]) == []
+    store.add_embeddings(["chunk 6"], vectors[:1], [{"parity": 0}], ["doc-6"])
+    store.delete(["doc-2"])
+
+    store = reopen(tmp_path)
+    assert [doc.page_content for doc in store.get_by_ids(["doc-1", "doc-6", "doc-5"])] == ["chunk 1", "chunk 6", "chunk 5"]
+    assert store.get_by_ids(["doc-2"]) == [] and store.get_by_ids(["doc-3"])[0].page_content == "chunk 3"
+    with open(tmp_path / "ids.txt", encoding="utf-8") as f:
+        assert len(f.readlines()) == store._count
+
+
+def test_upsert_interrupted_after_commit_keeps_only_the_new_row(tmp_path, monkeypatch):
+    vectors = clustered_vectors(n_clusters=2, per_cluster=3)
+    store = build(tmp_path, vectors)
+    # Dies once the new row is committed, before the old one is tombstoned
+    crash_on_save(store, monkeypatch, completed=True)
+    with pytest.raises(KeyboardInterrupt):
+        store.add_embeddings(["chunk 0 v2"], vectors[:1], [{"parity": 0}], ["doc-0"])
+
+    store = reopen(tmp_path)
+    assert len(store) == len(vectors)
+    assert store.get_by_ids(["doc-0"])[0].page_content == "chunk 0 v2"
+    assert [doc.id for doc in store.similarity_search_by_vector(vectors[0].tolist(), k=2)].count("doc-0") == 1
@@ -0,0 +1,29 @@
+import os
+import jwt
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from src.apis.routers.metrics_router import router
+
+
+@pytest.fixture
+def client():
+    app = FastAPI()
+    app.include_router(router)
+    return TestClient(app)
+
+
+def token(role):
+    secret = os.getenv("JWT_SECRET", "fpt-university-chatbot-secret-key-2024")
+    return {"Authorization": "Bearer " + jwt.encode({"id": 1, "email": "a@fpt.edu.vn", "role": role}, secret, algorithm="HS256")}
+
+
+def test_metrics_need_a_token(client):
+    assert client.get("/metrics/llm-governor").status_code in (401, 403)
+
+
+def test_metrics_are_admin_only(client):
+    assert client.get("/metrics/llm-governor", headers=token("student")).status_code == 403
+    response = client.get("/metrics/llm-governor", headers=token("admin"))
+    assert response.status_code == 200
+    assert "queue_depth_by_user" not in response.json()
@@ -0,0 +1,166 @@
+import os
+import pytest
+from langchain_core.embeddings import DeterministicFakeEmbedding
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+import src.agents.graph as graph_module
+import src.retrieval.knowledge_version as knowledge_version_module
+from src.agents.semantic_cache import SemanticAnswerCache, is_standalone
+
+
+class Versions:
+    """Stand-in for the shared knowledge base version row."""
+
+    def __init__(self):
+        self.value = 0
+
+    async def __call__(self) -> int:
+        return self.value
+
+
+@pytest.fixture
+def versions():
+    return Versions()
+
+
+@pytest.fixture
+def cache(versions):
+    return SemanticAnswerCache(DeterministicFakeEmbedding(size=32), knowledge_version=versions, threshold=0.95)
+
+
+async def test_hit_after_store(cache):
+    answer, vector, version = await cache.lookup("Học phí ngành AI là bao nhiêu?")
+    assert answer is None
+    cache.store("Học phí ngành AI là bao nhiêu?", vector, "30 triệu", version)
+    answer, _, _ = await cache.lookup("  học phí ngành AI là bao nhiêu? ")
+    assert answer == "30 triệu"
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+async def test_version_change_invalidates(cache, versions):
+    _, vector, version = await cache.lookup("Học phí ngành AI?")
+    cache.store("Học phí ngành AI?", vector, "30 triệu", version)
+    # Another process (the ingest CLI) changed the knowledge base
+    versions.value += 1
+    answer, _, _ = await cache.lookup("Học phí ngành AI?")
+    assert answer is None
+    assert cache.stats()["invalidations"] == 1
+
+
+async def test_answer_computed_under_an_old_version_is_not_stored(cache, versions):
+    _, vector, version = await cache.lookup("Học phí ngành AI?")
+    versions.value += 1
+    await cache.lookup("Điểm chuẩn ngành AI?")
+    cache.store("Học phí ngành AI?", vector, "stale", version)
+    answer, _, _ = await cache.lookup("Học phí ngành AI?")
+    assert answer is None
+
+
+def test_only_the_opening_question_is_standalone():
+    assert is_standalone([HumanMessage(content="Học phí ngành AI?")])
+    assert not is_standalone([HumanMessage(content="Học phí ngành AI?"), AIMessage(content="30 triệu"), HumanMessage(content="Còn ngành SE?")])
+    assert not is_standalone([HumanMessage(content="Còn ngành SE?")], summary="Người dùng hỏi học phí ngành AI.")
+
+
+class FakeRagAgent:
+    def __init__(self):
+        self.calls = 0
+
+    async def ainvoke(self, inputs):
+        self.calls += 1
+        return {"messages": [
+            *inputs["messages"],
+            ToolMessage(content="Học phí: 30 triệu", name="rag_retrieve", tool_call_id="1"),
+            AIMessage(content=f"answer {self.calls}"),
+        ]}
+
+
+@pytest.fixture
+def rag_node(monkeypatch, cache):
+    agent = FakeRagAgent()
+    events = []
+
+    async def dispatch(name, data, config=None):
+        events.append(data["content"])
+
+    monkeypatch.setattr(graph_module, "SEMANTIC_CACHE_ENABLED", True)
+    monkeypatch.setattr(graph_module, "rag_answer_cache", cache)
+    monkeypatch.setattr(graph_module, "rag_agent", agent)
+    monkeypatch.setattr(graph_module, "adispatch_custom_event", dispatch)
+    return agent, events
+
+
+def state(*messages):
+    return {"messages": list(messages), "user_id": "1", "summary": ""}
+
+
+async def test_follow_up_questions_bypass_the_cache(rag_node):
+    agent, events = rag_node
+    first = await graph_module.rag_agent_node(state(HumanMessage(content="Còn ngành SE thì sao?")), {})
+    assert first["response"] == "answer 1"
+
+    # Same words in another thread, after an earlier turn: they refer to something else
+    history = [HumanMessage(content="Học phí ngành AI?"), AIMessage(content="30 triệu")]
+    follow_up = await graph_module.rag_agent_node(state(*history, HumanMessage(content="Còn ngành SE thì sao?")), {})
+    assert follow_up["response"] == "answer 2"
+    assert agent.calls == 2 and events == []
+
+    repeated = await graph_module.rag_agent_node(state(HumanMessage(content="Còn ngành SE thì sao?")), {})
+    assert repeated["response"] == "answer 1"
+    assert events == ["answer 1"]
+
+
+class BrokenCache:
+    async def lookup(self, question):
+        raise ConnectionError("version table unreachable")
+
+    def store(self, question, vector, answer, version):
+        raise AssertionError("nothing to store after a failed lookup")
+
+
+async def test_failing_cache_lookup_is_a_miss(rag_node, monkeypatch):
+    agent, events = rag_node
+    monkeypatch.setattr(graph_module, "rag_answer_cache", BrokenCache())
+    result = await graph_module.rag_agent_node(state(HumanMessage(content="Học phí ngành AI?")), {})
+    assert result["response"] == "answer 1"
+    assert agent.calls == 1 and events == []
+
+
+async def test_failing_cache_store_still_answers(rag_node, cache, monkeypatch):
+    def broken_store(*args):
+        raise RuntimeError("store failed")
+
+    monkeypatch.setattr(cache, "store", broken_store)
+    result = await graph_module.rag_agent_node(state(HumanMessage(content="Học phí ngành AI?")), {})
+    assert result["response"] == "answer 1"
+
+
+async def test_knowledge_version_reads_are_cached(monkeypatch):
+    reads = []
+
+    async def read_version():
+        reads.append(1)
+        return 7
+
+    monkeypatch.setattr(knowledge_version_module, "_read_version", read_version)
+    monkeypatch.setattr(knowledge_version_module, "_cached_version", None)
+    assert await knowledge_version_module.get_knowledge_version(max_age=60) == 7
+    assert await knowledge_version_module.get_knowledge_version(max_age=60) == 7
+    assert len(reads) == 1
+    # Past the TTL the shared row is read again
+    assert await knowledge_version_module.get_knowledge_version(max_age=0) == 7
+    assert len(reads) == 2
+
+
+@pytest.mark.skipif(not os.getenv("TEST_DB_URI"), reason="TEST_DB_URI is not set")
+async def test_knowledge_version_is_shared_through_postgres():
+    from src.config.database import async_engine
+    from src.retrieval.knowledge_version import bump_knowledge_version, get_knowledge_version
+
+    try:
+        before = await get_knowledge_version(max_age=0)
+        assert await bump_knowledge_version() == before + 1
+        # The bump refreshes this process's cached version at once
+        assert await get_knowledge_version() == before + 1
+        assert await get_knowledge_version(max_age=0) == before + 1
+    finally:
+        await async_engine.dispose()
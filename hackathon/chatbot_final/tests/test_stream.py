@@ -0,0 +1,86 @@
+import asyncio
+import json
+import time
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from langchain_core.messages import AIMessageChunk
+from src.apis.middlewares.auth_middleware import User, get_current_user
+from src.apis.routers.multi_agent_router import delta_message_generator, router
+
+
+class FakeGraph:
+    """Streams the agent chunks of `script`: strings are chunks, numbers are pauses in seconds."""
+
+    def __init__(self, *script, error=None):
+        self.script = script
+        self.error = error
+
+    async def astream_events(self, input, config, version):
+        for step in self.script:
+            if isinstance(step, str):
+                yield {"event": "on_chat_model_stream", "metadata": {"langgraph_node": "agent"}, "data": {"chunk": AIMessageChunk(content=step)}}
+            else:
+                await asyncio.sleep(step)
+        if self.error:
+            raise self.error
+
+
+def parse(event: str) -> dict:
+    return json.loads(event.split("data: ", 1)[1])
+
+
+async def collect(graph, flush_interval):
+    """(seconds since start, payload) of every event."""
+    start = time.monotonic()
+    return [
+        (time.monotonic() - start, parse(event))
+        async for event in delta_message_generator(graph, {}, {}, flush_interval=flush_interval)
+    ]
+
+
+async def test_pending_text_is_flushed_while_the_model_is_silent():
+    events = await collect(FakeGraph(0.06, "Học ", "phí", 0.5, " là 30 triệu"), flush_interval=0.05)
+    deltas = [(at, payload["content"]) for at, payload in events if payload["type"] == "delta"]
+    assert [content for _, content in deltas] == ["Học ", "phí", " là 30 triệu"]
+    # "phí" arrived right after a flush: it goes out when the interval elapses, not with the next chunk
+    assert deltas[1][0] < 0.3
+    assert events[-1][1] == {"type": "final_message", "content": "Học phí là 30 triệu"}
+
+
+async def test_chunks_within_the_interval_are_coalesced():
+    events = await collect(FakeGraph("a", "b", "c", 0.2, "d"), flush_interval=0.1)
+    assert [payload.get("content") for _, payload in events] == [None, "abc", "d", "abcd"]
+    assert [payload["type"] for _, payload in events] == ["start", "delta", "delta", "final_message"]
+
+
+async def test_graph_errors_reach_the_client_stream():
+    with pytest.raises(RuntimeError, match="quota"):
+        await collect(FakeGraph("a", error=RuntimeError("quota")), flush_interval=0.05)
+
+
+class FakeSummarizer:
+    def schedule(self, graph, config):
+        pass
+
+
+@pytest.fixture
+def client():
+    app = FastAPI()
+    app.include_router(router)
+    app.dependency_overrides[get_current_user] = lambda: User(user_id=1, email="a@fpt.edu.vn", role="student")
+    app.state.multi_agent_graph = FakeGraph("Xin ", "chào")
+    app.state.summarizer = FakeSummarizer()
+    return TestClient(app)
+
+
+@pytest.mark.parametrize("version", ["0", "3", "v2"])
+def test_unknown_stream_versions_are_rejected(client, version):
+    response = client.post(f"/chatbot/stream/t1?stream_version={version}", data={"query": "hi"})
+    assert response.status_code == 422
+
+
+def test_legacy_stream_version(client):
+    response = client.post("/chatbot/stream/t1?stream_version=1", data={"query": "hi"})
+    assert response.status_code == 200
+    assert json.loads(response.text.split("\n\n")[-1]) == {"type": "final_message", "content": "Xin chào"}
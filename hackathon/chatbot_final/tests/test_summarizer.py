@@ -0,0 +1,123 @@
+import pytest
+from langchain_core.messages import HumanMessage, RemoveMessage
+from langgraph.graph.message import REMOVE_ALL_MESSAGES
+import src.agents.summarizer as summarizer_module
+from src.agents.summarizer import BackgroundSummarizer, SUMMARIZE_KEEP_MESSAGES
+
+THREAD = "summarizer-thread"
+CONFIG = {"configurable": {"thread_id": THREAD}}
+
+
+async def run_turn(graph, text: str) -> None:
+    await graph.ainvoke({"messages": [HumanMessage(content=text)], "user_id": "1"}, CONFIG)
+
+
+async def contents(graph) -> list:
+    state = await graph.aget_state(CONFIG)
+    return [msg.content for msg in state.values["messages"] if isinstance(msg, HumanMessage)]
+
+
+@pytest.fixture(autouse=True)
+def always_summarize(monkeypatch):
+    monkeypatch.setattr(summarizer_module, "SUMMARIZE_AFTER_TOKENS", 1)
+
+
+@pytest.fixture
+def llm_calls(monkeypatch):
+    """Replaces the summarize LLM call; tests can run a callback during it."""
+    calls = []
+
+    async def summarize(messages, summary=""):
+        calls.append(messages)
+        for callback in during_call:
+            await callback()
+        return f"summary of {len(messages)} messages"
+
+    during_call = []
+    monkeypatch.setattr(summarizer_module, "summarize_messages", summarize)
+    return during_call
+
+
+async def test_summarizes_without_holding_a_pooled_connection(graph, pg_pool, llm_calls):
+    for text in ("một", "hai", "ba"):
+        await run_turn(graph, text)
+    checked_out = []
+
+    async def record():
+        stats = pg_pool.get_stats()
+        checked_out.append(stats["pool_size"] - stats["pool_available"])
+
+    llm_calls.append(record)
+    summarizer = BackgroundSummarizer()
+    await summarizer._run(graph, CONFIG, THREAD)
+
+    assert checked_out == [0]
+    state = await graph.aget_state(CONFIG)
+    assert state.values["summary"] == "summary of 4 messages"
+    assert len(state.values["messages"]) == SUMMARIZE_KEEP_MESSAGES
+    assert summarizer.stats()["completed"] == 1
+
+
+async def test_turn_committed_during_the_llm_call_is_kept(graph, llm_calls):
+    for text in ("một", "hai", "ba"):
+        await run_turn(graph, text)
+    llm_calls.append(lambda: run_turn(graph, "bốn"))
+
+    summarizer = BackgroundSummarizer()
+    await summarizer._run(graph, CONFIG, THREAD)
+
+    state = await graph.aget_state(CONFIG)
+    assert state.values["summary"] == "summary of 4 messages"
+    assert await contents(graph) == ["ba", "bốn"]
+    assert summarizer.stats()["rebased"] == 1
+
+
+class RacingGraph:
+    """Runs a whole turn right before the summarizer's first write, on the checkpoint it read."""
+
+    def __init__(self, graph):
+        self.graph = graph
+        self.raced = False
+
+    def __getattr__(self, name):
+        return getattr(self.graph, name)
+
+    async def aupdate_state(self, config, values, *args, **kwargs):
+        if not self.raced:
+            self.raced = True
+            await run_turn(self.graph, "bốn")
+        return await self.graph.aupdate_state(config, values, *args, **kwargs)
+
+
+async def test_turn_committed_between_the_read_and_the_write_is_kept(graph, llm_calls):
+    for text in ("một", "hai", "ba"):
+        await run_turn(graph, text)
+
+    summarizer = BackgroundSummarizer()
+    await summarizer._run(RacingGraph(graph), CONFIG, THREAD)
+
+    state = await graph.aget_state(CONFIG)
+    assert state.values["summary"] == "summary of 4 messages"
+    assert await contents(graph) == ["ba", "bốn"]
+    # The first write landed next to the turn's checkpoint and was re-applied on top of it
+    assert summarizer.stats()["rebased"] == 1
+    assert summarizer.stats()["completed"] == 1
+
+
+async def test_write_is_aborted_when_another_worker_summarized_first(graph, llm_calls):
+    for text in ("một", "hai", "ba"):
+        await run_turn(graph, text)
+
+    async def other_worker():
+        state = await graph.aget_state(CONFIG)
+        kept = state.values["messages"][-2:]
+        await graph.aupdate_state(CONFIG, {"summary": "other", "messages": [RemoveMessage(id=REMOVE_ALL_MESSAGES), *kept]})
+
+    llm_calls.append(other_worker)
+    summarizer = BackgroundSummarizer()
+    await summarizer._run(graph, CONFIG, THREAD)
+
+    state = await graph.aget_state(CONFIG)
+    assert state.values["summary"] == "other"
+    assert summarizer.stats()["aborted_conflict"] == 1
+    assert summarizer.stats()["completed"] == 0
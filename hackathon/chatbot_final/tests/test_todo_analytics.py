@@ -0,0 +1,50 @@
+import os
+from datetime import datetime, timedelta
+import pytest
+from src.analytics.todo_analytics import _fill_weeks, _get_completion_rate_data, _week_starts
+
+START = datetime(2026, 1, 1)
+
+
+def test_weeks_are_7_day_windows_and_the_last_one_ends_at_end_date():
+    assert _week_starts(START, START + timedelta(days=14)) == [START, START + timedelta(days=7)]
+    assert _week_starts(START, START + timedelta(days=10)) == [START, START + timedelta(days=7)]
+    assert _week_starts(START, START + timedelta(days=15))[-1] == START + timedelta(days=14)
+    assert _week_starts(START, START) == []
+
+
+def test_weeks_without_tasks_are_zero_filled():
+    rows = [(0, 3, 1), (0, 2, 2), (2, 4, 0), (3, 1, 1), (-1, 5, 5)]
+    assert _fill_weeks(3, rows) == [[5, 3], [0, 0], [4, 0]]
+    assert _fill_weeks(0, rows) == []
+
+
+@pytest.mark.skipif(not os.getenv("TEST_DB_URI"), reason="TEST_DB_URI is not set")
+def test_week_index_at_the_boundaries():
+    from src.config.database import Base, SessionLocal, TodoItem, engine
+
+    user_id = 990001
+    end = START + timedelta(days=24)
+    created = {
+        START - timedelta(seconds=1): "done",  # before the window
+        START: "done",
+        START + timedelta(days=7, seconds=-1): "pending",
+        START + timedelta(days=14): "done",  # week 1 has no task
+        START + timedelta(days=23): "pending",
+        end: "done",  # after the last week
+    }
+    Base.metadata.create_all(engine, tables=[TodoItem.__table__])
+    with SessionLocal() as db:
+        try:
+            db.query(TodoItem).filter(TodoItem.userId == user_id).delete()
+            db.add_all(
+                TodoItem(userId=user_id, title=f"task {i}", status=status, priority="high", createdAt=at, updatedAt=at)
+                for i, (at, status) in enumerate(created.items())
+            )
+            db.commit()
+            data = _get_completion_rate_data(db, START, end, user_id)
+        finally:
+            db.query(TodoItem).filter(TodoItem.userId == user_id).delete()
+            db.commit()
+    assert [(week["total"], week["completed"]) for week in data["weekly_stats"]] == [(2, 1), (0, 0), (1, 1), (1, 0)]
+    assert [week["week_start"] for week in data["weekly_stats"]] == ["01/01", "01/08", "01/15", "01/22"]
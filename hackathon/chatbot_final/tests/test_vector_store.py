@@ -0,0 +1,77 @@
+from types import SimpleNamespace
+import pytest
+import src.config.vector_store as vector_store_module
+from src.config.vector_store import VectorStoreCRUD
+from src.retrieval.local_index import matches_filter
+
+
+class FakePineconeIndex:
+    """Asyncio index client answering from a dict; records the calls it served."""
+
+    def __init__(self, records, dimension=4):
+        self.records = records
+        self.dimension = dimension
+        self.calls = []
+
+    async def describe_index_stats(self):
+        return SimpleNamespace(dimension=self.dimension)
+
+    async def query(self, vector, filter, top_k, namespace=None, include_metadata=None):
+        self.calls.append("query")
+        assert len(vector) == self.dimension and any(vector)
+        ids = [doc_id for doc_id, metadata in self.records.items() if matches_filter(metadata, filter)]
+        return SimpleNamespace(matches=[SimpleNamespace(id=doc_id) for doc_id in ids[:top_k]])
+
+    async def fetch(self, ids, namespace=None):
+        self.calls.append(("fetch", len(ids)))
+        return SimpleNamespace(vectors={
+            doc_id: SimpleNamespace(metadata=self.records[doc_id]) for doc_id in ids if doc_id in self.records
+        })
+
+    async def list_paginated(self, limit, pagination_token=None, namespace=None):
+        self.calls.append("list")
+        ids = sorted(self.records)
+        start = int(pagination_token or 0)
+        end = start + limit
+        return SimpleNamespace(
+            vectors=[SimpleNamespace(id=doc_id) for doc_id in ids[start:end]],
+            pagination=SimpleNamespace(next=str(end)) if end < len(ids) else None,
+        )
+
+
+@pytest.fixture
+def pinecone_crud(monkeypatch, tmp_path):
+    monkeypatch.setattr(vector_store_module, "LOCAL_VECTOR_STORE_PATH", str(tmp_path / "store"))
+    crud = VectorStoreCRUD()
+    records = {f"doc-{i:03d}": {"text": f"chunk {i}", "source": "hoc_phi.md" if i % 10 == 0 else "khac.md"} for i in range(250)}
+    crud.vector_store = SimpleNamespace(_namespace="", _text_key="text")
+    crud._pinecone_index = FakePineconeIndex(records)
+    return crud
+
+
+async def test_filtered_iteration_fetches_only_the_matches(pinecone_crud):
+    index = pinecone_crud._pinecone_index
+    pages = [page async for page in pinecone_crud.iter_document_pages({"source": "hoc_phi.md"}, page_size=10)]
+    assert [len(items) for items, _ in pages] == [10, 10, 5]
+    assert [doc.page_content for doc in pages[0][0]][:2] == ["chunk 0", "chunk 10"]
+    assert "list" not in index.calls
+    assert sum(call[1] for call in index.calls if isinstance(call, tuple)) == 25
+
+
+async def test_filtered_iteration_resumes_from_a_cursor(pinecone_crud):
+    filter = {"source": "hoc_phi.md"}
+    first_items, cursor = await anext(pinecone_crud.iter_document_pages(filter, page_size=10, projection="ids"))
+    rest = [doc_id async for items, _ in pinecone_crud.iter_document_pages(filter, page_size=10, projection="ids", cursor=cursor) for doc_id in items]
+    assert first_items + rest == [f"doc-{i:03d}" for i in range(0, 250, 10)]
+
+
+async def test_filter_matching_more_than_a_query_returns_is_refused(pinecone_crud, monkeypatch):
+    monkeypatch.setattr(vector_store_module, "PINECONE_FILTER_SCAN_LIMIT", 100)
+    with pytest.raises(ValueError, match="narrow it down"):
+        await anext(pinecone_crud.iter_document_pages({"source": "khac.md"}))
+
+
+async def test_unfiltered_iteration_lists_the_index(pinecone_crud):
+    ids = [doc_id async for doc_id in pinecone_crud.iter_documents(projection="ids")]
+    assert len(ids) == 250
+    assert "query" not in pinecone_crud._pinecone_index.calls